@@ -1,7 +1,10 @@
 from streamlit_lottie import st_lottie
-import requests
 import streamlit as st
 
+from costsim.warmup import start_warmup
+from dictionaries import Lottie
+from utils import load_lottie
+
 st.set_page_config(
     page_title="Cost Management System",
     layout="wide",
@@ -47,9 +50,10 @@ st.markdown("""
     unsafe_allow_html=True
 )
 
-vFile = "https://assets10.lottiefiles.com/packages/lf20_059pfp0Z5i.json"
-r = requests.get(vFile)
-LottieCode = None if r.status_code != 200 else r.json()
+# load data, models and assets for the other pages while this one is open
+start_warmup()
+
+LottieCode = load_lottie(Lottie["Home"])
 
 col1, col2, col3 = st.columns([1, 2, 1])
 
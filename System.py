@@ -1,9 +1,21 @@
 # System.py
 
+import pandas as pd
+import plotly.express as px
 import streamlit as st
 from streamlit_option_menu import option_menu
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-from dictionaries import cost_elements, models
+from costsim.features import FEATURES
+from costsim.forecasting import forecast_model, forecastable
+from costsim.instrumentation import instrumented
+from costsim.metrics import record_rerun, start_exporters
+from costsim.partitions import business_units
+from costsim.registry import ModelSpec, PageSpec, dataset_resource, page_spec
+from costsim.warmup import start_warmup
+from dictionaries import Elements, Variable
+
+MODEL_ANALYSES = ("Prediction Results", "Variables Prediction")
 
 
 def render_system_view(selected_system: str) -> None:
@@ -11,7 +23,7 @@ def render_system_view(selected_system: str) -> None:
 
     with left_col:
         # 2nd level: cost element menu
-        element_list = cost_elements.get(selected_system, [])
+        element_list = Variable.get(selected_system, [])
         selected_element = option_menu(
             "Cost element selector",
             element_list,
@@ -22,14 +34,14 @@ def render_system_view(selected_system: str) -> None:
             key=f"element_menu_{selected_system}",
         )
 
-        # 3rd level: only for elements that have models (for now: Consumables)
+        # 3rd level: only for categories with elements (for now: Consumables)
         selected_item_name = None
         selected_item_code = None
 
-        element_models = models.get(selected_element, {})
-        if element_models:
+        element_items = Elements.get(selected_element, {})
+        if element_items:
             display_items = [
-                f"{name} : {code}" for name, code in element_models.items()
+                f"{name} : {code}" for name, code in element_items.items()
             ]
             selected_display = option_menu(
                 selected_element,
@@ -130,3 +142,163 @@ def render_system_view(selected_system: str) -> None:
                 """,
                 unsafe_allow_html=True,
             )
+
+
+# -------------------------------------------------------------------
+# MODEL PAGES
+# -------------------------------------------------------------------
+def load_page_data(spec: PageSpec):
+    """Dataset snapshot and feature matrix for the page's business unit."""
+    # reloaded in the background when the workbook changes
+    snapshot = dataset_resource(spec.bu, spec.data).get()
+    return snapshot, FEATURES.get(spec.bu, snapshot.version, snapshot.value)
+
+
+def feature_default(features: pd.DataFrame, year_month, name: str) -> int:
+    """Value derived from history for the selected month, 0 when it can't be derived."""
+    if name not in features.columns or year_month not in features.index:
+        return 0
+    v = features.at[year_month, name]
+    return 0 if pd.isna(v) else int(round(v))
+
+
+@instrumented()
+def render_prediction_results(spec: PageSpec) -> None:
+    st.subheader("Predictive Model Results")
+    with st.sidebar:
+        selected = option_menu(
+            "Select the Variable of Interest",
+            spec.model_names,
+            default_index=0,
+            key=f"results_menu_{spec.name}",
+        )
+    model = spec.model(selected)
+    st.title(f"{model.label} Prediction Results")
+
+    backtest = model.load_backtest()
+    if backtest is None:
+        st.info(f"No backtest results for {model.label} ({model.backtest}).")
+        return
+
+    accuracy = (
+        f" The model accuracy is {model.accuracy} %" if model.accuracy is not None else ""
+    )
+    st.markdown("### Actual vs predicted Quantity")
+    st.markdown(
+        "The graph below shows the plot of the actual and the prediction for the "
+        f"backtest period consisting of the last 6 months of data.{accuracy}"
+    )
+    fig = px.line(backtest, x=backtest.index, y=backtest.columns)
+    st.write(fig)
+
+
+def prediction_message(model: ModelSpec, value: float, price: float | None) -> str:
+    if model.unit == "R":
+        return f"The predicted value for {model.label} is : R {value:.2f}"
+    message = f"The predicted value for {model.label} ({model.unit}) is : {value:.2f}"
+    if price is not None:
+        message += f"   \n The Forecasted Price is : R {price * value:.2f}"
+    return message
+
+
+@instrumented()
+def render_variables_prediction(spec: PageSpec, features: pd.DataFrame) -> None:
+    st.subheader("Cost Variable Prediction :")
+    with st.sidebar:
+        selected = option_menu(
+            "Cost Variable to Predict",
+            spec.model_names,
+            default_index=0,
+            key=f"predict_menu_{spec.name}",
+        )
+    model = spec.model(selected)
+    pred_month = st.selectbox(
+        "Month to predict (inputs are pre-filled from history)",
+        features.index[::-1],
+        key="pred_month",
+    )
+    st.title(f"{model.label} Prediction using ML")
+
+    if not model.available():
+        st.info(f"No trained {model.label} model for {spec.bu} ({model.model}).")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        row = [
+            st.number_input(
+                model.input_label(name),
+                min_value=0,
+                value=feature_default(features, pred_month, name),
+                key=f"input_{spec.bu}_{model.name}_{name}",
+            )
+            for name in model.features
+        ]
+    price = None
+    if model.price:
+        with col2:
+            price = st.number_input(
+                f"Enter Current Price of {model.price} (R)",
+                value=10,
+                key=f"price_{model.name}",
+            )
+
+    if st.button(f"{model.label} Prediction", key=f"predict_{model.name}"):
+        st.success(prediction_message(model, model.predict(row), price))
+
+    # Multi-month forecast: the one-step model rolled forward, all paths per step in one predict call
+    if forecastable(model.name, features):
+        with st.expander(f"{model.label} multi-month forecast"):
+            horizon = st.slider(
+                "Horizon (months)", 12, 36, 12, step=6, key="model_fc_horizon"
+            )
+            n_paths = st.select_slider(
+                "Scenario paths", [100, 250, 500, 1000], value=250, key="model_fc_paths"
+            )
+            forecast = forecast_model(model.load(), model.name, features, horizon, n_paths)
+            fan = forecast.fan()
+            fan.index = pd.to_datetime(fan.index.astype(str), format="%Y%m")
+            fig = px.line(
+                fan, x=fan.index, y=fan.columns,
+                title=f"{model.label} forecast (p10 / p50 / p90)",
+            )
+            st.write(fig)
+
+
+def render_model_page(name: str, extra_analyses=()):
+    """
+    Header, analysis picker and model sections for the page `name` in
+    dictionaries.Pages. Returns (analysis, spec, snapshot) so a page can add
+    its own sections after the shared ones.
+    """
+    start_exporters()
+    start_warmup()
+    ctx = get_script_run_ctx()
+    record_rerun(name, ctx.session_id if ctx else None)
+
+    # data, models (models/<BU>/) and forecasts all follow the selected BU
+    default = page_spec(name).bu
+    bus = business_units()
+    bu = default
+    if len(bus) > 1:
+        bu = st.sidebar.selectbox(
+            "Business unit", bus, index=bus.index(default) if default in bus else 0, key=f"bu_{name}"
+        )
+    spec = page_spec(name, bu)
+
+    analysis = st.sidebar.multiselect(
+        "Choose the Analysis to Display", MODEL_ANALYSES + tuple(extra_analyses)
+    )
+    snapshot, features = load_page_data(spec)
+
+    st.markdown(
+        f"<h1 style='text-align: center; color: black;'>Welcome To {spec.title} 👋</h1>",
+        unsafe_allow_html=True,
+    )
+    st.write("Displaying results for ", spec.bu)
+
+    if "Prediction Results" in analysis:
+        render_prediction_results(spec)
+    if "Variables Prediction" in analysis:
+        render_variables_prediction(spec, features)
+    return analysis, spec, snapshot
@@ -0,0 +1,88 @@
+import base64
+import time
+from datetime import date
+from pathlib import Path
+
+from costsim.diagrams import DiagramCache
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGE = str(ROOT / "pages" / "Mining_System.py")
+WORKBOOK = ROOT / "Data.xlsx"
+
+VALUES = list(range(12))
+
+
+def _source(*values):
+    return "graph TD\n" + "\n".join(f"A{i}-->B{i}" for i in range(len(values)))
+
+
+def _wait_idle(cache, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while cache._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_cached_lookup(bench):
+    cache = DiagramCache(cli=None)
+    cache.get(VALUES, _source)
+    diagram = bench(cache.get, VALUES, _source)
+    assert diagram.svg is None
+
+
+def test_failed_render_backs_off_then_retries(tmp_path):
+    cache = DiagramCache(cli="false", retry_after=0.2)
+    diagram = cache.get(VALUES, _source)
+    _wait_idle(cache)
+    # the failure only affects this render: the CLI stays configured
+    assert diagram.svg is None and cache.cli == "false"
+    assert cache._failures == 1 and cache._retry_at > time.monotonic()
+
+    fake = tmp_path / "mmdc"
+    fake.write_text('#!/bin/sh\necho "<svg/>" > "$4"\n')
+    fake.chmod(0o755)
+    cache.cli = str(fake)
+    cache.get(VALUES, _source)
+    _wait_idle(cache)
+    assert diagram.svg is None  # still resting
+
+    time.sleep(0.25)
+    cache.get(VALUES, _source)
+    _wait_idle(cache)
+    assert diagram.svg.strip() == "<svg/>"
+    assert cache._failures == 0
+
+
+def test_page_shows_rendered_svg(monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    from costsim.diagrams import DIAGRAMS, Diagram
+    from utils import get_data
+
+    svg = '<svg id="diagram" width="10" height="10"><rect width="10" height="10"/></svg>'
+    monkeypatch.setattr(DIAGRAMS, "get", lambda values, build: Diagram("key", "graph TD", svg))
+    at = AppTest.from_file(PAGE, default_timeout=120)
+    at.session_state["show_scenario"] = True
+    at.session_state["scenario_df"] = get_data(WORKBOOK).reset_index()
+    at.run()
+    assert not at.exception
+    images = [node for node in at.main if getattr(node, "type", None) == "image"]
+    urls = [img.url for node in images for img in node.proto.imgs]
+    assert len(urls) == 1 and urls[0].startswith("data:image/svg+xml;base64,")
+    assert '<rect width="10" height="10"/>' in base64.b64decode(urls[0].split(",", 1)[1]).decode()
+
+
+def test_scenario_cut_to_selected_dates():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(PAGE, default_timeout=120)
+    at.session_state["show_scenario"] = True
+    at.run()
+    at.date_input(key="start_date").set_value(date(2022, 3, 10))
+    at.date_input(key="end_date").set_value(date(2022, 4, 20))
+    at.run()
+    xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    at.get("file_uploader")[0].set_value(("scenario.xlsx", WORKBOOK.read_bytes(), xlsx))
+    at.button(key="simulate_scenario").click().run()
+    assert not at.exception
+    dates = at.session_state["scenario_df"]["Date"]
+    assert dates.min().date() >= date(2022, 3, 10) and dates.max().date() <= date(2022, 4, 20)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from costsim.eda import EdaEngine
+from costsim.ingest import NUMERIC_COLUMNS
+from utils import create_correlation_heatmap
+
+
+@pytest.fixture(scope="module")
+def engine(history):
+    return EdaEngine(history, max_cached=4)
+
+
+def test_engine_build(bench, history):
+    bench(EdaEngine, history)
+
+
+def test_corr_selection(bench, engine, history):
+    variables = NUMERIC_COLUMNS[:6]
+    corr = bench(engine.corr, variables)
+    np.testing.assert_allclose(corr.to_numpy(), history[variables].corr().to_numpy())
+
+
+def test_scaled(bench, engine):
+    scaled = bench(engine.scaled, NUMERIC_COLUMNS)
+    assert scaled.min().min() >= 0.0 and scaled.max().max() <= 1.0
+
+
+def test_rolling_corr_window_is_days():
+    # two rows a day, then a ten-day gap
+    days = pd.to_datetime(["2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02", "2024-01-13", "2024-01-14"])
+    x = pd.Series([1.0, 2.0, 3.0, 4.0, 5.0, 7.0], index=days)
+    df = pd.DataFrame({"x": x, "y": x ** 2})
+    corr = EdaEngine(df).rolling_corr("x", "y", 3)
+    expected = np.corrcoef(x.iloc[:4], x.iloc[:4] ** 2)[0, 1]
+    # all four rows of the first two days are within 3 days
+    assert corr.iloc[3] == pytest.approx(expected)
+    # the gap empties the window: Jan 13 only has itself
+    assert np.isnan(corr.iloc[4])
+    assert corr.iloc[5] == pytest.approx(1.0)
+
+
+def test_caches_stay_bounded(engine):
+    for window in range(2, 20):
+        engine.rolling_corr("OB (T)", "ROM (T)", window)
+    for i in range(2, 12):
+        engine.corr_figure(NUMERIC_COLUMNS[:i], create_correlation_heatmap)
+    assert len(engine._rolling) == engine.max_cached
+    assert len(engine._figures) == engine.max_cached
+    # the most recent selections are the ones kept
+    assert ("OB (T)", "ROM (T)", 19) in engine._rolling
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from costsim.features import build_feature_matrix
+
+
+def _months(values: dict) -> pd.DataFrame:
+    """One row on the 15th of each year_month with OB/ROM tonnage."""
+    index = pd.DatetimeIndex([f"{m // 100}-{m % 100:02d}-15" for m in values], name="Date")
+    return pd.DataFrame({"OB (T)": list(values.values()), "ROM (T)": 0.0}, index=index)
+
+
+def test_build_feature_matrix(bench, history):
+    features = bench(build_feature_matrix, history)
+    assert features.index.is_monotonic_increasing
+
+
+def test_lags_line_up_with_months():
+    features = build_feature_matrix(_months({202401: 1.0, 202402: 2.0, 202403: 3.0}))
+    assert features.loc[202403, ["OB_Lag", "OB_Lag2"]].tolist() == [2.0, 1.0]
+    assert np.isnan(features.loc[202403, "OB_Lag3"])
+    assert features.loc[202403, "OB_Roll3"] == 1.5
+    # the month after the history, for forecasting
+    assert features.index[-1] == 202404 and features.loc[202404, "OB_Lag"] == 3.0
+
+
+def test_lags_count_months_across_gaps():
+    # nothing in February or March
+    features = build_feature_matrix(_months({202312: 12.0, 202401: 1.0, 202404: 4.0}))
+    assert list(features.index) == [202312, 202401, 202402, 202403, 202404, 202405]
+    assert np.isnan(features.loc[202404, "OB_Lag"])
+    assert features.loc[202404, "OB_Lag3"] == 1.0
+    # the Roll3 of April only has January in it
+    assert features.loc[202404, "OB_Roll3"] == 1.0
+    assert features.loc[202405, "OB_Lag"] == 4.0
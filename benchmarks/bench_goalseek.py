@@ -0,0 +1,64 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from costsim.goalseek import goal_seek, monthly_drivers, solve_factors
+
+
+@pytest.fixture(scope="module")
+def table(history):
+    return monthly_drivers(history)
+
+
+def test_monthly_drivers(bench, history):
+    bench(monthly_drivers, history)
+
+
+@pytest.mark.parametrize("target", ["year", "month"])
+def test_goal_seek(bench, table, target):
+    result = bench(goal_seek, table, ["price", "rate"], target=target, limits={"price": 0.1})
+    assert result.iterations < 10
+
+
+@pytest.mark.parametrize("target", ["year", "month"])
+def test_goal_seek_hits_budget(table, target):
+    result = goal_seek(table, ["price", "rate"], target=target)
+    assert result.feasible
+    plan = result.plan
+    if target == "month":
+        np.testing.assert_allclose(plan["solved cost"], plan["budget cost"], rtol=1e-9)
+    else:
+        summary = result.summary()
+        np.testing.assert_allclose(summary["solved cost"], summary["budget cost"], rtol=1e-9)
+
+
+@pytest.mark.parametrize("limit", [-0.1, 1.5])
+def test_limits_outside_unit_interval(table, limit):
+    with pytest.raises(ValueError):
+        goal_seek(table, ["price"], limits={"price": limit})
+
+
+def test_solve_million_cells(bench):
+    """Newton steps with binding limits on every cell at once."""
+    log_ratio = np.random.default_rng(0).normal(0, 0.3, size=(1000, 1000))
+    factors, solved, _ = bench(
+        solve_factors, log_ratio, {"price": 1, "rate": 1, "tonnage": 0.5}, {"price": 0.05, "rate": 0.2}
+    )
+    assert solved.mean() > 0.99
+
+
+def test_page_solves_selected_months():
+    from pathlib import Path
+
+    from streamlit.testing.v1 import AppTest
+
+    page = Path(__file__).resolve().parent.parent / "pages" / "Mining_System.py"
+    at = AppTest.from_file(str(page), default_timeout=120)
+    at.run()
+    at.date_input(key="start_date").set_value(date(2022, 3, 10))
+    at.date_input(key="end_date").set_value(date(2022, 4, 20))
+    at.run()
+    assert not at.exception
+    # the charts pass their range to the goal seek section
+    assert at.selectbox(key="gs_from").options == ["2022-03", "2022-04"]
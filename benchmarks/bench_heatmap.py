@@ -0,0 +1,61 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import pytest
+
+from utils import create_correlation_heatmap
+
+N_VARS = [10, 60]
+
+
+@pytest.fixture(scope="module", params=N_VARS, ids=lambda n: f"{n}vars")
+def corr(request):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(2_000, request.param))
+    cols = [f"var_{i}" for i in range(request.param)]
+    return pd.DataFrame(data, columns=cols).corr()
+
+
+def _matplotlib_payload(corr):
+    """What the old page did per rerun: seaborn heatmap rasterised to PNG by st.write."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+    sns.heatmap(corr, cmap="YlGnBu", annot=True, ax=ax)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def _plotly_payload(corr):
+    return pio.to_json(create_correlation_heatmap(corr), validate=False).encode()
+
+
+def _plotly_cached_payload(figure_dict):
+    # a cache hit: only Streamlit's own serialisation of the stored dict remains
+    return json.dumps(figure_dict).encode()
+
+
+def test_heatmap_matplotlib(bench, corr, benchmark):
+    pytest.importorskip("seaborn")
+    payload = bench(_matplotlib_payload, corr, rounds=3)
+    benchmark.extra_info["payload_bytes"] = len(payload)
+
+
+def test_heatmap_plotly(bench, corr, benchmark):
+    payload = bench(_plotly_payload, corr)
+    benchmark.extra_info["payload_bytes"] = len(payload)
+
+
+def test_heatmap_plotly_cached(bench, corr, benchmark):
+    figure = create_correlation_heatmap(corr).to_dict()
+    payload = bench(_plotly_cached_payload, figure)
+    benchmark.extra_info["payload_bytes"] = len(payload)
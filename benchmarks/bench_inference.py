@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+import joblib
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from costsim.inference import (
+    RoutedModel,
+    benchmark,
+    check_parity,
+    compile_model,
+    compiled_path,
+    export_model,
+    load_fast,
+    save_compiled,
+)
+
+MODELS = {
+    "linear": lambda: LinearRegression(),
+    "forest": lambda: RandomForestRegressor(n_estimators=100, max_depth=12, random_state=0),
+    "gbm": lambda: GradientBoostingRegressor(n_estimators=200, random_state=0),
+}
+
+
+def _training_data(rows=5_000):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1e6, size=(rows, 4))
+    y = X @ np.array([0.2, 0.1, 0.05, 0.3]) + rng.normal(0, 1e4, len(X))
+    return X, y
+
+
+@pytest.fixture(scope="module", params=list(MODELS))
+def fitted(request, tmp_path_factory):
+    """sklearn estimator, what load_fast serves after export, and the inputs."""
+    X, y = _training_data()
+    est = MODELS[request.param]().fit(X, y)
+    path = tmp_path_factory.mktemp(request.param) / "model.joblib"
+    joblib.dump(est, path)
+    export_model(path, X)
+    return est, load_fast(path), X
+
+
+@pytest.mark.parametrize("impl", ["sklearn", "compiled"])
+def test_single_row_predict(bench, fitted, impl):
+    est, fast, X = fitted
+    model = est if impl == "sklearn" else fast
+    row = X[:1].tolist()
+    bench(model.predict, row)
+
+
+@pytest.mark.parametrize("impl", ["sklearn", "compiled"])
+def test_batch_predict(bench, fitted, impl):
+    est, fast, X = fitted
+    model = est if impl == "sklearn" else fast
+    bench(model.predict, X)
+
+
+def test_compiled_not_slower(fitted):
+    est, fast, X = fitted
+    timings = benchmark({"sklearn": est, "compiled": fast}, X, single_repeats=50)
+    # 25% for timer noise, as in the baseline comparison
+    assert timings["compiled"]["single_row_us"] <= timings["sklearn"]["single_row_us"] * 1.25
+    assert timings["compiled"]["batch_rows_per_s"] * 1.25 >= timings["sklearn"]["batch_rows_per_s"]
+
+
+@pytest.mark.parametrize(
+    "make",
+    [
+        lambda: make_pipeline(StandardScaler(), LinearRegression()),
+        lambda: make_pipeline(MinMaxScaler(), GradientBoostingRegressor(n_estimators=50, random_state=0)),
+        lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    ],
+    ids=["scaled-linear", "scaled-gbm", "forest"],
+)
+def test_save_load_fast_round_trip(tmp_path, make):
+    X, y = _training_data(2_000)
+    est = make().fit(X, y)
+    path = tmp_path / "model.joblib"
+    joblib.dump(est, path)
+    save_compiled(compile_model(est), compiled_path(path))
+    loaded = load_fast(path)
+    assert not hasattr(loaded, "steps")  # the .npz, not the pickle
+    check_parity(est, loaded, X)
+    check_parity(est, loaded, X[:1].tolist())
+
+
+def test_load_fast_routes_big_batches(tmp_path):
+    X, y = _training_data(2_000)
+    est = GradientBoostingRegressor(n_estimators=50, random_state=0).fit(X, y)
+    path = tmp_path / "model.joblib"
+    joblib.dump(est, path)
+    save_compiled(compile_model(est), compiled_path(path), max_rows=16)
+    loaded = load_fast(path)
+    assert isinstance(loaded, RoutedModel) and loaded._estimator is None
+    check_parity(est, loaded, X[:16])
+    assert loaded._estimator is None
+    check_parity(est, loaded, X)
+    assert loaded._estimator is not None
+
+    # never faster: the joblib model itself
+    save_compiled(compile_model(est), compiled_path(path), max_rows=0)
+    assert type(load_fast(path)) is GradientBoostingRegressor
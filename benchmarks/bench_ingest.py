@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from costsim import registry
+from costsim.ingest import NUMERIC_COLUMNS, HistoryStore, ingest_folder
+from costsim.watcher import WatchedResource
+from synthetic import make_history, write_workbook
+
+
+@pytest.fixture
+def store(history):
+    return HistoryStore.from_frame(history)
+
+
+def _next_days(history, days=1, rows_per_day=3):
+    """Raw CSV-style rows for the days after the history, several per day."""
+    raw = make_history(days * rows_per_day, seed=1, days=days)
+    raw["Date"] = raw["Date"] - raw["Date"].min() + history.index.max() + pd.Timedelta(days=1)
+    return raw
+
+
+def test_from_frame_keeps_every_row(bench, history):
+    store = bench(HistoryStore.from_frame, history)
+    assert len(store) == len(history)
+    assert store.range_sum("OB (T)", history.index.min(), history.index.max()) == pytest.approx(
+        history["OB (T)"].sum()
+    )
+
+
+def test_append_one_day(bench, store, history):
+    rows = _next_days(history)
+    bench(store.append, rows)
+    # all of the day's shift rows are kept
+    assert len(store) == len(history) + len(rows)
+
+
+def test_copy_shares_rows(store, history):
+    frame = store.to_frame()
+    copy = store.copy()
+    copy.append(_next_days(history))
+    # the copy wrote past the original's rows in the same buffer
+    new = copy.to_frame()
+    assert np.shares_memory(new["OB (T)"].to_numpy(), frame["OB (T)"].to_numpy())
+    assert len(store.to_frame()) == len(history)
+    pd.testing.assert_frame_equal(new.iloc[: len(history)], frame)
+
+    # a correction rewrites the copy's rows only
+    day = history.index[0]
+    correction = pd.DataFrame(1.0, index=[0], columns=NUMERIC_COLUMNS)
+    correction.insert(0, "Date", day)
+    copy.append(correction)
+    assert store.to_frame().loc[[day], "OB (T)"].sum() == pytest.approx(history.loc[[day], "OB (T)"].sum())
+
+
+def test_snapshot_append_one_day(bench, drop_folder):
+    data = registry.build_system_data()
+    rows = _next_days(data.stores["Mining System"].to_frame())
+    new = bench(data.append, "Mining System", rows)
+    assert len(new.stores["Mining System"]) == len(data.stores["Mining System"]) + len(rows)
+
+
+def _shared_buckets(old, new):
+    return sum(a is b for a, b in zip(old._buckets, new._buckets)) / len(old._buckets)
+
+
+def test_snapshot_shares_unchanged_aggregates(drop_folder):
+    data = registry.build_system_data()
+    rows = _next_days(data.stores["Mining System"].to_frame())
+    new = data.append("Mining System", rows)
+    # one new day touches one cell per level and a few cube cells per element
+    old_levels = data.pyramids["Mining System"]._levels
+    new_levels = new.pyramids["Mining System"]._levels
+    assert all(_shared_buckets(old_levels[k], new_levels[k]) > 0.9 for k in old_levels)
+    assert _shared_buckets(data.cube._cells, new.cube._cells) > 0.5
+    assert new.cube.total("Mining System") == pytest.approx(
+        data.cube.total("Mining System") + rows["Diesel (R)"].sum()
+    )
+
+
+def test_batch_replaces_its_days(store, history):
+    day = history.index[len(history) // 2]
+    correction = pd.DataFrame(1.0, index=range(2), columns=NUMERIC_COLUMNS)
+    correction.insert(0, "Date", day)
+    delta = store.append(correction)
+    assert len(store.to_frame().loc[[day]]) == 2
+    assert delta.loc[day, "OB (T)"] == pytest.approx(2.0 - history.loc[[day], "OB (T)"].sum())
+    monthly = store.monthly().loc[day.year * 100 + day.month, "OB (T)"]
+    assert monthly == pytest.approx(store.to_frame().loc[str(day)[:7], "OB (T)"].sum())
+
+
+@pytest.fixture
+def drop_folder(raw_history, tmp_path, monkeypatch):
+    """A small workbook and CSV drop folder wired in as the Mining System data."""
+    workbook = tmp_path / "history.xlsx"
+    write_workbook(raw_history.head(500), workbook)
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    monkeypatch.setattr(registry, "Data", {"Mining System": str(workbook)})
+    monkeypatch.setattr(registry, "Incoming", {"Mining System": str(incoming)})
+    return workbook, incoming
+
+
+def test_ingested_rows_survive_rebuild(drop_folder):
+    _, incoming = drop_folder
+    stores = registry.build_system_data().stores
+    base = stores["Mining System"].to_frame()
+    rows = _next_days(base, days=2)
+    rows.to_csv(incoming / "day.csv", index=False)
+    assert ingest_folder(stores["Mining System"], incoming)
+    assert not list(incoming.glob("*.csv"))
+
+    # a watcher rebuild or restart starts from the workbook again
+    stores, cube, pyramids, applied = registry.build_system_data()
+    assert len(applied["Mining System"]) == 1
+    rebuilt = stores["Mining System"].to_frame()
+    assert len(rebuilt) == len(base) + len(rows)
+    assert rebuilt["OB (T)"].sum() == pytest.approx(base["OB (T)"].sum() + rows["OB (T)"].sum())
+    assert pyramids["Mining System"].frame("Day")["OB (T)"].sum() == pytest.approx(rebuilt["OB (T)"].sum())
+
+
+def test_ingest_publishes_a_new_snapshot(drop_folder):
+    workbook, incoming = drop_folder
+    resource = WatchedResource("system_data_test", [workbook], registry.build_system_data)
+    before = resource.get()
+    frame = before.value.stores["Mining System"].to_frame()
+    total = before.value.cube.total("Mining System")
+    _next_days(frame, days=2).to_csv(incoming / "day.csv", index=False)
+
+    assert registry.ingest_incoming(resource) == 1
+    after = resource.get()
+    assert after.version == before.version + 1
+    # a session still holding the old snapshot sees it unchanged
+    assert len(before.value.stores["Mining System"].to_frame()) == len(frame)
+    assert before.value.cube.total("Mining System") == total
+    # and the new one is consistent across frame, cube and pyramid
+    new = after.value.stores["Mining System"].to_frame()
+    assert after.value.cube.total("Mining System") == pytest.approx(new["Diesel (R)"].sum())
+    assert after.value.pyramids["Mining System"].frame("Day")["Diesel (R)"].sum() == pytest.approx(
+        new["Diesel (R)"].sum()
+    )
+
+
+def test_ingest_applies_files_claimed_elsewhere(drop_folder):
+    workbook, incoming = drop_folder
+    resource = WatchedResource("system_data_test", [workbook], registry.build_system_data)
+    frame = resource.get().value.stores["Mining System"].to_frame()
+    rows = _next_days(frame, days=2)
+    # another server process claimed this drop: it is only in processed/
+    (incoming / "processed").mkdir()
+    rows.to_csv(incoming / "processed" / "elsewhere.csv", index=False)
+
+    assert registry.ingest_incoming(resource) == 1
+    assert len(resource.get().value.stores["Mining System"]) == len(frame) + len(rows)
+    # applied once
+    assert registry.ingest_incoming(resource) == 0
+
+    # re-sending a file of the same name is a new source
+    resent = incoming / "elsewhere.csv"
+    rows.to_csv(resent, index=False)
+    mtime = os.stat(incoming / "processed" / "elsewhere.csv").st_mtime_ns + 10**9
+    os.utime(resent, ns=(mtime, mtime))
+    assert registry.ingest_incoming(resource) == 1
+    assert len(resource.get().value.stores["Mining System"]) == len(frame) + len(rows)
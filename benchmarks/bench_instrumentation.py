@@ -0,0 +1,82 @@
+import threading
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import Recorder, instrumented, recording, stage
+
+
+@instrumented("load")
+def _load(n):
+    return pd.DataFrame({"x": np.arange(n)})
+
+
+@instrumented()
+def _summarise(df, label=""):
+    with stage("inner"):
+        return f"{label}{len(df)}"
+
+
+def _allocate(nbytes):
+    with stage("allocate"):
+        block = np.ones(nbytes, dtype="uint8")
+        return int(block[-1])
+
+
+def test_instrumented_call(bench):
+    recorder = Recorder()
+    with recording(recorder):
+        bench(_load, 10)
+
+
+def test_decorator_records_stages_and_rows():
+    assert _summarise(_load(3)) == "3"  # no recorder: straight through
+
+    recorder = Recorder()
+    with recording(recorder):
+        _summarise(_load(5), label="n=")
+    records = [(r.name, r.rows, r.depth) for r in recorder.records]
+    # rows from the returned frame, else from the first frame argument
+    assert records == [("load", 5, 0), ("inner", None, 1), ("_summarise", 5, 0)]
+    assert list(recorder.timings()) == ["load", "_summarise"]
+    assert all(r.peak_bytes is None for r in recorder.records)
+
+
+def test_recording_reports_peak_memory():
+    tracing = tracemalloc.is_tracing()
+    recorder = Recorder(track_memory=True)
+    with recording(recorder):
+        _allocate(5_000_000)
+    (record,) = recorder.records
+    assert record.peak_bytes >= 5_000_000
+    assert tracemalloc.is_tracing() == tracing
+
+
+def test_concurrent_recordings_share_tracing():
+    tracing = tracemalloc.is_tracing()
+    first, second = Recorder(track_memory=True), Recorder(track_memory=True)
+    second_started, first_done = threading.Event(), threading.Event()
+    seen = {}
+
+    def run_second():
+        with recording(second):
+            second_started.set()
+            first_done.wait(5)
+            # the first recording ending doesn't stop tracing under this one
+            seen["tracing"] = tracemalloc.is_tracing()
+            _allocate(1_000_000)
+
+    with recording(first):
+        thread = threading.Thread(target=run_second)
+        thread.start()
+        second_started.wait(5)
+        # overlapping the other session: no peak rather than a wrong one
+        _allocate(1_000)
+    first_done.set()
+    thread.join()
+    assert first.records[0].peak_bytes is None
+    assert seen["tracing"]
+    # alone again by then
+    assert second.records[0].peak_bytes >= 1_000_000
+    assert tracemalloc.is_tracing() == tracing
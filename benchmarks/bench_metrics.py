@@ -0,0 +1,42 @@
+import time
+import uuid
+
+from costsim.instrumentation import Recorder, recording, stage
+from costsim.metrics import InMemoryCollector, record_cache, record_recorder, sample_process_memory
+
+
+def _point(points, **labels):
+    for point in points:
+        attrs = {a["key"]: next(iter(a["value"].values())) for a in point["attributes"]}
+        if all(attrs.get(k) == v for k, v in labels.items()):
+            return point
+    raise AssertionError(f"no data point with {labels}")
+
+
+def test_collector_sees_timings_and_cache_hits():
+    # the registry is process wide: unique labels keep this run's points apart
+    page, cache = f"bench-{uuid.uuid4().hex[:8]}", f"cache-{uuid.uuid4().hex[:8]}"
+    recorder = Recorder(page=page)
+    with recording(recorder):
+        with stage("load"):
+            time.sleep(0.01)
+    record_recorder(recorder)
+    for hit in (False, True, True):
+        record_cache(cache, hit=hit)
+    sample_process_memory()
+
+    collector = InMemoryCollector()
+    collector.export()
+    latest = collector.latest()
+
+    timing = _point(latest["costsim_stage_seconds"], page=page, stage="load")
+    assert timing["count"] == "1"
+    assert timing["sum"] >= 0.01
+    assert _point(latest["costsim_cache_requests_total"], cache=cache, result="hit")["asDouble"] == 2
+    assert _point(latest["costsim_cache_requests_total"], cache=cache, result="miss")["asDouble"] == 1
+
+
+def test_otlp_export(bench):
+    collector = InMemoryCollector()
+    bench(collector.export)
+    assert collector.snapshots
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from costsim import partitions, registry
+from costsim.metrics import DATA_LOAD_SECONDS
+from costsim.partitions import compare, load_bus, partition_path, write_partition
+from synthetic import write_workbook
+from utils import get_data
+
+BUS = [f"BU{i}" for i in range(6)]
+
+
+@pytest.fixture(scope="module")
+def root(history, tmp_path_factory):
+    root = tmp_path_factory.mktemp("partitions")
+    for i, bu in enumerate(BUS):
+        write_partition(bu, history * (1 + i / 10), root)
+    return root
+
+
+def _load(root):
+    return lambda bu: get_data(partition_path(bu, root))
+
+
+def _serial(root):
+    load = _load(root)
+    return [load(bu) for bu in BUS]
+
+
+def test_load_serial(bench, root):
+    bench(_serial, root)
+
+
+def test_load_parallel(bench, root, history):
+    combined = bench(load_bus, BUS, load=_load(root))
+    assert len(combined) == len(BUS) * len(history)
+
+
+def test_load_parallel_not_slower(root):
+    def best(func, *args, repeats=5):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    serial = best(_serial, root)
+    parallel = best(load_bus, BUS, None, _load(root))
+    # 25% for timer noise, as in the baseline comparison
+    assert parallel <= serial * 1.25
+
+
+def test_compare(bench, root):
+    table = bench(compare, BUS, ["Diesel (R)", "Diesel (R) Budget"], load=_load(root))
+    assert list(table["BU"].cat.categories) == BUS
+
+
+def test_load_seconds_labelled_per_bu(root):
+    _serial(root)
+    for bu in BUS:
+        assert DATA_LOAD_SECONDS.count(source=f"bu={bu}/history.parquet") >= 1
+
+
+def test_partition_written_later_is_picked_up(raw_history, history, tmp_path, monkeypatch):
+    bu = f"Late{tmp_path.name}"
+    workbook = tmp_path / "history.xlsx"
+    write_workbook(raw_history.head(100), workbook)
+    monkeypatch.setattr(partitions, "data_root", str(tmp_path / "data"))
+    monkeypatch.setattr(partitions, "datasets", {bu: str(workbook)})
+    monkeypatch.setattr(registry, "datasets", {bu: str(workbook)})
+
+    resource = registry.dataset_resource(bu)
+    assert len(resource.get().value) == 100
+    write_partition(bu, history)
+
+    deadline = time.monotonic() + 10
+    while resource.get().version == 1 and time.monotonic() < deadline:
+        resource.check()
+        time.sleep(0.05)
+    assert len(resource.get().value) == len(history)
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from costsim.cli import main
+from synthetic import make_history
+
+
+def test_cli_keeps_outputs_of_same_named_inputs(tmp_path, capsys):
+    inputs = []
+    for bu, seed in (("Mafube", 0), ("Khutala", 1)):
+        path = tmp_path / "data" / f"bu={bu}" / "history.parquet"
+        path.parent.mkdir(parents=True)
+        make_history(200, seed=seed, days=120).to_parquet(path, index=False)
+        inputs.append(str(path))
+
+    out = tmp_path / "out"
+    assert main([*inputs, "-o", str(out), "-f", "csv", "-j", "1"]) == 0
+    capsys.readouterr()
+
+    written = sorted(p.name for p in out.iterdir())
+    assert written == [
+        "bu=Khutala_history_metrics.csv",
+        "bu=Khutala_history_monthly.csv",
+        "bu=Mafube_history_metrics.csv",
+        "bu=Mafube_history_monthly.csv",
+    ]
+    mafube = pd.read_csv(out / "bu=Mafube_history_monthly.csv")
+    khutala = pd.read_csv(out / "bu=Khutala_history_monthly.csv")
+    assert not mafube.equals(khutala)
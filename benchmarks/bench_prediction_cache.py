@@ -0,0 +1,79 @@
+import threading
+import time
+
+from costsim.prediction_cache import PredictionCache, quantise
+
+
+class CountingModel:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def predict(self, rows):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [sum(rows[0])]
+
+
+def _predict(cache, model, model_key, row):
+    return cache.get_or_compute(model_key, row, lambda: model.predict([row]))
+
+
+def test_cached_prediction(bench):
+    cache, model = PredictionCache(), CountingModel()
+    _predict(cache, model, "m", [1.0, 2.0])
+    assert bench(_predict, cache, model, "m", [1.0, 2.0]) == [3.0]
+    assert model.calls == 1
+
+
+def test_hits_and_misses():
+    cache, model = PredictionCache(name="bench-hits"), CountingModel()
+    for row in ([1.0, 2.0], [1.0, 2.0], [2.0, 2.0], [1.0, 2.0]):
+        _predict(cache, model, "m", row)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 2, 2)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_evicts_least_recently_used():
+    cache, model = PredictionCache(maxsize=2), CountingModel()
+    _predict(cache, model, "m", [1.0])
+    _predict(cache, model, "m", [2.0])
+    _predict(cache, model, "m", [1.0])  # [2.0] is now the oldest
+    _predict(cache, model, "m", [3.0])
+    assert cache.stats()["evictions"] == 1
+    assert cache.key("m", [2.0]) not in cache._data
+    _predict(cache, model, "m", [1.0])
+    assert model.calls == 3
+
+
+def test_quantises_inputs():
+    assert quantise([123456.7, 0.0, float("nan")])[:2] == (123457.0, 0.0)
+    cache, model = PredictionCache(significant=6), CountingModel()
+    _predict(cache, model, "m", [1_000_000.0, 0.5])
+    _predict(cache, model, "m", [1_000_000.2, 0.5000001])  # same to 6 digits
+    assert model.calls == 1
+    _predict(cache, model, "m", [1_000_100.0, 0.5])
+    assert model.calls == 2
+
+
+def test_new_model_version_misses():
+    cache, model = PredictionCache(), CountingModel()
+    _predict(cache, model, ("model.joblib", 1), [1.0])
+    _predict(cache, model, ("model.joblib", 2), [1.0])
+    _predict(cache, model, ("model.joblib", 2), [1.0])
+    assert model.calls == 2
+    assert cache.key(("model.joblib", 1), [1.0]) != cache.key(("model.joblib", 2), [1.0])
+
+
+def test_one_model_call_per_distinct_input():
+    cache, model = PredictionCache(), CountingModel(delay=0.05)
+    rows = [[float(i % 3)] for i in range(12)]
+    threads = [threading.Thread(target=_predict, args=(cache, model, "m", row)) for row in rows]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # concurrent misses on one input wait for the first call
+    assert model.calls == 3
+    assert cache.stats()["hits"] == 9
@@ -0,0 +1,52 @@
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from costsim.production_plan import optimise_plan, rate_estimates
+from synthetic import as_loaded, make_history
+from utils import get_data
+
+DAYS = 1096  # 2020-01-01 to 2022-12-31: 36 months
+WORKBOOK = Path(__file__).resolve().parent.parent / "Data.xlsx"
+
+
+@pytest.fixture(scope="module")
+def pit_rates():
+    """36 months × 10 pits, each pit its own synthetic history."""
+    frames = [as_loaded(make_history(10 * DAYS, seed=pit, days=DAYS)) for pit in range(10)]
+    return pd.concat([rate_estimates(df, pit=f"Pit {pit}") for pit, df in enumerate(frames)])
+
+
+def test_rate_estimates(bench, history):
+    bench(rate_estimates, history)
+
+
+def test_optimise_36_months_10_pits(bench, pit_rates):
+    assert len(pit_rates) == 36 * 10
+    result = bench(optimise_plan, pit_rates)
+    summary = result.summary()
+    assert (summary["ROM"] >= summary["budget ROM"] * (1 - 1e-9)).all()
+    assert pit_rates["split fitted"].all()
+    # the budget tonnage is a feasible plan, so the optimum can't cost more
+    plan = result.plan
+    at_budget = plan["budget OB"] * plan["cost/t OB"] + plan["budget ROM"] * plan["cost/t ROM"]
+    assert result.baseline_cost == pytest.approx(at_budget.sum())
+    assert result.delta <= abs(result.baseline_cost) * 1e-9
+    assert result.delta + result.rate_effect == pytest.approx(result.cost - result.budget_cost)
+
+
+def test_plan_on_workbook(caplog):
+    """Data.xlsx has a fixed budget OB:ROM ratio, so its rates can't be split."""
+    with caplog.at_level(logging.WARNING, logger="costsim.production_plan"):
+        rates = rate_estimates(get_data(WORKBOOK))
+    assert not rates["split fitted"].any()
+    assert (rates["cost/t OB"] == rates["cost/t ROM"]).all()
+    assert "could not be separated" in caplog.text
+    result = optimise_plan(rates)
+    # measured on the same rates the plan can only save against Budget tonnage;
+    # the rest of the gap to Budget is the fitted l/t over the budget l/t
+    assert result.delta <= abs(result.baseline_cost) * 1e-9
+    assert result.rate_effect > 0
+    assert result.delta + result.rate_effect == pytest.approx(result.cost - result.budget_cost)
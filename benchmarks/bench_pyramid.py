@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from costsim.cube import CostCube, range_total
+from costsim.ingest import NUMERIC_COLUMNS
+from costsim.pyramid import LEVELS, AggregatePyramid
+from utils import prepare_diesel_data, prepare_diesel_levels
+
+
+@pytest.fixture(scope="module")
+def pyramid(history):
+    return AggregatePyramid.from_frame(history, columns=NUMERIC_COLUMNS)
+
+
+def test_build(bench, history):
+    bench(AggregatePyramid.from_frame, history, NUMERIC_COLUMNS)
+
+
+def test_regroup_raw_rows(bench, history):
+    """What the monthly chart did before: filter and regroup the raw rows."""
+    start, end = history.index[0], history.index[-1]
+    bench(lambda: prepare_diesel_data(history.loc[start:end].copy()))
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_level_query(bench, pyramid, history, level):
+    start, end = history.index[len(history) // 10], history.index[-len(history) // 10]
+    result = bench(prepare_diesel_levels, pyramid, level, start, end)
+    assert not result.empty
+    # edge periods the range cuts through hold only the covered days
+    sums = pyramid.frame(level, start, end)[NUMERIC_COLUMNS].sum()
+    np.testing.assert_allclose(sums.to_numpy(), history.loc[start:end, NUMERIC_COLUMNS].sum().to_numpy())
+
+
+def test_update_one_day(bench, pyramid, history):
+    delta = history[NUMERIC_COLUMNS].tail(1) * 0.0
+    bench(pyramid.update, delta)
+
+
+def test_range_total(bench, pyramid, history):
+    """Cube total over a range that cuts two months, exact to the day."""
+    cube = CostCube.from_frames({"Mining System": history})
+    start, end = pd.Timestamp("2020-01-10"), pd.Timestamp("2020-03-20")
+    total = bench(range_total, cube, pyramid, start, end, "Mining System")
+    assert total == pytest.approx(history.loc[start:end, "Diesel (R)"].sum())
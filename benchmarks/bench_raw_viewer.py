@@ -0,0 +1,25 @@
+import pytest
+
+from costsim.raw_viewer import RawDataView
+
+
+@pytest.fixture(scope="module")
+def view(history):
+    return RawDataView(history)
+
+
+def test_query_page(bench, view, history):
+    lo, hi = history["OB (T)"].quantile([0.25, 0.75])
+    filters = [("OB (T)", "between", (lo, hi))]
+    page, total = bench(view.query, None, "ROM (T)", False, filters, page=2, page_size=50)
+
+    expected = history[history["OB (T)"].between(lo, hi)].sort_values("ROM (T)", ascending=False, kind="stable")
+    assert total == len(expected)
+    assert page["ROM (T)"].tolist() == expected["ROM (T)"].iloc[50:100].tolist()
+
+
+def test_page_past_the_end_is_the_last_page(view, history):
+    page, total = view.query(page=10_000, page_size=100)
+    assert total == len(history)
+    assert len(page) == total - (-(-total // 100) - 1) * 100
+    assert page.index[-1] == history.index[-1]
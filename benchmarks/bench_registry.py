@@ -0,0 +1,50 @@
+import pytest
+
+from costsim.registry import dataset_resource, model_spec, page_spec
+from dictionaries import Feature_labels, Models, Pages
+from synthetic import write_workbook
+
+
+@pytest.fixture
+def workbooks(raw_history, tmp_path, monkeypatch):
+    monkeypatch.delenv("COSTSIM_SHARED_HISTORY", raising=False)
+    paths = []
+    for rows in (50, 80):
+        path = tmp_path / f"history_{rows}.xlsx"
+        write_workbook(raw_history.head(rows), path)
+        paths.append(str(path))
+    return paths
+
+
+def test_dataset_resource_per_path(workbooks, tmp_path):
+    bu = f"Registry{tmp_path.name}"
+    first, second = (dataset_resource(bu, path) for path in workbooks)
+    assert first is not second
+    assert len(first.get().value) == 50 and len(second.get().value) == 80
+    assert dataset_resource(bu, workbooks[0]) is first
+    # the BU's own history is another resource again
+    assert dataset_resource(bu) not in (first, second)
+
+
+def test_page_specs():
+    for name, cfg in Pages.items():
+        spec = page_spec(name)
+        assert spec.bu == cfg["bu"] and spec.title == cfg["title"].format(bu=cfg["bu"])
+        assert spec.model_names == cfg["models"]
+        for model in spec.models:
+            assert list(model.features) == Models[model.name]["features"]
+            assert all(f"models/{spec.bu}/" in p for p in (model.model, model.backtest) if p)
+
+    other = page_spec("Ops System", bu="Other")
+    assert other.title.startswith("Other") and other.model("Diesel").model == "models/Other/Diesel.joblib"
+    with pytest.raises(ValueError):
+        page_spec("No such page")
+    with pytest.raises(ValueError):
+        other.model("No such model")
+
+
+def test_every_feature_has_a_label():
+    for name in Models:
+        spec = model_spec(name, "Mafube")
+        for feature in spec.features:
+            assert spec.input_label(feature) == f"Enter {Feature_labels[feature]}"
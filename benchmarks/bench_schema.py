@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from costsim.schema import _driver_pairs, compact, memory_report
+from dictionaries import Schemas, schema_tolerance
+
+
+def _moved(before, after):
+    return abs(after - before) / max(abs(before), 1e-12)
+
+
+def test_compact(bench, history):
+    compacted, kept = bench(compact, history)
+    assert not kept
+    report = memory_report(history, compacted)
+    assert report.loc["Total", "bytes after"] < report.loc["Total", "bytes before"]
+
+    downcast = [c for c, dtype in Schemas["history"].items() if dtype == "float32"]
+    for col in downcast:
+        assert compacted[col].dtype == np.float32
+        before = history[col].to_numpy("float64").sum()
+        assert _moved(before, compacted[col].to_numpy("float64").sum()) <= schema_tolerance
+    for price, quantity in _driver_pairs(history.columns):
+        before = (history[price].to_numpy("float64") * history[quantity].to_numpy("float64")).sum()
+        after = (compacted[price].to_numpy("float64") * compacted[quantity].to_numpy("float64")).sum()
+        assert _moved(before, after) <= schema_tolerance
+
+
+def test_column_that_moves_is_kept(history):
+    df = history.copy()
+    # float32 rounds 1e8 + 1 to 1e8, so the column's total (n / 2) would vanish
+    df["OB (T)"] = np.where(np.arange(len(df)) % 2 == 0, 100_000_001.0, -100_000_000.0)
+    compacted, kept = compact(df)
+    assert kept == ["OB (T)"]
+    assert compacted["OB (T)"].dtype == np.float64
+    assert compacted["OB (T)"].sum() == df["OB (T)"].sum()
+    assert compacted["ROM (T)"].dtype == np.float32
+
+
+def test_code_column_becomes_category(history):
+    codes = np.array(["MAF-OB", "MAF-ROM", "MAF-PLANT"], dtype=object)
+    df = history.assign(Code=codes[np.arange(len(history)) % 3])
+    compacted, kept = compact(df, {**Schemas["history"], "Code": "category"})
+    assert not kept
+    assert isinstance(compacted["Code"].dtype, pd.CategoricalDtype)
+    assert compacted["Code"].astype(object).tolist() == df["Code"].tolist()
+    report = memory_report(df, compacted)
+    assert report.loc["Code", "bytes after"] < report.loc["Code", "bytes before"]
+    # totals per code are unchanged
+    value = "Diesel (R)"
+    np.testing.assert_allclose(
+        compacted.groupby("Code", observed=True)[value].sum().sort_index().to_numpy(),
+        df.groupby("Code")[value].sum().sort_index().to_numpy(),
+    )
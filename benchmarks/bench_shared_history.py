@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from costsim.ingest import HistoryStore
+from costsim.metrics import private_memory
+from costsim.shared_history import SharedHistory
+from synthetic import as_loaded, make_history
+
+
+@pytest.fixture
+def shared(history, tmp_path):
+    store = SharedHistory("bench", directory=tmp_path)
+    store.publish(history)
+    yield store
+    store.cleanup()
+
+
+def test_publish(bench, history, tmp_path):
+    store = SharedHistory("bench", directory=tmp_path)
+    bench(store.publish, history, rounds=5)
+
+
+def _attach_fresh(store):
+    # a new worker: nothing mapped yet
+    store._attached = None
+    return store.attach()[1]
+
+
+def test_attach(bench, shared, history):
+    df = bench(_attach_fresh, shared)
+    assert df.shape == history.select_dtypes("number").shape
+    assert not df["Diesel (R)"].to_numpy().flags.writeable
+
+
+def test_publish_without_numeric_columns(history, tmp_path):
+    store = SharedHistory("dates_only", directory=tmp_path)
+    store.publish(history[[]])
+    df = store.attach()[1]
+    assert df.empty and len(df.index) == len(history)
+
+
+def test_store_reads_mapped_columns(shared, history):
+    mapped = _attach_fresh(shared)
+    store = HistoryStore.from_frame(mapped, borrow=True)
+    frame = store.to_frame()
+    assert np.shares_memory(frame["Diesel (R)"].to_numpy(), mapped["Diesel (R)"].to_numpy())
+
+    rows = history.iloc[-3:][store.columns].copy()
+    rows.index = pd.date_range(history.index.max() + pd.Timedelta(days=1), periods=3, name="Date")
+    store.append(rows)
+    # the tail is the worker's own: the mapping is never written
+    assert len(store) == len(mapped) + 3
+    assert not np.shares_memory(store.to_frame()["Diesel (R)"].to_numpy(), mapped["Diesel (R)"].to_numpy())
+    assert mapped["Diesel (R)"].to_numpy()[-3:].tolist() == history["Diesel (R)"].to_numpy()[-3:].tolist()
+
+
+@pytest.mark.skipif(private_memory() is None, reason="needs /proc/self/smaps_rollup")
+def test_worker_memory_with_store(tmp_path):
+    # big enough that a private copy would dwarf allocator noise
+    history = as_loaded(make_history(400_000))
+    shared = SharedHistory("rss", directory=tmp_path)
+    shared.publish(history)
+    del history
+    mapped = _attach_fresh(shared)
+    size = sum(mapped[c].to_numpy().nbytes for c in mapped.columns)
+
+    before = private_memory()
+    store = HistoryStore.from_frame(mapped, borrow=True)
+    store.to_frame()
+    store.range_sum("Diesel (R)", mapped.index.min(), mapped.index.max())
+    grown = private_memory() - before
+    shared.cleanup()
+    # month sums and one column's running sums; no copy of the rows
+    assert grown < size / 4
@@ -0,0 +1,69 @@
+import pytest
+
+from synthetic import EXCEL_MAX_ROWS, SIZES, write_workbook
+from utils import (
+    get_data,
+    prepare_diesel_data,
+    apply_epbcs_and_simulation,
+    calculate_scenario_metrics,
+    create_monthly_chart,
+    create_cumulative_chart,
+    create_cost_drivers_table,
+)
+
+
+@pytest.fixture(scope="session")
+def workbook(raw_history, size, tmp_path_factory):
+    if SIZES[size] > EXCEL_MAX_ROWS:
+        pytest.skip("get_data reads Excel, which cannot hold this many rows")
+    path = tmp_path_factory.mktemp("data") / f"history_{size}.xlsx"
+    write_workbook(raw_history, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def monthly(history):
+    return prepare_diesel_data(history.copy())
+
+
+@pytest.fixture(scope="session")
+def enriched(monthly):
+    return apply_epbcs_and_simulation(monthly, None)
+
+
+def test_get_data(bench, workbook):
+    df = bench(get_data, workbook, rounds=3)
+    assert not df.empty
+
+
+def test_prepare_diesel_data(bench, history):
+    monthly = bench(prepare_diesel_data, history)
+    assert len(monthly) <= 12
+
+
+def test_apply_epbcs_synthetic(bench, monthly):
+    out = bench(apply_epbcs_and_simulation, monthly, None)
+    assert "EPBCS" in out.columns
+
+
+def test_apply_epbcs_scenario(bench, monthly, raw_history):
+    out = bench(apply_epbcs_and_simulation, monthly, raw_history)
+    assert "Simulation" in out.columns
+
+
+def test_calculate_scenario_metrics(bench, history):
+    metrics = bench(calculate_scenario_metrics, history)
+    assert metrics["total_t_actual"] > 0
+
+
+def test_create_monthly_chart(bench, enriched):
+    bench(create_monthly_chart, enriched, "406105")
+
+
+def test_create_cumulative_chart(bench, enriched):
+    bench(create_cumulative_chart, enriched, "406105")
+
+
+def test_create_cost_drivers_table(bench, enriched):
+    html = bench(create_cost_drivers_table, enriched)
+    assert "<table>" in html
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from costsim.variance import decompose, waterfall_steps
+
+
+def test_decompose(bench, history):
+    result = bench(decompose, history)
+    assert not result.empty
+    # every month has budget quantities and tonnage: the effects explain it all
+    assert result["residual"].abs().max() < 1e-6 * result["actual"].abs().max()
+
+
+def test_decompose_by_hand():
+    index = pd.DatetimeIndex(["2024-03-01", "2024-03-02"], name="Date")
+    df = pd.DataFrame(
+        {
+            "Price (R/l)": [10.0, 10.0],
+            "Quantity (l)": [100.0, 120.0],
+            "OB (T)": [50.0, 60.0],
+            "ROM (T)": [50.0, 30.0],
+            "Price (R/l) Budget": [8.0, 8.0],
+            "Quantity (l) Budget": [90.0, 90.0],
+            "OB (T) Budget": [40.0, 50.0],
+            "ROM (T) Budget": [50.0, 40.0],
+        },
+        index=index,
+    )
+    row = decompose(df).iloc[0]
+    # actual 2 200 = R10 x 220 l over 190 t; budget 1 440 = R8 x 180 l, 1 l/t
+    assert row["budget"] == 1440 and row["actual"] == 2200
+    assert row["price"] == pytest.approx((10 - 8) * 220)
+    assert row["rate"] == pytest.approx(8 * (220 - 1 * 190))
+    assert row["OB tonnage"] == pytest.approx(8 * 1 * (110 - 90))
+    assert row["ROM tonnage"] == pytest.approx(8 * 1 * (80 - 90))
+    assert row["residual"] == pytest.approx(0)
+
+
+def test_waterfall_steps(bench, history):
+    result = decompose(history)
+    steps = bench(waterfall_steps, result, "Diesel")
+    assert steps.index[0] == "budget" and steps.index[-1] == "actual"
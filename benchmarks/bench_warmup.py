@@ -0,0 +1,75 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+
+from costsim.warmup import default_tasks, warm_up
+from costsim.watcher import WATCHER
+from synthetic import write_workbook
+from utils import get_data
+
+N_MODELS = 6
+PAGE = str(Path(__file__).resolve().parent.parent / "pages" / "Mining_System.py")
+
+
+@pytest.fixture(scope="module")
+def cold_tasks(raw_history, tmp_path_factory):
+    """Loaders with no caching in between, like a cold server."""
+    folder = tmp_path_factory.mktemp("warmup")
+    workbook = folder / "history.xlsx"
+    write_workbook(raw_history.head(20_000), workbook)
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1e6, size=(5_000, 4))
+    y = X @ np.array([0.2, 0.1, 0.05, 0.3])
+    tasks = [("workbook", lambda: get_data(workbook))]
+    for i in range(N_MODELS):
+        path = folder / f"model_{i}.joblib"
+        joblib.dump(RandomForestRegressor(n_estimators=50, random_state=i).fit(X, y), path)
+        tasks.append((f"model_{i}", lambda p=path: joblib.load(p)))
+    # stand-in for the Lottie fetch: network wait, no CPU
+    tasks.append(("asset", lambda: time.sleep(0.2)))
+    return tasks
+
+
+def _serial(tasks):
+    for _, loader in tasks:
+        loader()
+
+
+def test_load_serial(bench, cold_tasks):
+    bench(_serial, cold_tasks, rounds=3)
+
+
+def test_load_warm_up(bench, cold_tasks):
+    report = bench(warm_up, cold_tasks, rounds=3)
+    assert not report.failed
+
+
+def _first_render():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(PAGE, default_timeout=120)
+    at.run()
+    assert not at.exception
+
+
+def _cold():
+    WATCHER.resources.clear()
+
+
+def _warm():
+    WATCHER.resources.clear()
+    warm_up(default_tasks())
+
+
+@pytest.mark.parametrize("state", ["cold", "warm"])
+def test_time_to_first_interactive(bench, state):
+    """First Mining System render on a fresh process vs after warm-up."""
+    bench(_first_render, rounds=3, setup=_cold if state == "cold" else _warm)
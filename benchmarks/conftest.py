@@ -0,0 +1,141 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from synthetic import SIZES, as_loaded, make_history
+
+BASELINE_FILE = Path(__file__).with_name("baselines.json")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("costsim benchmarks")
+    group.addoption(
+        "--bench-sizes",
+        default="1k",
+        help=f"Comma separated dataset sizes to run ({', '.join(SIZES)}). Default: 1k",
+    )
+    group.addoption(
+        "--bench-threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown of the mean vs baseline that counts as a regression",
+    )
+    group.addoption(
+        "--bench-save-baseline",
+        action="store_true",
+        help=f"Write this run's means to {BASELINE_FILE.name}",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        wanted = [s.strip() for s in metafunc.config.getoption("--bench-sizes").split(",")]
+        unknown = set(wanted) - set(SIZES)
+        if unknown:
+            raise pytest.UsageError(f"Unknown --bench-sizes: {', '.join(sorted(unknown))}")
+        metafunc.parametrize("size", wanted, scope="session")
+
+
+@pytest.fixture(scope="session")
+def raw_history(size):
+    return make_history(SIZES[size])
+
+
+@pytest.fixture(scope="session")
+def history(raw_history):
+    return as_loaded(raw_history)
+
+
+# -------------------------------------------------------------------
+# BASELINES
+# -------------------------------------------------------------------
+_results = {}
+
+
+@pytest.fixture
+def bench(benchmark, request):
+    """
+    Wraps pytest-benchmark's fixture and records the mean so the session can
+    compare it against baselines.json.
+    """
+
+    def run(func, *args, rounds=None, setup=None, **kwargs):
+        if rounds is None and setup is None:
+            result = benchmark(func, *args, **kwargs)
+        else:
+            # `setup` runs untimed before every round
+            result = benchmark.pedantic(
+                func, args=args, kwargs=kwargs, rounds=rounds or 5, iterations=1, setup=setup
+            )
+        stats = getattr(benchmark, "stats", None)
+        if stats is not None:
+            _results[request.node.name] = stats.stats.mean
+        return result
+
+    return run
+
+
+def _load_baseline():
+    if not BASELINE_FILE.exists():
+        return {}
+    return json.loads(BASELINE_FILE.read_text())
+
+
+def _regressions(baseline, threshold):
+    out = []
+    for name, mean in sorted(_results.items()):
+        base = baseline.get(name)
+        if base and mean > base * (1 + threshold):
+            out.append((name, base, mean))
+    return out
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not _results:
+        return
+
+    if config.getoption("--bench-save-baseline"):
+        baseline = _load_baseline()
+        baseline.update(_results)
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        return
+
+    if not BASELINE_FILE.exists():
+        # without a baseline nothing can be flagged; don't pass silently
+        config._costsim_missing_baseline = True
+        if exitstatus == 0:
+            session.exitstatus = 1
+        return
+
+    baseline = _load_baseline()
+    regressions = _regressions(baseline, config.getoption("--bench-threshold"))
+    config._costsim_regressions = regressions
+    config._costsim_unbaselined = sorted(set(_results) - set(baseline))
+    if regressions and exitstatus == 0:
+        session.exitstatus = 1
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if getattr(config, "_costsim_missing_baseline", False):
+        terminalreporter.section("benchmark baseline missing", red=True)
+        terminalreporter.line(
+            f"{BASELINE_FILE} not found: run `python -m pytest --bench-save-baseline` to record one",
+            red=True,
+        )
+        return
+    unbaselined = getattr(config, "_costsim_unbaselined", [])
+    if unbaselined:
+        terminalreporter.section("benchmarks without a baseline")
+        for name in unbaselined:
+            terminalreporter.line(name)
+    regressions = getattr(config, "_costsim_regressions", [])
+    if not regressions:
+        return
+    threshold = config.getoption("--bench-threshold")
+    terminalreporter.section(f"benchmark regressions (> {threshold:.0%} vs baseline)")
+    for name, base, mean in regressions:
+        terminalreporter.line(
+            f"{name}: {base * 1000:.3f} ms -> {mean * 1000:.3f} ms ({mean / base - 1:+.0%})"
+        )
@@ -0,0 +1,90 @@
+"""
+Synthetic history matching the Data.xlsx schema.
+
+Used by the benchmark suite so stages can be timed at sizes far beyond the
+real workbook. Values are drawn around the ranges seen in Data.xlsx.
+"""
+
+import numpy as np
+import pandas as pd
+
+SIZES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "10M": 10_000_000,
+}
+
+# Excel sheets stop at 1,048,576 rows, so get_data can't be fed more than this.
+EXCEL_MAX_ROWS = 1_048_575
+
+DATA_COLUMNS = [
+    "Con rate (l/t)",
+    "Con rate (l/t) Budget",
+    "OB (T)",
+    "OB (T) Budget",
+    "ROM (T)",
+    "ROM (T) Budget",
+    "Quantity (l)",
+    "Quantity (l) Budget",
+    "Price (R/l)",
+    "Price (R/l) Budget",
+    "Diesel (R)",
+    "Diesel (R) Budget",
+]
+
+
+def make_history(n_rows: int, seed: int = 0, days: int = 3 * 365) -> pd.DataFrame:
+    """
+    Raw rows as they come out of the workbook: a `Date` column plus the
+    actual/budget pairs. Large sizes pack several rows into each day (shift
+    level data) so dates stay inside pandas' Timestamp range.
+    """
+    rng = np.random.default_rng(seed)
+    rows_per_day = max(1, -(-n_rows // days))
+    day_offsets = np.arange(n_rows) // rows_per_day
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(day_offsets, unit="D")
+
+    ob = rng.uniform(50_000, 220_000, n_rows)
+    rom = rng.uniform(10_000, 56_000, n_rows)
+    con = rng.uniform(0.2, 0.5, n_rows)
+    price = rng.uniform(18.0, 24.75, n_rows)
+
+    ob_b = ob * rng.normal(1.0, 0.05, n_rows)
+    rom_b = rom * rng.normal(1.0, 0.05, n_rows)
+    con_b = con * rng.normal(1.0, 0.05, n_rows)
+    price_b = price * rng.normal(1.0, 0.02, n_rows)
+
+    qty = con * (ob + rom)
+    qty_b = con_b * (ob_b + rom_b)
+
+    return pd.DataFrame(
+        {
+            "Date": dates,
+            "Con rate (l/t)": con,
+            "Con rate (l/t) Budget": con_b,
+            "OB (T)": ob,
+            "OB (T) Budget": ob_b,
+            "ROM (T)": rom,
+            "ROM (T) Budget": rom_b,
+            "Quantity (l)": qty,
+            "Quantity (l) Budget": qty_b,
+            "Price (R/l)": price,
+            "Price (R/l) Budget": price_b,
+            "Diesel (R)": price,
+            "Diesel (R) Budget": price_b,
+        }
+    )
+
+
+def as_loaded(raw: pd.DataFrame) -> pd.DataFrame:
+    """What get_data() returns for `raw`, without going through Excel."""
+    df = raw.set_index("Date").sort_index()
+    df["year_month"] = df.index.year * 100 + df.index.month
+    df["year"] = df.index.year
+    return df
+
+
+def write_workbook(raw: pd.DataFrame, path) -> None:
+    if len(raw) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(raw)} rows do not fit in one Excel sheet")
+    raw.to_excel(path, index=False)
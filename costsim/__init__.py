@@ -0,0 +1,17 @@
+"""
+Headless cost simulation engine.
+
+Runs the same pipeline as the Mining System page (get_data →
+prepare_diesel_data → apply_epbcs_and_simulation →
+calculate_scenario_metrics) without importing streamlit, so it can be used
+from batch jobs and the ``costsim`` command line.
+"""
+
+from costsim.pipeline import PipelineResult, run_batch, run_pipeline, write_outputs
+
+__all__ = [
+    "PipelineResult",
+    "run_batch",
+    "run_pipeline",
+    "write_outputs",
+]
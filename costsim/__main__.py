@@ -0,0 +1,5 @@
+import sys
+
+from costsim.cli import main
+
+sys.exit(main())
@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+
+from costsim.pipeline import run_batch
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="costsim",
+        description="Run the diesel cost pipeline headless over one or more workbooks.",
+    )
+    parser.add_argument("inputs", nargs="+", help="Data workbooks (same layout as Data.xlsx)")
+    parser.add_argument("-o", "--out-dir", default="costsim_output", help="Output directory")
+    parser.add_argument("-f", "--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("-s", "--scenario", help="Optional scenario workbook (EPBCS / Simulation)")
+    parser.add_argument("--start", help="First date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date to include (YYYY-MM-DD)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Parallel worker processes")
+    parser.add_argument("--json", action="store_true", help="Print timings as JSON")
+    parser.add_argument("--memory", action="store_true", help="Trace peak memory per stage (slower)")
+    parser.add_argument("--profile-log", help="Append per-stage records to this JSON lines file")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    results = run_batch(
+        args.inputs,
+        out_dir=args.out_dir,
+        fmt=args.format,
+        scenario_file=args.scenario,
+        start=args.start,
+        end=args.end,
+        workers=args.workers,
+        track_memory=args.memory,
+    )
+
+    if args.profile_log:
+        for r in results:
+            r.recorder.append_jsonl(args.profile_log)
+
+    if args.json:
+        payload = [{"source": r.source, "timings": r.timings} for r in results]
+        json.dump(payload, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    for r in results:
+        print(f"{r.source}  ({r.total_seconds:.3f}s)")
+        for stage, seconds in r.timings.items():
+            print(f"  {stage:<28} {seconds * 1000:10.1f} ms")
+    return 0
@@ -0,0 +1,64 @@
+"""
+Copy-on-write dict for snapshot aggregates.
+
+`CowDict` splits its keys into buckets by hash. `copy()` shares every bucket
+with the original and a bucket is copied the first time either side sets a
+key in it, so a copy costs O(buckets) and each change O(bucket size) rather
+than O(len). Values are shared too: replace them, never change them in place.
+"""
+
+_BUCKETS = 256
+
+
+class CowDict:
+    def __init__(self, items=(), buckets: int = _BUCKETS):
+        self._buckets = [{} for _ in range(buckets)]
+        self._owned = [True] * buckets
+        self._len = 0
+        for key, value in dict(items).items():
+            self[key] = value
+
+    def _bucket(self, key) -> dict:
+        return self._buckets[hash(key) % len(self._buckets)]
+
+    def get(self, key, default=None):
+        return self._bucket(key).get(key, default)
+
+    def __getitem__(self, key):
+        return self._bucket(key)[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._bucket(key)
+
+    def __setitem__(self, key, value) -> None:
+        i = hash(key) % len(self._buckets)
+        if not self._owned[i]:
+            self._buckets[i] = dict(self._buckets[i])
+            self._owned[i] = True
+        bucket = self._buckets[i]
+        if key not in bucket:
+            self._len += 1
+        bucket[key] = value
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for bucket in self._buckets:
+            yield from bucket.items()
+
+    def copy(self) -> "CowDict":
+        out = CowDict.__new__(CowDict)
+        out._buckets = list(self._buckets)
+        out._len = self._len
+        # every bucket is shared now: the first write on either side copies it
+        out._owned = [False] * len(self._buckets)
+        self._owned = [False] * len(self._buckets)
+        return out
@@ -0,0 +1,175 @@
+"""
+Materialised aggregate cube: system × category × element code × year-month,
+with actual / budget / forecast measures.
+
+Every leaf cell is also added into all of its roll-ups (any dimension replaced
+by ALL), so totals such as "Mining System" or "Consumables in Mining System"
+are a single dict lookup. New rows are folded in with `update`, which only
+touches the cells the rows fall into.
+"""
+
+import threading
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from costsim.cow import CowDict
+from dictionaries import Columns, Elements, Variable
+
+ALL = None
+MEASURES = ("actual", "budget", "forecast")
+_MEASURE_INDEX = {m: i for i, m in enumerate(MEASURES)}
+
+
+def element_leaves(system: str) -> list[tuple]:
+    """(category, element name, code) for every element of `system` with data columns."""
+    leaves = []
+    for category in Variable.get(system, []):
+        for name, code in Elements.get(category, {}).items():
+            if name in Columns:
+                leaves.append((category, name, code))
+    return leaves
+
+
+def year_month_of(index: pd.DatetimeIndex) -> np.ndarray:
+    return np.asarray(index.year * 100 + index.month)
+
+
+class CostCube:
+    def __init__(self):
+        # (system, category, code, year_month) with ALL wildcards → [actual, budget, forecast];
+        # cells are replaced, never changed in place, so copies can share them
+        self._cells = CowDict()
+        self.periods = set()
+        self._lock = threading.Lock()
+
+    # ----- building -----
+    @classmethod
+    def from_frames(cls, frames: dict) -> "CostCube":
+        """`frames` maps system name → frame as returned by get_data()."""
+        cube = cls()
+        for system, df in frames.items():
+            cube.update(system, df)
+        return cube
+
+    def copy(self) -> "CostCube":
+        """A cube sharing this one's cells until either is updated (copy-on-write)."""
+        with self._lock:
+            out = CostCube()
+            out._cells = self._cells.copy()
+            out.periods = set(self.periods)
+            return out
+
+    def _add(self, system, category, code, period, values) -> None:
+        self.periods.add(period)
+        for key in product((system, ALL), (category, ALL), (code, ALL), (period, ALL)):
+            cell = self._cells.get(key)
+            self._cells[key] = values.copy() if cell is None else cell + values
+
+    def update(self, system: str, rows: pd.DataFrame) -> None:
+        """Fold new daily rows (get_data layout, DatetimeIndex) into the cube."""
+        if rows.empty:
+            return
+        periods = (
+            rows["year_month"].to_numpy()
+            if "year_month" in rows.columns
+            else year_month_of(rows.index)
+        )
+        for category, name, code in element_leaves(system):
+            cols = Columns[name]
+            measures = pd.DataFrame(
+                {
+                    m: rows[cols[m]].to_numpy(dtype="float64")
+                    if m in cols and cols[m] in rows.columns
+                    else np.zeros(len(rows))
+                    for m in MEASURES
+                }
+            )
+            monthly = measures.groupby(periods).sum()
+            with self._lock:
+                for period, values in zip(monthly.index, monthly.to_numpy()):
+                    self._add(system, category, code, int(period), np.nan_to_num(values))
+
+    def set_forecast(self, system, category, code, forecast: pd.Series) -> None:
+        """Replace the forecast measure of one element; `forecast` is indexed by year_month."""
+        idx = _MEASURE_INDEX["forecast"]
+        with self._lock:
+            for period, value in forecast.items():
+                period = int(period)
+                current = self._cells.get((system, category, code, period))
+                delta = np.zeros(len(MEASURES))
+                delta[idx] = float(value) - (current[idx] if current is not None else 0.0)
+                self._add(system, category, code, period, delta)
+
+    # ----- queries -----
+    def value(self, system=ALL, category=ALL, code=ALL, period=ALL, measure="actual") -> float:
+        with self._lock:
+            cell = self._cells.get((system, category, code, period))
+            return 0.0 if cell is None else float(cell[_MEASURE_INDEX[measure]])
+
+    def total(self, system=ALL, category=ALL, code=ALL, periods=None, measure="actual") -> float:
+        """Roll-up over all periods (one lookup) or over an iterable of year_month keys."""
+        if periods is None:
+            return self.value(system, category, code, ALL, measure)
+        return sum(self.value(system, category, code, p, measure) for p in periods)
+
+    def series(self, system=ALL, category=ALL, code=ALL, measure="actual") -> pd.Series:
+        with self._lock:
+            periods = sorted(self.periods)
+        return pd.Series(
+            [self.value(system, category, code, p, measure) for p in periods],
+            index=pd.Index(periods, name="year_month"),
+            name=measure,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Leaf cells only, one row per system/category/code/period."""
+        with self._lock:
+            rows = [
+                (*key, *cell)
+                for key, cell in self._cells.items()
+                if ALL not in key
+            ]
+        return pd.DataFrame(
+            rows, columns=["system", "category", "code", "year_month", *MEASURES]
+        ).sort_values(["system", "category", "code", "year_month"], ignore_index=True)
+
+
+def periods_between(start, end) -> list[int]:
+    """year_month keys covering the dates from `start` to `end` inclusive."""
+    months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq="M")
+    return [p.year * 100 + p.month for p in months]
+
+
+def range_total(cube: CostCube, pyramid, start, end, system, category=ALL, code=ALL, measure="actual") -> float:
+    """
+    Cube total over the dates `start` to `end` inclusive. Whole months come
+    from the cube; the days of the first and last month that fall outside
+    the range are taken off again from `pyramid`'s day level (an
+    AggregatePyramid over the same history as `system`).
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    if start > end:
+        start, end = end, start
+    total = cube.total(system, category, code, periods=periods_between(start, end), measure=measure)
+
+    columns = []
+    for leaf_category, name, leaf_code in element_leaves(system):
+        if category not in (ALL, leaf_category) or code not in (ALL, leaf_code):
+            continue
+        column = Columns[name].get(measure)
+        if column in pyramid.columns:
+            columns.append(column)
+    if not columns:
+        return total
+
+    outside = []
+    month_start, month_end = start.replace(day=1), end + pd.offsets.MonthEnd(0)
+    if start > month_start:
+        outside.append((month_start, start - pd.Timedelta(days=1)))
+    if end < month_end:
+        outside.append((end + pd.Timedelta(days=1), month_end))
+    for first, last in outside:
+        total -= float(pyramid.frame("Day", first, last)[columns].to_numpy().sum())
+    return total
@@ -0,0 +1,156 @@
+"""
+Process-wide cache for the scenario driver diagram.
+
+Diagrams are keyed by a hash of the twelve metric values, so every session
+looking at the same scenario shares one entry. When the mermaid CLI (`mmdc`)
+is available the SVG is pre-rendered once in the background; pages then show
+the static SVG and the browser does no Mermaid layout at all. Without it the
+Mermaid source is shown as before, under a key that stays stable for an
+unchanged scenario so the component isn't re-laid out on reruns. A failed
+render leaves that diagram on its Mermaid source; the CLI is tried again
+after a backoff that doubles with each consecutive failure.
+
+Environment:
+- COSTSIM_MMDC        path to the mermaid CLI (default: `mmdc` on PATH, "" disables)
+- COSTSIM_DIAGRAM_DIR directory to keep rendered SVGs across restarts
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from costsim.metrics import record_cache
+from costsim.prediction_cache import quantise
+
+log = logging.getLogger(__name__)
+
+
+def diagram_key(values) -> str:
+    """Stable hash of the metric values (NaN-safe, rounded to 6 significant digits)."""
+    return hashlib.sha1(repr(quantise(values)).encode()).hexdigest()[:16]
+
+
+def mermaid_cli() -> str | None:
+    path = os.environ.get("COSTSIM_MMDC")
+    if path is not None:
+        return path or None
+    return shutil.which("mmdc")
+
+
+def render_svg(source: str, cli: str, timeout: float = 60.0) -> str:
+    """Render Mermaid `source` to SVG text with the mermaid CLI."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = Path(tmp) / "diagram.mmd", Path(tmp) / "diagram.svg"
+        src.write_text(source, encoding="utf-8")
+        subprocess.run(
+            [cli, "-i", str(src), "-o", str(out), "-b", "transparent", "--quiet"],
+            check=True,
+            capture_output=True,
+            timeout=timeout,
+        )
+        return out.read_text(encoding="utf-8")
+
+
+@dataclass
+class Diagram:
+    key: str
+    source: str
+    svg: str | None = None
+
+
+class DiagramCache:
+    def __init__(
+        self,
+        maxsize: int = 256,
+        cli: str | None = None,
+        svg_dir=None,
+        retry_after: float = 30.0,
+        max_retry_after: float = 3600.0,
+    ):
+        self.maxsize = maxsize
+        self.cli = cli
+        self.svg_dir = Path(svg_dir) if svg_dir else None
+        # after a failed render the CLI rests, doubling per consecutive failure
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self._failures = 0
+        self._retry_at = 0.0
+        self._data = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diagram-svg")
+
+    def _svg_path(self, key):
+        return self.svg_dir / f"{key}.svg" if self.svg_dir else None
+
+    def get(self, values, build) -> Diagram:
+        """
+        Cached diagram for `values`; `build(*values)` produces the Mermaid
+        source on a miss. The SVG (if any) fills in once rendered.
+        """
+        key = diagram_key(values)
+        with self._lock:
+            diagram = self._data.get(key)
+            if diagram is not None:
+                self._data.move_to_end(key)
+        record_cache("diagram", hit=diagram is not None)
+
+        if diagram is None:
+            diagram = Diagram(key, build(*values))
+            path = self._svg_path(key)
+            if path is not None and path.exists():
+                diagram.svg = path.read_text(encoding="utf-8")
+            with self._lock:
+                diagram = self._data.setdefault(key, diagram)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+        if diagram.svg is None and self.cli and time.monotonic() >= self._retry_at:
+            self._schedule(diagram)
+        return diagram
+
+    def _schedule(self, diagram: Diagram) -> None:
+        with self._lock:
+            if diagram.key in self._pending:
+                return
+            self._pending.add(diagram.key)
+        self._pool.submit(self._render, diagram)
+
+    def _render(self, diagram: Diagram) -> None:
+        try:
+            svg = render_svg(diagram.source, self.cli)
+        except (OSError, subprocess.SubprocessError) as e:
+            # this diagram keeps its Mermaid source; renders resume after a backoff
+            with self._lock:
+                self._failures += 1
+                wait = min(self.retry_after * 2 ** (self._failures - 1), self.max_retry_after)
+                self._retry_at = time.monotonic() + wait
+                self._pending.discard(diagram.key)
+            log.warning("mermaid CLI failed for diagram %s (retrying in %.0fs): %s", diagram.key, wait, e)
+            return
+        try:
+            diagram.svg = svg
+            path = self._svg_path(diagram.key)
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(svg, encoding="utf-8")
+        finally:
+            with self._lock:
+                self._failures = 0
+                self._retry_at = 0.0
+                self._pending.discard(diagram.key)
+
+
+DIAGRAMS = DiagramCache(
+    cli=mermaid_cli(), svg_dir=os.environ.get("COSTSIM_DIAGRAM_DIR") or None
+)
@@ -0,0 +1,140 @@
+"""
+Correlation and scaling engine for the Exploratory Analysis view.
+
+Per dataset version the full correlation matrix and per-column min/max are
+computed once; a variable selection is then a slice of the matrix, and
+min-max scaling is one broadcasted subtract/divide. Engines are shared by
+every session through `ENGINES`. Figures and rolling series are kept per
+selection in small LRU caches, so a long-running server stays bounded.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+from costsim.metrics import record_cache
+
+
+class EdaEngine:
+    def __init__(self, df: pd.DataFrame, max_cached: int = 32):
+        self.df = df
+        self.numeric = df.select_dtypes("number")
+        self.max_cached = max_cached
+        self._corr = None
+        self._rolling = OrderedDict()
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+        values = self.numeric.to_numpy(dtype="float64")
+        with np.errstate(all="ignore"):
+            self.col_min = pd.Series(np.nanmin(values, axis=0), index=self.numeric.columns)
+            self.col_max = pd.Series(np.nanmax(values, axis=0), index=self.numeric.columns)
+
+    @property
+    def columns(self) -> list:
+        return list(self.numeric.columns)
+
+    def _lookup(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_cached:
+                cache.popitem(last=False)
+        return value
+
+    @instrumented("eda_full_corr")
+    def _full_corr(self) -> pd.DataFrame:
+        return self.numeric.corr()
+
+    def corr(self, variables=None) -> pd.DataFrame:
+        """Correlation matrix for `variables` (all numeric columns by default)."""
+        with self._lock:
+            if self._corr is None:
+                self._corr = self._full_corr()
+        if variables is None:
+            return self._corr
+        variables = [v for v in variables if v in self._corr.columns]
+        return self._corr.loc[variables, variables]
+
+    def corr_figure(self, variables, builder) -> dict:
+        """
+        `builder(corr)` for this selection as a plain figure dict, built once
+        per variable selection and dataset version.
+        """
+        key = (builder.__name__, tuple(variables))
+        cached = self._lookup(self._figures, key)
+        record_cache("eda_figure", hit=cached is not None)
+        if cached is not None:
+            return cached
+        return self._remember(self._figures, key, builder(self.corr(variables)).to_dict())
+
+    def scaled(self, variables) -> pd.DataFrame:
+        """Min-max scaled copy of `variables`; constant columns become 0."""
+        variables = [v for v in variables if v in self.numeric.columns]
+        lo = self.col_min[variables].to_numpy()
+        span = (self.col_max[variables] - self.col_min[variables]).to_numpy()
+        span = np.where(span == 0, 1.0, span)
+        values = (self.numeric[variables].to_numpy(dtype="float64") - lo) / span
+        return pd.DataFrame(values, index=self.numeric.index, columns=variables)
+
+    def rolling_corr(self, x: str, y: str, window: int) -> pd.Series:
+        """
+        Correlation of `x` and `y` over the trailing `window` calendar days
+        (however many rows those hold). Needs a sorted DatetimeIndex.
+        """
+        key = (x, y, int(window))
+        cached = self._lookup(self._rolling, key)
+        if cached is not None:
+            return cached
+        series = self.numeric[x].rolling(f"{int(window)}D", min_periods=max(2, window // 2)).corr(
+            self.numeric[y]
+        )
+        series.name = f"{x} ~ {y}"
+        return self._remember(self._rolling, key, series)
+
+    def windowed_corr(self, variables, freq: str = "QE") -> pd.DataFrame:
+        """
+        Pairwise correlations per calendar window (quarter by default), one
+        row per window, columns named "a ~ b". Needs a DatetimeIndex.
+        """
+        variables = [v for v in variables if v in self.numeric.columns]
+        grouped = self.numeric[variables].groupby(pd.Grouper(freq=freq)).corr()
+        pairs = [
+            (a, b) for i, a in enumerate(variables) for b in variables[i + 1 :]
+        ]
+        out = pd.DataFrame(
+            {f"{a} ~ {b}": grouped.xs(a, level=1)[b] for a, b in pairs}
+        )
+        out.index.name = self.numeric.index.name
+        return out
+
+
+class EngineCache:
+    def __init__(self):
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, df) -> EdaEngine:
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is not None and entry[0] == version:
+                record_cache("eda", hit=True)
+                return entry[1]
+        record_cache("eda", hit=False)
+        engine = EdaEngine(df() if callable(df) else df)
+        with self._lock:
+            self._engines[key] = (version, engine)
+        return engine
+
+
+ENGINES = EngineCache()
@@ -0,0 +1,139 @@
+"""
+Feature engineering for the Ops System models.
+
+The history from get_data() is rolled up to calendar months once, then every
+derived series gets its lags and rolling means in a single shift/rolling pass
+over the whole frame. The resulting matrix (one row per year_month) is cached per
+dataset version, so building the inputs for any month is a row lookup.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+from dictionaries import Models
+
+# Monthly series derived from the raw history: name → columns summed together.
+SERIES = {
+    "TTH": ["OB (T)", "ROM (T)"],
+    "OB": ["OB (T)"],
+    "ROM": ["ROM (T)"],
+    "Diesel": ["Quantity (l)"],
+    "Diesel_Cost": ["Diesel (R)"],
+}
+
+# Feature order each model was trained on (declared in dictionaries.Models).
+MODEL_FEATURES = {name: list(spec["features"]) for name, spec in Models.items()}
+
+LAGS = (1, 2, 3)
+WINDOWS = (3, 6)
+
+
+def next_year_month(year_month: int, months: int = 1) -> int:
+    y, m = divmod(int(year_month), 100)
+    total = y * 12 + (m - 1) + months
+    return (total // 12) * 100 + total % 12 + 1
+
+
+def complete_months(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop a trailing month whose data stops before month end (it would read as a dip)."""
+    if df.empty:
+        return df
+    last = df.index.max()
+    if last.is_month_end:
+        return df
+    return df[df.index < last.to_period("M").start_time]
+
+
+@instrumented()
+def build_feature_matrix(df: pd.DataFrame, lags=LAGS, windows=WINDOWS) -> pd.DataFrame:
+    """
+    Monthly feature matrix indexed by year_month, with the base series, their
+    lags (`X_Lag` is the previous month, `X_Lag2`… further back), rolling
+    means (`X_Roll3`…) and the Year / Year_Month keys. There is a row for
+    every calendar month, empty where the history has none, and a trailing
+    row for the month after the history carries lags only, for forecasting.
+    """
+    year_month = (
+        df["year_month"].to_numpy()
+        if "year_month" in df.columns
+        else np.asarray(df.index.year * 100 + df.index.month)
+    )
+
+    sources = sorted({c for cols in SERIES.values() for c in cols if c in df.columns})
+    monthly = df[sources].groupby(year_month).sum(min_count=1)
+
+    base = pd.DataFrame(index=monthly.index)
+    for name, cols in SERIES.items():
+        if all(c in monthly.columns for c in cols):
+            base[name] = monthly[cols].sum(axis=1, min_count=len(cols))
+
+    # every calendar month, so shift(k) is k months back even across gaps in
+    # the history, plus one so the latest actuals show up as lags of the next
+    if len(base):
+        first, last = (int(m) for m in base.index[[0, -1]])
+        months = pd.period_range(
+            pd.Period(year=first // 100, month=first % 100, freq="M"),
+            pd.Period(year=last // 100, month=last % 100, freq="M") + 1,
+            freq="M",
+        )
+        base = base.reindex(months.year * 100 + months.month)
+    base.index = base.index.astype("int64")
+    base.index.name = "year_month"
+
+    parts = [base]
+    for k in lags:
+        suffix = "_Lag" if k == 1 else f"_Lag{k}"
+        parts.append(base.shift(k).add_suffix(suffix))
+    for w in windows:
+        # mean of the w months before this one, so it's known ahead of time too
+        parts.append(base.shift(1).rolling(w, min_periods=1).mean().add_suffix(f"_Roll{w}"))
+
+    features = pd.concat(parts, axis=1)
+    features["Year"] = features.index // 100
+    features["Year_Month"] = features.index
+    return features
+
+
+def model_inputs(features: pd.DataFrame, model: str, year_months=None) -> pd.DataFrame:
+    """The columns `model` expects, in order; NaN where a feature can't be derived."""
+    rows = features if year_months is None else features.reindex(year_months)
+    return rows.reindex(columns=MODEL_FEATURES[model])
+
+
+def missing_features(features: pd.DataFrame, model: str) -> list[str]:
+    return [f for f in MODEL_FEATURES[model] if f not in features.columns]
+
+
+class FeatureCache:
+    """Keeps the feature matrix for the latest version of each dataset."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, df_or_loader) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        df = df_or_loader() if callable(df_or_loader) else df_or_loader
+        features = build_feature_matrix(df)
+        with self._lock:
+            self._entries[key] = (version, features)
+        return features
+
+
+FEATURES = FeatureCache()
+
+
+def predict_month(features: pd.DataFrame, model_name: str, model, year_month: int, overrides=None):
+    """Row lookup plus one predict() call; `overrides` fills or replaces inputs."""
+    row = model_inputs(features, model_name, [year_month]).iloc[0].to_dict()
+    row.update(overrides or {})
+    missing = [k for k, v in row.items() if pd.isna(v)]
+    if missing:
+        raise ValueError(f"No value for {', '.join(missing)} in {year_month}")
+    return model.predict([[row[f] for f in MODEL_FEATURES[model_name]]])
@@ -0,0 +1,201 @@
+"""
+Recursive multi-step forecasting.
+
+A one-step model is rolled forward month by month, feeding its own
+predictions back in as lag features. All scenario paths are advanced
+together: each horizon step is a single `predict` call on an (n_paths ×
+n_features) matrix, not one call per path and step. Exogenous drivers (TTH,
+ROM, ...) come from supplied paths or are bootstrapped from history, which
+is what gives the fan its spread.
+"""
+
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from costsim.features import MODEL_FEATURES, next_year_month
+from costsim.instrumentation import instrumented
+from dictionaries import Models
+
+_LAG = re.compile(r"^(?P<series>.+)_Lag(?P<k>\d*)$")
+QUANTILES = (0.1, 0.5, 0.9)
+
+# Series each model predicts, in feature-matrix naming.
+MODEL_TARGETS = {name: spec.get("target", name) for name, spec in Models.items()}
+
+
+def parse_lag(name: str):
+    """'TTH_Lag' → ('TTH', 1), 'Diesel_Lag3' → ('Diesel', 3), else None."""
+    m = _LAG.match(name)
+    if not m:
+        return None
+    return m.group("series"), int(m.group("k") or 1)
+
+
+@dataclass
+class Forecast:
+    months: list
+    paths: np.ndarray  # (n_paths, horizon)
+
+    def fan(self, quantiles=QUANTILES) -> pd.DataFrame:
+        q = np.nanquantile(self.paths, quantiles, axis=0)
+        return pd.DataFrame(
+            q.T,
+            index=pd.Index(self.months, name="year_month"),
+            columns=[f"p{int(round(x * 100))}" for x in quantiles],
+        )
+
+    def mean(self) -> pd.Series:
+        return pd.Series(self.paths.mean(axis=0), index=pd.Index(self.months, name="year_month"))
+
+
+# -------------------------------------------------------------------
+# EXOGENOUS PATHS
+# -------------------------------------------------------------------
+def bootstrap_paths(features, series, n_paths, horizon, seed=0) -> np.ndarray:
+    """
+    Future paths for an exogenous series by resampling its historical
+    month-on-month ratios, starting from the last actual value.
+    """
+    history = features[series].dropna().to_numpy(dtype="float64")
+    if len(history) == 0:
+        raise ValueError(f"No history for {series}")
+    if len(history) < 2:
+        return np.full((n_paths, horizon), history[-1])
+
+    ratios = history[1:] / np.where(history[:-1] == 0, np.nan, history[:-1])
+    ratios = ratios[np.isfinite(ratios)]
+    if len(ratios) == 0:
+        return np.full((n_paths, horizon), history[-1])
+
+    rng = np.random.default_rng(seed)
+    draws = rng.choice(ratios, size=(n_paths, horizon), replace=True)
+    return history[-1] * np.cumprod(draws, axis=1)
+
+
+# -------------------------------------------------------------------
+# RECURSION
+# -------------------------------------------------------------------
+@instrumented()
+def recursive_forecast(
+    model,
+    feature_names,
+    target: str,
+    features: pd.DataFrame,
+    horizon: int = 12,
+    n_paths: int = 200,
+    exogenous: dict | None = None,
+    fixed: dict | None = None,
+    seed: int = 0,
+) -> Forecast:
+    """
+    Roll `model` forward `horizon` months from the first month without an
+    actual `target` value.
+
+    `exogenous` maps series name → (n_paths, horizon) array; series the model
+    needs but that aren't given are bootstrapped. `fixed` holds constant
+    inputs (e.g. a planned Product volume). Lags reaching back before the
+    forecast start are read from `features`.
+    """
+    fixed = dict(fixed or {})
+    exogenous = dict(exogenous or {})
+
+    known = features[target].dropna() if target in features.columns else pd.Series(dtype=float)
+    start = next_year_month(known.index[-1]) if len(known) else int(features.index[-1])
+    months = [next_year_month(start, h) for h in range(horizon)]
+
+    # what each input column needs, resolved once
+    plan = []
+    for name in feature_names:
+        if name in fixed:
+            plan.append(("fixed", name, 0))
+        elif name in ("Year", "Year_Month"):
+            plan.append((name, name, 0))
+        elif (lag := parse_lag(name)) is not None:
+            plan.append(("lag", *lag))
+        else:
+            plan.append(("exog", name, 0))
+
+    needed = {s for kind, s, _ in plan if kind == "exog"}
+    needed |= {s for kind, s, _ in plan if kind == "lag" and s != target}
+    for i, series in enumerate(sorted(needed - set(exogenous))):
+        exogenous[series] = bootstrap_paths(features, series, n_paths, horizon, seed + i + 1)
+
+    preds = np.empty((n_paths, horizon))
+
+    def history_value(series, month):
+        if series in features.columns and month in features.index:
+            v = features.at[month, series]
+            if pd.notna(v):
+                return float(v)
+        raise ValueError(f"No {series} value for {month} to start the forecast from")
+
+    X = np.empty((n_paths, len(plan)))
+    for h, month in enumerate(months):
+        for j, (kind, series, k) in enumerate(plan):
+            if kind == "fixed":
+                X[:, j] = fixed[series]
+            elif kind == "Year":
+                X[:, j] = month // 100
+            elif kind == "Year_Month":
+                X[:, j] = month
+            elif kind == "exog":
+                X[:, j] = exogenous[series][:, h]
+            elif h - k >= 0:
+                source = preds if series == target else exogenous[series]
+                X[:, j] = source[:, h - k]
+            else:
+                X[:, j] = history_value(series, next_year_month(month, -k))
+        preds[:, h] = np.asarray(model.predict(X), dtype="float64").reshape(-1)
+
+    return Forecast(months, preds)
+
+
+def forecastable(model_name: str, features: pd.DataFrame) -> bool:
+    """True when every input of `model_name` can be produced from `features`."""
+    target = MODEL_TARGETS[model_name]
+    for name in MODEL_FEATURES[model_name]:
+        series = parse_lag(name)[0] if parse_lag(name) else name
+        if name in ("Year", "Year_Month") or series == target:
+            continue
+        if series not in features.columns or features[series].dropna().empty:
+            return False
+    return True
+
+
+def forecast_model(model, model_name, features, horizon=12, n_paths=200, **kwargs) -> Forecast:
+    """recursive_forecast for one of the Ops System models."""
+    return recursive_forecast(
+        model,
+        MODEL_FEATURES[model_name],
+        MODEL_TARGETS[model_name],
+        features,
+        horizon=horizon,
+        n_paths=n_paths,
+        **kwargs,
+    )
+
+
+# -------------------------------------------------------------------
+# FALLBACK MODEL
+# -------------------------------------------------------------------
+class LinearModel:
+    """Least-squares model with a sklearn-style predict(), fitted on history."""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype="float64")
+        self.intercept_ = float(intercept)
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.coef_ + self.intercept_
+
+    @classmethod
+    def fit(cls, features: pd.DataFrame, target: str, inputs) -> "LinearModel":
+        data = features[[*inputs, target]].dropna()
+        if len(data) < len(inputs) + 1:
+            raise ValueError(f"Not enough history to fit {target} on {', '.join(inputs)}")
+        A = np.column_stack([data[list(inputs)].to_numpy(), np.ones(len(data))])
+        solution, *_ = np.linalg.lstsq(A, data[target].to_numpy(), rcond=None)
+        return cls(solution[:-1], solution[-1])
@@ -0,0 +1,224 @@
+"""
+Goal seek on the driver cost formula: which price, consumption rate or
+tonnage (or a mix of them) brings cost to a target.
+
+Cost per element and month is price × con rate × (OB + ROM), the formula of
+utils.calculate_scenario_metrics, with the month's mean price and rate and
+its total tonnage. The solved drivers are scaled by factors
+
+    s_i = exp(clip(w_i · u, log(1 - limit_i), log(1 + limit_i)))
+
+so cost scales by exp(Σ_i log s_i) and each element/month cell needs one
+unknown u. Without limits that is closed form; with limits the equation is
+piecewise linear in u and vectorised Newton steps solve every element and
+month at once.
+"""
+
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+from costsim.pyramid import period_keys
+from dictionaries import Drivers
+
+DRIVER_NAMES = ("price", "rate", "tonnage")
+TARGETS = ("year", "month")
+
+
+# -------------------------------------------------------------------
+# DRIVERS
+# -------------------------------------------------------------------
+def monthly_drivers(df: pd.DataFrame, drivers: dict = Drivers) -> pd.DataFrame:
+    """
+    price, rate, tonnage and cost per (element, year_month) from a get_data()
+    frame, with the same four from the " Budget" columns as "budget <name>".
+    """
+    periods = pd.Index(period_keys(df.index, "Month"), name="year_month")
+    frames = []
+    for element, cfg in drivers.items():
+        if "rate" not in cfg:
+            continue
+        columns = {}
+        for prefix, suffix in (("", ""), ("budget ", " Budget")):
+            columns[prefix + "price"] = df[cfg["price"] + suffix].to_numpy("float64")
+            columns[prefix + "rate"] = df[cfg["rate"] + suffix].to_numpy("float64")
+            columns[prefix + "tonnage"] = sum(
+                df[col + suffix].to_numpy("float64") for col in cfg["tonnage"].values()
+            )
+        how = {name: "sum" if name.endswith("tonnage") else "mean" for name in columns}
+        month = pd.DataFrame(columns, index=periods).groupby(level=0).agg(how)
+        for prefix in ("", "budget "):
+            month[prefix + "cost"] = (
+                month[prefix + "price"] * month[prefix + "rate"] * month[prefix + "tonnage"]
+            )
+        frames.append(pd.concat({element: month}, names=["element"]))
+    if not frames:
+        raise ValueError("No element in dictionaries.Drivers has price, rate and tonnage")
+    return pd.concat(frames)
+
+
+class DriverCache:
+    """Keeps the monthly driver table for the latest version of each dataset."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, df_or_loader) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        df = df_or_loader() if callable(df_or_loader) else df_or_loader
+        table = monthly_drivers(df)
+        with self._lock:
+            self._entries[key] = (version, table)
+        return table
+
+
+MONTHLY_DRIVERS = DriverCache()
+
+
+# -------------------------------------------------------------------
+# SOLVER
+# -------------------------------------------------------------------
+def solve_factors(log_ratio, weights: dict, limits: dict | None = None, tol: float = 1e-12, max_iter: int = 50):
+    """
+    Factors per driver such that Σ_i log s_i = log_ratio, elementwise over
+    any array shape. `weights` says how the change is shared (1 each for an
+    equal relative change); `limits` caps a driver's relative change (0 to
+    1, e.g. 0.1 for ±10%).
+    Returns ({driver: factor array}, solved mask, Newton iterations).
+    """
+    log_ratio = np.asarray(log_ratio, dtype="float64")
+    limits = limits or {}
+    names = [n for n, w in weights.items() if w > 0]
+    if not names:
+        raise ValueError("Choose at least one driver to solve for")
+    bad = {n: v for n, v in limits.items() if not 0 <= v <= 1}
+    if bad:
+        raise ValueError(f"Limits are relative changes between 0 and 1, got {bad}")
+    w = np.array([weights[n] for n in names], dtype="float64")
+    lo = np.array([np.log1p(-limits[n]) if n in limits else -np.inf for n in names])
+    hi = np.array([np.log1p(limits[n]) if n in limits else np.inf for n in names])
+    shape = (len(names),) + (1,) * log_ratio.ndim
+
+    def parts(u):
+        return np.clip(w.reshape(shape) * u, lo.reshape(shape), hi.reshape(shape))
+
+    finite = np.isfinite(log_ratio)
+    target = np.where(finite, log_ratio, 0.0)
+    u = target / w.sum()  # exact when no limit binds
+    iterations = 0
+    for iterations in range(max_iter + 1):
+        p = parts(u)
+        residual = p.sum(axis=0) - target
+        if np.all(np.abs(residual) <= tol):
+            break
+        free = (p > lo.reshape(shape)) & (p < hi.reshape(shape))
+        slope = (w.reshape(shape) * free).sum(axis=0)
+        if iterations == max_iter or not np.any(slope[np.abs(residual) > tol] > 0):
+            break
+        # cells with every driver at its limit can't move: leave them
+        step = np.divide(residual, slope, out=np.zeros_like(residual), where=slope > 0)
+        # residual is monotone and piecewise linear in u: steps never overshoot
+        u = u - step
+
+    p = parts(u)
+    solved = finite & (np.abs(p.sum(axis=0) - target) <= max(tol, 1e-9))
+    factors = {name: np.exp(p[i]) for i, name in enumerate(names)}
+    return factors, solved, iterations
+
+
+# -------------------------------------------------------------------
+# GOAL SEEK
+# -------------------------------------------------------------------
+@dataclass
+class GoalSeekResult:
+    plan: pd.DataFrame
+    iterations: int
+
+    @property
+    def feasible(self) -> bool:
+        free = self.plan.loc[~self.plan["locked"]]
+        return bool(free["solved"].all())
+
+    def summary(self) -> pd.DataFrame:
+        """Per element: baseline, target and solved cost over the period."""
+        return self.plan.groupby(level="element")[["cost", "solved cost", "budget cost"]].sum()
+
+
+@instrumented()
+def goal_seek(
+    table: pd.DataFrame,
+    solve_for,
+    target: str = "year",
+    months=None,
+    replan_from=None,
+    limits: dict | None = None,
+) -> GoalSeekResult:
+    """
+    Drivers that bring cost back to Budget, for every element and month of
+    `table` (from monthly_drivers) at once.
+
+    - `solve_for`: a driver name ("price", "rate", "tonnage"), a list of them
+      (an equal relative change each), or a {driver: weight} mapping.
+    - `target`: "month" to hit each month's budget cost, "year" to hit the
+      budget total over the months with the same relative change in each.
+    - `months`: year_month keys to plan over (default: all in `table`).
+    - `replan_from`: months before this date keep their actuals (cost
+      already incurred); only later months are re-planned.
+    - `limits`: {driver: max relative change}, e.g. {"price": 0.1}.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target {target!r} (expected one of {', '.join(TARGETS)})")
+    if isinstance(solve_for, str):
+        solve_for = [solve_for]
+    weights = dict(solve_for) if isinstance(solve_for, dict) else {name: 1.0 for name in solve_for}
+    unknown = set(weights) - set(DRIVER_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown drivers {sorted(unknown)} (expected {', '.join(DRIVER_NAMES)})")
+
+    plan = table
+    if months is not None:
+        plan = plan[plan.index.get_level_values("year_month").isin(list(months))]
+    if plan.empty:
+        raise ValueError("No months to plan over")
+    plan = plan[["price", "rate", "tonnage", "cost", "budget cost"]].copy()
+
+    keys = plan.index.get_level_values("year_month").to_numpy()
+    first = int(period_keys([replan_from], "Month")[0]) if replan_from is not None else keys.min()
+    plan["locked"] = keys < first
+
+    # (elements, months) grid so every cell is solved in one pass
+    cost = plan["cost"].unstack("year_month")
+    locked = plan["locked"].unstack("year_month").fillna(True).astype(bool)
+    target_cost = plan["budget cost"].unstack("year_month")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if target == "month":
+            ratio = (target_cost / cost).to_numpy()
+        else:
+            free_cost = cost.where(~locked).sum(axis=1).to_numpy()
+            remaining = (target_cost.sum(axis=1) - cost.where(locked).sum(axis=1)).to_numpy()
+            ratio = np.broadcast_to((remaining / free_cost)[:, None], cost.shape)
+        log_ratio = np.where(ratio > 0, np.log(ratio), np.nan)
+
+    factors, solved, iterations = solve_factors(log_ratio, weights, limits)
+
+    def long(values):
+        grid = pd.DataFrame(values, index=cost.index, columns=cost.columns, dtype="float64")
+        return grid.stack().reindex(plan.index)
+
+    plan["solved"] = long(solved.astype("float64")).astype(bool) | plan["locked"]
+    scale = np.ones(len(plan))
+    for name in DRIVER_NAMES:
+        factor = long(factors[name]) if name in factors else pd.Series(1.0, index=plan.index)
+        factor = factor.where(~plan["locked"], 1.0)
+        plan[f"{name} factor"] = factor
+        plan[f"solved {name}"] = plan[name] * factor
+        scale = scale * factor.to_numpy()
+    plan["solved cost"] = plan["cost"] * scale
+    return GoalSeekResult(plan, iterations)
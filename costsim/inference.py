@@ -0,0 +1,454 @@
+"""
+Compiled inference for the Ops System sklearn models.
+
+`compile_model` turns a fitted linear model, decision tree, tree ensemble
+(random forest, extra trees, gradient boosting) or a Pipeline of scalers in
+front of one of those into plain NumPy arrays. The compiled form is saved as
+an .npz next to the joblib file, loads without importing sklearn, and
+evaluates a whole batch per call (trees are walked level by level for all
+trees and a block of rows at once). `check_parity` and `benchmark` compare it
+with the original estimator.
+
+NumPy can't match sklearn's Cython tree walk on big batches of shallow
+boosted trees, so `export_model` also records the largest batch the compiled
+form is faster for; `load_fast` hands bigger batches to the joblib model.
+
+ONNX is supported too when skl2onnx and onnxruntime are installed
+(`export_onnx` / `OnnxModel`).
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# -------------------------------------------------------------------
+# COMPILED FORMS
+# -------------------------------------------------------------------
+class CompiledLinear:
+    kind = "linear"
+
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype="float64").reshape(-1)
+        self.intercept = float(np.asarray(intercept).reshape(-1)[0])
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.coef + self.intercept
+
+    def arrays(self):
+        return {"coef": self.coef, "intercept": np.array([self.intercept])}
+
+    @classmethod
+    def from_arrays(cls, a):
+        return cls(a["coef"], a["intercept"])
+
+
+class CompiledTrees:
+    """
+    Any number of regression trees as padded (n_trees, n_nodes) arrays.
+    prediction = offset + scale * (sum or mean of tree outputs).
+    """
+
+    kind = "trees"
+    block_rows = 256  # rows walked at once: keeps the per-level buffers in cache
+
+    def __init__(self, feature, threshold, left, right, value, depth, offset=0.0, scale=1.0, average=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.depth = int(depth)
+        self.offset = float(offset)
+        self.scale = float(scale)
+        self.average = bool(average)
+        self._flatten()
+
+    def _flatten(self):
+        """Flat int32 / float32 copies of the nodes for the tree walk."""
+        n_trees, n_nodes = self.feature.shape
+        base = (np.arange(n_trees) * n_nodes)[:, None]
+        self._root = (base[:, 0]).astype(np.int32)
+        self._feature = self.feature.ravel().astype(np.int32)
+        # sklearn compares float32 inputs with float64 thresholds: x <= t is
+        # x <= t rounded down to float32, so the walk can stay in float32
+        threshold = self.threshold.ravel()
+        t32 = threshold.astype(np.float32)
+        over = t32.astype("float64") > threshold
+        t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+        self._threshold = t32
+        # children of flat node i at 2i (left) and 2i + 1 (right)
+        self._child = np.stack([(self.left + base).ravel(), (self.right + base).ravel()], axis=1)
+        self._child = self._child.ravel().astype(np.int32)
+        self._value = self.value.ravel()
+
+    @classmethod
+    def from_sklearn_trees(cls, trees, **kwargs):
+        n_nodes = max(t.node_count for t in trees)
+        shape = (len(trees), n_nodes)
+        feature = np.zeros(shape, dtype=np.int64)
+        threshold = np.zeros(shape)
+        # leaves point at themselves, so walking past them is a no-op
+        left = np.tile(np.arange(n_nodes), (len(trees), 1))
+        right = left.copy()
+        value = np.zeros(shape)
+        for i, t in enumerate(trees):
+            n = t.node_count
+            is_split = t.children_left >= 0
+            feature[i, :n] = np.where(is_split, t.feature, 0)
+            threshold[i, :n] = np.where(is_split, t.threshold, np.inf)
+            left[i, :n] = np.where(is_split, t.children_left, np.arange(n))
+            right[i, :n] = np.where(is_split, t.children_right, np.arange(n))
+            value[i, :n] = t.value[:, 0, 0]
+        depth = max(t.max_depth for t in trees)
+        return cls(feature, threshold, left, right, value, depth, **kwargs)
+
+    def _walk(self, X, out):
+        """Tree outputs combined for one block of rows, written into `out`."""
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        row_start = (np.arange(n_rows, dtype=np.int32) * n_features)[None, :]
+        node = np.repeat(self._root[:, None], n_rows, axis=1)
+        shape = node.shape
+        idx = np.empty(shape, dtype=np.int32)
+        x, t = np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32)
+        go_right = np.empty(shape, dtype=bool)
+        for _ in range(self.depth):
+            np.take(self._feature, node, out=idx)
+            idx += row_start
+            np.take(flat_x, idx, out=x)
+            np.take(self._threshold, node, out=t)
+            np.greater(x, t, out=go_right)
+            node *= 2
+            node += go_right
+            np.take(self._child, node, out=node)
+        leaves = self._value[node]
+        out[:] = leaves.mean(axis=0) if self.average else leaves.sum(axis=0)
+
+    def predict(self, X):
+        # sklearn trees compare float32 inputs against the thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        total = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], self.block_rows):
+            stop = start + self.block_rows
+            self._walk(X[start:stop], total[start:stop])
+        return self.offset + self.scale * total
+
+    def arrays(self):
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "params": np.array([self.depth, self.offset, self.scale, float(self.average)]),
+        }
+
+    @classmethod
+    def from_arrays(cls, a):
+        depth, offset, scale, average = a["params"]
+        return cls(
+            a["feature"], a["threshold"], a["left"], a["right"], a["value"],
+            depth, offset, scale, bool(average),
+        )
+
+
+class CompiledPipeline:
+    """Affine pre-scaling (x * mul + add) followed by a compiled estimator."""
+
+    kind = "pipeline"
+
+    def __init__(self, mul, add, final):
+        self.mul = np.asarray(mul, dtype="float64")
+        self.add = np.asarray(add, dtype="float64")
+        self.final = final
+
+    def predict(self, X):
+        return self.final.predict(np.asarray(X, dtype="float64") * self.mul + self.add)
+
+    def arrays(self):
+        out = {"mul": self.mul, "add": self.add, "final_kind": np.array(self.final.kind)}
+        out.update({f"final_{k}": v for k, v in self.final.arrays().items()})
+        return out
+
+    @classmethod
+    def from_arrays(cls, a):
+        final_cls = _KINDS[str(a["final_kind"])]
+        final = final_cls.from_arrays(
+            {k[len("final_"):]: v for k, v in a.items() if k.startswith("final_")}
+        )
+        return cls(a["mul"], a["add"], final)
+
+
+_KINDS = {c.kind: c for c in (CompiledLinear, CompiledTrees, CompiledPipeline)}
+
+
+# -------------------------------------------------------------------
+# COMPILING
+# -------------------------------------------------------------------
+def _n_features(est):
+    return int(getattr(est, "n_features_in_", 0))
+
+
+def _compile_estimator(est):
+    name = type(est).__name__
+
+    if hasattr(est, "tree_") and not hasattr(est, "estimators_"):
+        return CompiledTrees.from_sklearn_trees([est.tree_])
+
+    if name in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        return CompiledTrees.from_sklearn_trees(
+            [e.tree_ for e in est.estimators_], average=True
+        )
+
+    if name == "GradientBoostingRegressor":
+        trees = CompiledTrees.from_sklearn_trees(
+            [e.tree_ for e in est.estimators_[:, 0]], scale=est.learning_rate
+        )
+        # the init estimator's constant, recovered from one prediction
+        x0 = np.zeros((1, _n_features(est)))
+        trees.offset = float(est.predict(x0)[0] - trees.predict(x0)[0])
+        return trees
+
+    if hasattr(est, "coef_") and hasattr(est, "intercept_"):
+        return CompiledLinear(est.coef_, est.intercept_)
+
+    raise TypeError(f"Don't know how to compile {name}")
+
+
+def compile_model(est):
+    """Compile a fitted sklearn regressor (or Pipeline ending in one)."""
+    if hasattr(est, "steps"):
+        *transforms, (_, final) = est.steps
+        n = _n_features(est) or _n_features(final)
+        mul, add = np.ones(n), np.zeros(n)
+        for _, t in transforms:
+            name = type(t).__name__
+            if name == "StandardScaler":
+                scale = t.scale_ if t.scale_ is not None else np.ones(n)
+                mean = t.mean_ if t.mean_ is not None else np.zeros(n)
+                mul, add = mul / scale, (add - mean) / scale
+            elif name == "MinMaxScaler":
+                mul, add = mul * t.scale_, add * t.scale_ + t.min_
+            elif t == "passthrough" or t is None:
+                continue
+            else:
+                raise TypeError(f"Don't know how to compile pipeline step {name}")
+        return CompiledPipeline(mul, add, _compile_estimator(final))
+    return _compile_estimator(est)
+
+
+def save_compiled(compiled, path, max_rows=None) -> Path:
+    """`max_rows`: largest batch to predict with the compiled form (None: any)."""
+    path = Path(path)
+    limit = np.array(-1 if max_rows is None else int(max_rows))
+    np.savez(path, kind=np.array(compiled.kind), max_rows=limit, **compiled.arrays())
+    return path
+
+
+def _read_compiled(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files}
+    # files from before the batch limit was measured: trust them for single rows only
+    limit = int(arrays.pop("max_rows", 1))
+    compiled = _KINDS[str(arrays.pop("kind"))].from_arrays(arrays)
+    return compiled, (None if limit < 0 else limit)
+
+
+def load_compiled(path):
+    return _read_compiled(path)[0]
+
+
+def compiled_path(model_path) -> Path:
+    return Path(model_path).with_suffix(".npz")
+
+
+# -------------------------------------------------------------------
+# VALIDATION + BENCHMARK
+# -------------------------------------------------------------------
+def check_parity(original, compiled, X, rtol=1e-6, atol=1e-6) -> dict:
+    """Compare predictions on `X`; raises ValueError if they drift apart."""
+    expected = np.asarray(original.predict(X), dtype="float64").reshape(-1)
+    got = np.asarray(compiled.predict(X), dtype="float64").reshape(-1)
+    abs_err = np.abs(expected - got)
+    report = {
+        "rows": int(len(expected)),
+        "max_abs_error": float(abs_err.max(initial=0.0)),
+        "max_rel_error": float((abs_err / np.maximum(np.abs(expected), 1e-12)).max(initial=0.0)),
+    }
+    if not np.allclose(got, expected, rtol=rtol, atol=atol):
+        raise ValueError(f"Compiled model does not match the original: {report}")
+    return report
+
+
+def _median_seconds(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def crossover_rows(original, compiled, X, sizes=(1, 16, 256, 4096), repeats=5):
+    """
+    Largest batch size (of `sizes`, then all of `X`) up to which `compiled`
+    predicts at least as fast as `original`; None when it never falls behind.
+    """
+    X = np.asarray(X, dtype="float64")
+    fastest = 0
+    for size in [s for s in sizes if s < len(X)] + [len(X)]:
+        batch = X[:size]
+        if _median_seconds(lambda: compiled.predict(batch), repeats) > _median_seconds(
+            lambda: original.predict(batch), repeats
+        ):
+            return fastest
+        fastest = size
+    return None
+
+
+def benchmark(models: dict, X, single_repeats=200, batch_repeats=5) -> dict:
+    """Single-row latency and batch throughput for each named model."""
+    X = np.asarray(X, dtype="float64")
+    row = X[:1].tolist()  # list-of-lists, the way the page calls predict()
+    out = {}
+    for name, model in models.items():
+        single = _median_seconds(lambda: model.predict(row), single_repeats)
+        batch = _median_seconds(lambda: model.predict(X), batch_repeats)
+        out[name] = {
+            "single_row_us": single * 1e6,
+            "batch_rows_per_s": len(X) / batch if batch else float("inf"),
+        }
+    return out
+
+
+# -------------------------------------------------------------------
+# ONNX (optional)
+# -------------------------------------------------------------------
+def export_onnx(est, path, n_features=None) -> Path:
+    try:
+        from skl2onnx import to_onnx
+    except ImportError as e:
+        raise ImportError("ONNX export needs skl2onnx (pip install skl2onnx)") from e
+    n = n_features or _n_features(est)
+    onx = to_onnx(est, np.zeros((1, n), dtype=np.float32), target_opset=None)
+    path = Path(path)
+    path.write_bytes(onx.SerializeToString())
+    return path
+
+
+class OnnxModel:
+    def __init__(self, path):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("ONNX inference needs onnxruntime (pip install onnxruntime)") from e
+        self.session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return self.session.run(None, {self.input_name: X})[0].reshape(-1)
+
+
+# -------------------------------------------------------------------
+# LOADING + EXPORT
+# -------------------------------------------------------------------
+class RoutedModel:
+    """The compiled model for up to `max_rows` rows per call, the joblib one beyond."""
+
+    def __init__(self, compiled, model_path, max_rows: int):
+        self.compiled = compiled
+        self.model_path = Path(model_path)
+        self.max_rows = max_rows
+        self._estimator = None
+
+    def predict(self, X):
+        if len(X) <= self.max_rows:
+            return self.compiled.predict(X)
+        if self._estimator is None:
+            import joblib
+
+            self._estimator = joblib.load(self.model_path)
+        return self._estimator.predict(X)
+
+
+def load_fast(model_path):
+    """
+    The compiled .npz for `model_path` when it is at least as new as the
+    joblib file, otherwise the unpickled estimator. Batches bigger than the
+    compiled form was measured to be faster for go to the joblib model.
+    """
+    model_path = Path(model_path)
+    npz = compiled_path(model_path)
+    if npz.exists() and (
+        not model_path.exists() or npz.stat().st_mtime >= model_path.stat().st_mtime
+    ):
+        compiled, max_rows = _read_compiled(npz)
+        if max_rows is None or not model_path.exists():
+            return compiled
+        if max_rows > 0:
+            return RoutedModel(compiled, model_path, max_rows)
+    import joblib
+
+    return joblib.load(model_path)
+
+
+def export_model(model_path, X_validate, onnx: bool = False) -> dict:
+    """
+    Compile one joblib model, check parity on `X_validate`, measure the
+    batch sizes it's faster for and save it next to the joblib file.
+    """
+    import joblib
+
+    est = joblib.load(model_path)
+    compiled = compile_model(est)
+    report = {"model": str(model_path), "parity": check_parity(est, compiled, X_validate)}
+    report["max_rows"] = crossover_rows(est, compiled, X_validate)
+    report["compiled"] = str(
+        save_compiled(compiled, compiled_path(model_path), report["max_rows"])
+    )
+
+    candidates = {"sklearn": est, "compiled": compiled}
+    if onnx:
+        onnx_path = export_onnx(est, Path(model_path).with_suffix(".onnx"), X_validate.shape[1])
+        onnx_model = OnnxModel(onnx_path)
+        report["onnx"] = str(onnx_path)
+        report["onnx_parity"] = check_parity(est, onnx_model, X_validate, rtol=1e-4, atol=1e-3)
+        candidates["onnx"] = onnx_model
+
+    report["benchmark"] = benchmark(candidates, X_validate)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m costsim.inference",
+        description="Compile joblib sklearn models to NumPy (and optionally ONNX).",
+    )
+    parser.add_argument("models", nargs="+", help="joblib model files")
+    parser.add_argument("--rows", type=int, default=10_000, help="Random rows for parity/benchmark")
+    parser.add_argument("--scale", type=float, default=1e6, help="Upper bound of the random inputs")
+    parser.add_argument("--onnx", action="store_true", help="Also export and check ONNX")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    rng = np.random.default_rng(0)
+    reports = []
+    for path in args.models:
+        n = _n_features(joblib.load(path))
+        X = rng.uniform(0, args.scale, size=(args.rows, n))
+        reports.append(export_model(path, X, onnx=args.onnx))
+
+    json.dump(reports, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,520 @@
+"""
+Append-only ingestion of daily actuals.
+
+`HistoryStore` keeps the history as growable NumPy columns sorted by day. A
+day can hold several rows (shifts). New rows are validated and merged in
+place: a batch replaces every row the store holds for the days it covers,
+so re-sending a corrected day file overwrites that day and every row of a
+day within one batch is kept. Monthly sums and running prefix sums are
+updated from the changed rows only, so ingesting days at the end of the
+history is O(1) in the history length. Rows can come from a CSV drop folder
+or from rows appended to a workbook sheet. Ingested CSVs are kept in the
+folder's processed/ directory and replayed over the workbook by
+`replay_processed` whenever the history is rebuilt.
+
+Snapshots share rows: `HistoryStore.copy` is O(1) and appending days after
+the last one to the copy writes past the original's length in the same
+buffer. Corrections and back-filled days rewrite the copy's buffer, which
+is O(history) but leaves the original's untouched.
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+
+NUMERIC_COLUMNS = [
+    "Con rate (l/t)",
+    "Con rate (l/t) Budget",
+    "OB (T)",
+    "OB (T) Budget",
+    "ROM (T)",
+    "ROM (T) Budget",
+    "Quantity (l)",
+    "Quantity (l) Budget",
+    "Price (R/l)",
+    "Price (R/l) Budget",
+    "Diesel (R)",
+    "Diesel (R) Budget",
+]
+
+_DAY = np.dtype("datetime64[D]")
+
+
+# -------------------------------------------------------------------
+# VALIDATION
+# -------------------------------------------------------------------
+def validate_rows(rows: pd.DataFrame, columns=NUMERIC_COLUMNS) -> pd.DataFrame:
+    """
+    Check new rows against the Data.xlsx schema and return them with a
+    DatetimeIndex and float columns. Raises ValueError on missing columns,
+    unparseable dates or non-numeric values.
+    """
+    rows = rows.copy()
+    rows.columns = [str(c).strip() for c in rows.columns]
+
+    if "Date" not in rows.columns and isinstance(rows.index, pd.DatetimeIndex):
+        rows = rows.reset_index(names="Date")
+
+    missing = [c for c in ["Date", *columns] if c not in rows.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns: {', '.join(missing)}")
+
+    dates = pd.to_datetime(rows["Date"], format="ISO8601", errors="coerce")
+    if dates.isna().any():
+        # workbook style dates, parsed the same way as get_data()
+        fallback = pd.to_datetime(rows["Date"], dayfirst=True, errors="coerce")
+        dates = dates.fillna(fallback)
+    if dates.isna().any():
+        bad = rows.loc[dates.isna(), "Date"].head(3).tolist()
+        raise ValueError(f"Unparseable dates in new rows: {bad}")
+
+    out = pd.DataFrame(index=pd.DatetimeIndex(dates.dt.normalize(), name="Date"))
+    for col in columns:
+        values = pd.to_numeric(rows[col], errors="coerce")
+        non_numeric = values.isna() & rows[col].notna()
+        if non_numeric.any():
+            raise ValueError(f"Non-numeric values in column '{col}'")
+        out[col] = values.to_numpy(dtype="float64")
+    return out
+
+
+# -------------------------------------------------------------------
+# STORE
+# -------------------------------------------------------------------
+_DERIVED = ("year_month", "year")
+
+
+def _derived(index: pd.DatetimeIndex) -> dict:
+    return {
+        "year_month": np.asarray(index.year * 100 + index.month, dtype="int32"),
+        "year": np.asarray(index.year, dtype="int16"),
+    }
+
+
+class _Buffer:
+    """
+    Day-sorted columns shared by the stores copied from one another. Rows are
+    only ever added past `length`, never changed, so a store that has seen n
+    rows reads the same first n rows however far the buffer has grown since.
+    An unowned buffer borrows its columns (e.g. read-only views of the shared
+    memory-mapped history) and is never written: the first append copies it.
+    """
+
+    def __init__(self, days, arrays: dict, length: int = 0, owned: bool = True):
+        self.days = days
+        self.arrays = arrays  # column → 1-D array, in the column's own dtype
+        self.length = length
+        self.owned = owned
+        self.prefix = {}  # column → (running sums, rows summed), built on first range_sum
+        self.lock = threading.Lock()
+
+    @classmethod
+    def empty(cls, columns, capacity: int) -> "_Buffer":
+        arrays = {c: np.full(capacity, np.nan) for c in columns}
+        arrays["year_month"] = np.zeros(capacity, dtype="int32")
+        arrays["year"] = np.zeros(capacity, dtype="int16")
+        return cls(np.empty(capacity, dtype="datetime64[ns]"), arrays)
+
+    def grown(self, n: int, needed: int) -> "_Buffer":
+        """An owned buffer with the first `n` rows of this one and room for `needed`."""
+        capacity = max(1024, len(self.days))
+        while capacity < needed:
+            capacity *= 2
+        days = np.empty(capacity, dtype=self.days.dtype)
+        days[:n] = self.days[:n]
+        arrays = {}
+        for name, array in self.arrays.items():
+            arrays[name] = np.empty(capacity, dtype=array.dtype)
+            arrays[name][:n] = array[:n]
+        return _Buffer(days, arrays, n)
+
+
+def _readonly(view: np.ndarray) -> np.ndarray:
+    view = view.view()
+    view.flags.writeable = False
+    return view
+
+
+def _borrowable(df: pd.DataFrame, columns) -> bool:
+    """Day-sorted rows at midnight with numeric columns, which the store can read in place."""
+    index = df.index
+    if not isinstance(index, pd.DatetimeIndex) or index.hasnans or not index.is_monotonic_increasing:
+        return False
+    if not all(c in df.columns and pd.api.types.is_numeric_dtype(df[c].dtype) for c in columns):
+        return False
+    return bool((index == index.normalize()).all())
+
+
+class HistoryStore:
+    def __init__(self, columns=NUMERIC_COLUMNS, capacity: int = 1024):
+        self.columns = list(columns)
+        self._n = 0
+        self._buffer = _Buffer.empty(self.columns, capacity)
+        self._monthly = {}
+        self._lock = threading.RLock()
+        self._frame = None
+        self.version = 0
+        self.listeners = []
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=NUMERIC_COLUMNS, borrow: bool = False) -> "HistoryStore":
+        """
+        Seed a store from a get_data() frame (every row, several per day
+        allowed). With `borrow` the columns of a day-sorted frame are used in
+        place rather than copied, so a store over the shared memory-mapped
+        history holds no private copy of it until rows are appended; the
+        frame must never be written to afterwards.
+        """
+        store = cls(columns, capacity=0)
+        if borrow and _borrowable(df, store.columns):
+            arrays = {c: df[c].to_numpy() for c in store.columns}
+            derived = None
+            for name in _DERIVED:
+                if name in df.columns:
+                    arrays[name] = df[name].to_numpy()
+                else:
+                    derived = derived or _derived(df.index)
+                    arrays[name] = derived[name]
+            store._buffer = _Buffer(df.index.to_numpy(), arrays, len(df), owned=False)
+        else:
+            rows = validate_rows(df.reindex(columns=columns), columns).sort_index(kind="stable")
+            buffer = _Buffer.empty(store.columns, max(1024, 2 * len(rows)))
+            n = len(rows)
+            buffer.days[:n] = rows.index.to_numpy()
+            for c in store.columns:
+                buffer.arrays[c][:n] = rows[c].to_numpy()
+            for name, values in _derived(rows.index).items():
+                buffer.arrays[name][:n] = values
+            buffer.length = n
+            store._buffer = buffer
+        store._n = store._buffer.length
+        # rows are sorted by day, so each month is one run: sum column by column
+        # rather than materialising a float64 copy of the whole history
+        year_month = store._buffer.arrays["year_month"][: store._n]
+        if store._n:
+            starts = np.flatnonzero(np.r_[True, year_month[1:] != year_month[:-1]])
+            sums = np.column_stack([
+                np.add.reduceat(np.nan_to_num(store._buffer.arrays[c][: store._n].astype("float64")), starts)
+                for c in store.columns
+            ])
+            store._monthly = {int(year_month[i]): row for i, row in zip(starts, sums)}
+        return store
+
+    def __len__(self):
+        return self._n
+
+    def copy(self) -> "HistoryStore":
+        """
+        A store (without listeners) to append to while readers keep this one.
+        It shares this store's rows; appending new days to either writes past
+        both their lengths, so the other never sees them.
+        """
+        with self._lock:
+            out = HistoryStore(self.columns, capacity=0)
+            out._buffer = self._buffer
+            out._n = self._n
+            # month sums are replaced on change, never updated in place
+            out._monthly = dict(self._monthly)
+            out.version = self.version
+            return out
+
+    # ----- internals -----
+    def _day_range(self, days: np.ndarray):
+        """First and end row of each day (equal when the store has none); O(log n) each."""
+        stored = self._buffer.days[: self._n]
+        days = days.astype(stored.dtype)
+        return np.searchsorted(stored, days, "left"), np.searchsorted(stored, days, "right")
+
+    def _rows(self, lo: int, hi: int) -> np.ndarray:
+        """Store columns of rows lo..hi as a float64 (rows, columns) array."""
+        arrays = self._buffer.arrays
+        return np.column_stack([arrays[c][lo:hi] for c in self.columns]).astype("float64")
+
+    def _add_monthly(self, day, values, sign=1.0) -> None:
+        d = pd.Timestamp(day)
+        key = d.year * 100 + d.month
+        current = self._monthly.get(key)
+        delta = sign * np.nan_to_num(values)
+        self._monthly[key] = delta.copy() if current is None else current + delta
+
+    def _extend(self, days, arrays: dict) -> None:
+        """Write rows for days after the last one: in place when nobody else wrote past us."""
+        n, count = self._n, len(days)
+        buffer = self._buffer
+        with buffer.lock:
+            if not buffer.owned or buffer.length != n or n + count > len(buffer.days):
+                # borrowed, another copy appended past our length, or no room
+                buffer = buffer.grown(n, n + count)
+            buffer.days[n : n + count] = days
+            for name, values in arrays.items():
+                buffer.arrays[name][n : n + count] = values
+            buffer.length = n + count
+        self._buffer = buffer
+        self._n = n + count
+
+    def _rewrite(self, keep: np.ndarray, days, arrays: dict) -> None:
+        """Corrections or back-filled days: a new buffer with the rows merged and re-sorted."""
+        old, n = self._buffer, self._n
+        order = np.argsort(np.concatenate([old.days[:n][keep], days]), kind="stable")
+        buffer = old.grown(0, max(1024, 2 * len(order)))
+        m = len(order)
+        buffer.days[:m] = np.concatenate([old.days[:n][keep], days])[order]
+        for name, values in arrays.items():
+            merged = np.concatenate([old.arrays[name][:n][keep], values])
+            buffer.arrays[name][:m] = merged[order]
+        buffer.length = m
+        self._buffer = buffer
+        self._n = m
+
+    def _prefix(self, column: str) -> np.ndarray:
+        """Running sums of `column` over the first n rows, extended as rows arrive."""
+        buffer, n = self._buffer, self._n
+        with buffer.lock:
+            sums, start = buffer.prefix.get(column, (None, 0))
+            if sums is None or len(sums) < n:
+                grown = np.empty(len(buffer.days))
+                if sums is not None:
+                    grown[:start] = sums[:start]
+                sums = grown
+            if start < n:
+                values = np.nan_to_num(buffer.arrays[column][start:n].astype("float64"))
+                sums[start:n] = (sums[start - 1] if start > 0 else 0.0) + np.cumsum(values)
+                start = n
+            buffer.prefix[column] = (sums, start)
+            return sums
+
+    # ----- ingestion -----
+    @instrumented("ingest_append")
+    def append(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merge validated rows (DatetimeIndex, store columns) into the store;
+        the batch replaces every stored row of the days it covers. Returns
+        the change per day (new minus previous day totals) with a
+        `year_month` column, for downstream incremental aggregates.
+        """
+        rows = validate_rows(rows, self.columns).sort_index(kind="stable")
+        if rows.empty:
+            return rows.assign(year_month=pd.Series(dtype="int64"))
+
+        days = rows.index.to_numpy().astype(_DAY)
+        with self._lock:
+            stored = self._buffer.arrays
+            # in the store's dtypes, so the sums match what to_frame() shows
+            arrays = {c: rows[c].to_numpy().astype(stored[c].dtype) for c in self.columns}
+            for name, values in _derived(rows.index).items():
+                arrays[name] = values.astype(stored[name].dtype)
+            new_values = np.column_stack([arrays[c] for c in self.columns]).astype("float64")
+            keys, first = np.unique(days, return_index=True)
+            day_totals = np.add.reduceat(np.nan_to_num(new_values), first, axis=0)
+            deltas = day_totals.copy()
+
+            lo, hi = self._day_range(keys)
+            replaced = np.flatnonzero(hi > lo)
+            for i in replaced:
+                old = np.nan_to_num(self._rows(lo[i], hi[i])).sum(axis=0)
+                deltas[i] -= old
+                self._add_monthly(keys[i], old, sign=-1.0)
+            for i, total in enumerate(day_totals):
+                self._add_monthly(keys[i], total)
+
+            n = self._n
+            new_days = days.astype(self._buffer.days.dtype)
+            if not len(replaced) and (n == 0 or new_days[0] > self._buffer.days[n - 1]):
+                # new days after the last one: O(rows added)
+                self._extend(new_days, arrays)
+            else:
+                keep = np.ones(n, dtype=bool)
+                for i in replaced:
+                    keep[lo[i] : hi[i]] = False
+                self._rewrite(keep, new_days, arrays)
+            self.version += 1
+            self._frame = None
+
+        index = pd.DatetimeIndex(keys.astype("datetime64[ns]"), name="Date")
+        delta = pd.DataFrame(deltas, index=index, columns=self.columns)
+        delta["year_month"] = delta.index.year * 100 + delta.index.month
+        for listener in self.listeners:
+            listener(delta)
+        return delta
+
+    # ----- queries -----
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The history in get_data() layout, once per version. Index and columns
+        are read-only views of the store's rows, not copies.
+        """
+        with self._lock:
+            if self._frame is None:
+                n, buffer = self._n, self._buffer
+                index = pd.DatetimeIndex(_readonly(buffer.days[:n]), name="Date", copy=False)
+                names = [*self.columns, *_DERIVED]
+                self._frame = pd.DataFrame(
+                    {name: _readonly(buffer.arrays[name][:n]) for name in names},
+                    index=index,
+                    copy=False,
+                )
+            return self._frame
+
+    def monthly(self) -> pd.DataFrame:
+        """Monthly sums per column, indexed by year_month."""
+        with self._lock:
+            keys = sorted(self._monthly)
+            return pd.DataFrame(
+                [self._monthly[k] for k in keys],
+                index=pd.Index(keys, name="year_month"),
+                columns=self.columns,
+            )
+
+    def range_sum(self, column: str, start, end) -> float:
+        """Sum of `column` over start..end inclusive from the prefix sums."""
+        if column not in self.columns:
+            raise ValueError(f"{column!r} is not a store column")
+        with self._lock:
+            prefix = self._prefix(column)
+            bounds = np.array([pd.Timestamp(start).date(), pd.Timestamp(end).date()], dtype=_DAY)
+            lo, hi = self._day_range(bounds)
+            lo, hi = lo[0], hi[1]
+            if hi <= lo:
+                return 0.0
+            return float(prefix[hi - 1] - (prefix[lo - 1] if lo > 0 else 0.0))
+
+
+# -------------------------------------------------------------------
+# SOURCES
+# -------------------------------------------------------------------
+# one ingestion at a time per process: sessions and the rebuild share folders
+_INGEST_LOCK = threading.Lock()
+
+
+def _claim(path: Path, target_dir: Path) -> bool:
+    """Move `path` into `target_dir`; False if another ingester already took it."""
+    target_dir.mkdir(exist_ok=True)
+    try:
+        shutil.move(str(path), target_dir / path.name)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _accept(path: Path, columns, processed_dir: Path, rejected_dir: Path):
+    """Validated rows of one CSV once it's claimed into `processed_dir`, else None."""
+    try:
+        rows = validate_rows(pd.read_csv(path), columns)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        if _claim(path, rejected_dir):
+            (rejected_dir / f"{path.name}.error.txt").write_text(str(e))
+        return None
+    # claimed (and so replayed on rebuild) before any store sees it
+    return rows if _claim(path, processed_dir) else None
+
+
+def _dirs(folder, processed_dir):
+    folder = Path(folder)
+    return folder, Path(processed_dir) if processed_dir else folder / "processed"
+
+
+def ingest_folder(store: HistoryStore, folder, processed_dir=None) -> list[Path]:
+    """
+    Ingest every *.csv in `folder` (oldest first) into `store` (a
+    HistoryStore, or anything with its `columns` and `append`) and move it to
+    `processed_dir` (default: folder/processed), where `replay_processed`
+    finds it again after a rebuild. Files that fail validation are moved to
+    folder/rejected with the error next to them. A file that vanishes
+    mid-way was claimed by another process and is skipped.
+    """
+    folder, processed_dir = _dirs(folder, processed_dir)
+    if not folder.is_dir():
+        return []
+    done = []
+    with _INGEST_LOCK:
+        for path in sorted(folder.glob("*.csv"), key=_mtime):
+            rows = _accept(path, store.columns, processed_dir, folder / "rejected")
+            if rows is not None:
+                store.append(rows)
+                done.append(path)
+    return done
+
+
+def claim_folder(folder, columns=NUMERIC_COLUMNS, processed_dir=None) -> list[Path]:
+    """
+    Validate and move every *.csv in `folder` into `processed_dir` without
+    appending it anywhere; for callers that apply processed/ themselves (see
+    `processed_files`). Returns the claimed files' new paths.
+    """
+    folder, processed_dir = _dirs(folder, processed_dir)
+    if not folder.is_dir():
+        return []
+    claimed = []
+    with _INGEST_LOCK:
+        for path in sorted(folder.glob("*.csv"), key=_mtime):
+            if _accept(path, columns, processed_dir, folder / "rejected") is not None:
+                claimed.append(processed_dir / path.name)
+    return claimed
+
+
+def processed_files(folder, processed_dir=None) -> list[Path]:
+    """Every CSV ingest_folder / claim_folder accepted for `folder`, oldest first."""
+    _, processed_dir = _dirs(folder, processed_dir)
+    if not processed_dir.is_dir():
+        return []
+    return sorted(processed_dir.glob("*.csv"), key=_mtime)
+
+
+def source_key(path: Path) -> tuple:
+    """Identifies one accepted file: a re-sent file of the same name is a new source."""
+    return path.name, os.stat(path).st_mtime_ns
+
+
+def replay_processed(store: HistoryStore, folder, processed_dir=None) -> set:
+    """
+    Re-apply the CSVs ingest_folder already accepted (oldest first) to a
+    store freshly seeded from the workbook. Returns their `source_key`s.
+    """
+    replayed = set()
+    for path in processed_files(folder, processed_dir):
+        try:
+            key = source_key(path)
+            store.append(pd.read_csv(path))
+        except FileNotFoundError:
+            continue
+        replayed.add(key)
+    return replayed
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return float("inf")
+
+
+class SheetTail:
+    """Reads only the rows appended to a workbook sheet since the last call."""
+
+    def __init__(self, path, sheet_name=0, rows_seen: int = 0):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.rows_seen = rows_seen
+
+    def read_new(self) -> pd.DataFrame:
+        new = pd.read_excel(
+            self.path,
+            sheet_name=self.sheet_name,
+            skiprows=range(1, self.rows_seen + 1),
+        )
+        self.rows_seen += len(new)
+        return new
+
+    def ingest(self, store: HistoryStore) -> int:
+        new = self.read_new()
+        if not new.empty:
+            store.append(new)
+        return len(new)
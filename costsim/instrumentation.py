@@ -0,0 +1,221 @@
+"""
+Lightweight per-stage instrumentation.
+
+Functions decorated with `instrumented` (and blocks wrapped in `stage`) are
+timed only while a `Recorder` is active via `recording(...)`; otherwise they
+call straight through. Peak memory is traced with tracemalloc when the
+recorder asks for it, since tracing slows everything else down. tracemalloc
+is process-wide: it runs while any recording asks for memory, and peaks are
+only reported for stages that ran while theirs was the only one.
+"""
+
+import contextvars
+import functools
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import pandas as pd
+
+_active = contextvars.ContextVar("costsim_recorder", default=None)
+
+# recordings tracing memory right now; `_generation` changes whenever one
+# starts, so a stage can tell another recording overlapped it
+_tracing_lock = threading.Lock()
+_tracing_count = 0
+_tracing_started = False
+_generation = 0
+
+
+@dataclass
+class StageRecord:
+    name: str
+    seconds: float
+    peak_bytes: int | None = None
+    rows: int | None = None
+    depth: int = 0
+
+
+@dataclass
+class _Frame:
+    base: int = 0
+    peak: int = 0
+    generation: int | None = None
+
+
+@dataclass
+class Recorder:
+    page: str = ""
+    track_memory: bool = False
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds")
+    )
+    records: list = field(default_factory=list)
+    _stack: list = field(default_factory=list, repr=False)
+
+    # ----- stage bookkeeping -----
+    def _enter(self) -> _Frame:
+        frame = _Frame()
+        with _tracing_lock:
+            if self.track_memory and _sole_tracer():
+                current, peak = tracemalloc.get_traced_memory()
+                if self._stack:
+                    self._stack[-1].peak = max(self._stack[-1].peak, peak)
+                tracemalloc.reset_peak()
+                frame.base = current
+                frame.peak = current
+                frame.generation = _generation
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, name: str, seconds: float, rows: int | None) -> StageRecord:
+        frame = self._stack.pop()
+        peak_bytes = None
+        with _tracing_lock:
+            if self.track_memory and _sole_tracer() and frame.generation == _generation:
+                peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+                peak_bytes = max(0, peak - frame.base)
+                if self._stack:
+                    self._stack[-1].peak = max(self._stack[-1].peak, peak)
+                tracemalloc.reset_peak()
+        record = StageRecord(name, seconds, peak_bytes, rows, depth=len(self._stack))
+        self.records.append(record)
+        return record
+
+    # ----- reporting -----
+    def timings(self) -> dict:
+        """Total seconds per top-level stage name."""
+        out = {}
+        for r in self.records:
+            if r.depth == 0:
+                out[r.name] = out.get(r.name, 0.0) + r.seconds
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            [asdict(r) for r in self.records],
+            columns=["name", "seconds", "peak_bytes", "rows", "depth"],
+        )
+
+    def to_jsonl(self) -> str:
+        lines = []
+        for r in self.records:
+            row = {"run_id": self.run_id, "started": self.started, "page": self.page}
+            row.update(asdict(r))
+            lines.append(json.dumps(row))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def append_jsonl(self, path) -> None:
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(self.to_jsonl())
+
+
+# -------------------------------------------------------------------
+# PUBLIC HELPERS
+# -------------------------------------------------------------------
+def current_recorder() -> Recorder | None:
+    return _active.get()
+
+
+def _sole_tracer() -> bool:
+    """One recording traces memory, so the process-wide peak is its own."""
+    return _tracing_count == 1 and tracemalloc.is_tracing()
+
+
+def _start_tracing() -> None:
+    global _tracing_count, _tracing_started, _generation
+    with _tracing_lock:
+        if _tracing_count == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_count += 1
+        _generation += 1
+
+
+def _stop_tracing() -> None:
+    global _tracing_count, _tracing_started
+    with _tracing_lock:
+        _tracing_count -= 1
+        # leave tracing started elsewhere (python -X tracemalloc) running
+        if _tracing_count == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+@contextmanager
+def recording(recorder: Recorder):
+    """
+    Make `recorder` the active one for the duration of the block. Recordings
+    that track memory share tracemalloc: the last one to finish stops it,
+    and stages overlapping another such recording get no peak.
+    """
+    if recorder.track_memory:
+        _start_tracing()
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+        if recorder.track_memory:
+            _stop_tracing()
+
+
+def count_rows(obj) -> int | None:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    return None
+
+
+@contextmanager
+def stage(name: str, rows: int | None = None):
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+    recorder._enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder._exit(name, time.perf_counter() - start, rows)
+
+
+def instrumented(name: str | None = None):
+    """
+    Decorator form of `stage`. Row count is taken from the returned frame,
+    or from the first DataFrame argument when the function returns something
+    else (figures, HTML, None).
+    """
+
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _active.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+
+            recorder._enter()
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                rows = count_rows(result)
+                if rows is None:
+                    rows = next(
+                        (n for n in map(count_rows, args) if n is not None), None
+                    )
+                recorder._exit(label, time.perf_counter() - start, rows)
+
+        return wrapper
+
+    return decorate
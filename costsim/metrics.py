@@ -0,0 +1,470 @@
+"""
+Process-wide metrics for production monitoring.
+
+Counters, gauges and histograms live in a `MetricsRegistry` (the module-level
+`REGISTRY` by default) and can be read out as Prometheus text or as OTLP/JSON
+so they work without a collector on the network:
+
+    COSTSIM_METRICS_PORT=9464          serve /metrics for Prometheus scraping
+    COSTSIM_METRICS_OTLP_FILE=out.json append OTLP/JSON snapshots to a file
+
+`InMemoryCollector` is a local stand-in for a real collector in tests.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 2e7, 5e7)
+
+
+# -------------------------------------------------------------------
+# INSTRUMENTS
+# -------------------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str = "", labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._start_ns = time.time_ns()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> float | None:
+        return self._values.get(self._key(labels))
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description="", labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._series.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+            )
+            idx = next(
+                (i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets)
+            )
+            counts[idx] += 1
+            self._series[key] = (counts, total + value, n + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        return self._series.get(self._key(labels), (None, 0.0, 0))[2]
+
+    def sum(self, **labels) -> float:
+        return self._series.get(self._key(labels), (None, 0.0, 0))[1]
+
+    def samples(self):
+        with self._lock:
+            return [(k, (list(c), s, n)) for k, (c, s, n) in self._series.items()]
+
+
+# -------------------------------------------------------------------
+# REGISTRY
+# -------------------------------------------------------------------
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, description="", labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def gauge(self, name, description="", labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, description, labelnames)
+
+    def histogram(self, name, description="", labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, labelnames, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    # ----- Prometheus text exposition -----
+    def render_prometheus(self) -> str:
+        lines = []
+        for m in self.metrics():
+            lines.append(f"# HELP {m.name} {m.description}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for key, value in m.samples():
+                labels = dict(zip(m.labelnames, key))
+                if m.kind != "histogram":
+                    lines.append(f"{m.name}{_prom_labels(labels)} {_prom_num(value)}")
+                    continue
+                counts, total, n = value
+                running = 0
+                for bound, c in zip(m.buckets + (float("inf"),), counts):
+                    running += c
+                    le = "+Inf" if bound == float("inf") else _prom_num(bound)
+                    lines.append(
+                        f"{m.name}_bucket{_prom_labels({**labels, 'le': le})} {running}"
+                    )
+                lines.append(f"{m.name}_sum{_prom_labels(labels)} {_prom_num(total)}")
+                lines.append(f"{m.name}_count{_prom_labels(labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+    # ----- OTLP/JSON -----
+    def to_otlp(self, service_name: str = "variable-cost-app") -> dict:
+        now = time.time_ns()
+        out = []
+        for m in self.metrics():
+            points = []
+            for key, value in m.samples():
+                point = {
+                    "attributes": _otlp_attrs(dict(zip(m.labelnames, key))),
+                    "startTimeUnixNano": str(m._start_ns),
+                    "timeUnixNano": str(now),
+                }
+                if m.kind == "histogram":
+                    counts, total, n = value
+                    point.update(
+                        count=str(n),
+                        sum=total,
+                        bucketCounts=[str(c) for c in counts],
+                        explicitBounds=list(m.buckets),
+                    )
+                else:
+                    point["asDouble"] = value
+                points.append(point)
+
+            entry = {"name": m.name, "description": m.description}
+            if m.kind == "counter":
+                entry["sum"] = {
+                    "dataPoints": points,
+                    "aggregationTemporality": 2,
+                    "isMonotonic": True,
+                }
+            elif m.kind == "gauge":
+                entry["gauge"] = {"dataPoints": points}
+            else:
+                entry["histogram"] = {"dataPoints": points, "aggregationTemporality": 2}
+            out.append(entry)
+
+        return {
+            "resourceMetrics": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attrs(
+                            {"service.name": service_name, "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeMetrics": [{"scope": {"name": "costsim"}, "metrics": out}],
+                }
+            ]
+        }
+
+
+def _prom_num(v) -> str:
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _prom_escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _otlp_attrs(labels: dict) -> list:
+    out = []
+    for k, v in labels.items():
+        if isinstance(v, int):
+            out.append({"key": k, "value": {"intValue": str(v)}})
+        else:
+            out.append({"key": k, "value": {"stringValue": str(v)}})
+    return out
+
+
+REGISTRY = MetricsRegistry()
+
+
+# -------------------------------------------------------------------
+# APP METRICS
+# -------------------------------------------------------------------
+RERUNS = REGISTRY.counter(
+    "costsim_page_reruns_total", "Streamlit script reruns per page", ["page"]
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "costsim_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+DATA_LOAD_SECONDS = REGISTRY.histogram(
+    "costsim_data_load_seconds", "Time to load and parse a data workbook", ["source"]
+)
+MODEL_LOADS = REGISTRY.counter(
+    "costsim_model_loads_total", "joblib model/forecast artefact loads", ["artefact"]
+)
+PREDICTION_SECONDS = REGISTRY.histogram(
+    "costsim_prediction_seconds", "Model predict() latency", ["model"]
+)
+SCENARIO_UPLOAD_BYTES = REGISTRY.histogram(
+    "costsim_scenario_upload_bytes", "Size of uploaded scenario workbooks", [], SIZE_BUCKETS
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "costsim_stage_seconds", "Wall time per instrumented stage", ["page", "stage"]
+)
+PROCESS_MEMORY = REGISTRY.gauge(
+    "costsim_process_max_rss_bytes", "Peak resident memory of the server process"
+)
+PRIVATE_MEMORY = REGISTRY.gauge(
+    "costsim_process_private_bytes",
+    "Anonymous memory of the server process: what it holds alone, not the shared history mapping",
+)
+WARMUP_SECONDS = REGISTRY.histogram(
+    "costsim_warmup_seconds", "Startup warm-up load time per artefact", ["artefact", "status"]
+)
+ACTIVE_SESSIONS = REGISTRY.gauge(
+    "costsim_active_sessions", "Sessions seen in the last five minutes"
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache: str) -> float | None:
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+    return hits / total if total else None
+
+
+def record_recorder(recorder) -> None:
+    """Feed the top-level stages of an instrumentation Recorder into histograms."""
+    for r in recorder.records:
+        if r.depth == 0:
+            STAGE_SECONDS.observe(r.seconds, page=recorder.page, stage=r.name)
+
+
+def private_memory() -> int | None:
+    """Anonymous bytes of this process from /proc (None off Linux)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Anonymous:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def sample_process_memory() -> None:
+    private = private_memory()
+    if private is not None:
+        PRIVATE_MEMORY.set(private)
+    try:
+        import resource
+    except ImportError:  # Windows: no getrusage, leave the gauge unset
+        return
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    PROCESS_MEMORY.set(rss if sys.platform == "darwin" else rss * 1024)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def record_rerun(page: str, session_id: str | None = None, window: float = 300.0) -> None:
+    """Called once at the top of every page rerun."""
+    RERUNS.inc(page=page)
+    sample_process_memory()
+    if session_id is None:
+        return
+    now = time.monotonic()
+    with _sessions_lock:
+        _sessions[session_id] = now
+        for sid in [s for s, t in _sessions.items() if now - t > window]:
+            del _sessions[sid]
+        ACTIVE_SESSIONS.set(len(_sessions))
+
+
+# -------------------------------------------------------------------
+# EXPORTERS
+# -------------------------------------------------------------------
+class OtlpFileExporter:
+    """Appends one OTLP/JSON document per line, like the collector's file exporter."""
+
+    def __init__(self, path, registry: MetricsRegistry = REGISTRY):
+        self.path = path
+        self.registry = registry
+
+    def export(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(self.registry.to_otlp()) + "\n")
+
+
+class InMemoryCollector:
+    """Stand-in collector: keeps every exported snapshot in memory."""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        self.snapshots = []
+
+    def export(self) -> None:
+        self.snapshots.append(self.registry.to_otlp())
+
+    def latest(self) -> dict:
+        """{metric name: [data points]} from the most recent snapshot."""
+        if not self.snapshots:
+            return {}
+        metrics = self.snapshots[-1]["resourceMetrics"][0]["scopeMetrics"][0]["metrics"]
+        out = {}
+        for m in metrics:
+            body = m.get("sum") or m.get("gauge") or m.get("histogram")
+            out[m["name"]] = body["dataPoints"]
+        return out
+
+
+class PeriodicExporter:
+    def __init__(self, exporter, interval: float = 60.0):
+        self.exporter = exporter
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="costsim-metrics")
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.shutdown)
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.exporter.export()
+
+    def shutdown(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self.exporter.export()
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_prometheus(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY):
+    handler = type("Handler", (_PrometheusHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="costsim-prometheus").start()
+    return server
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_exporters() -> None:
+    """
+    Start the exporters configured through environment variables. Safe to
+    call on every rerun; only the first call in a process does anything.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        port = os.environ.get("COSTSIM_METRICS_PORT")
+        if port:
+            try:
+                serve_prometheus(int(port))
+            except OSError:
+                # another worker on this host already owns the port
+                pass
+
+        otlp_file = os.environ.get("COSTSIM_METRICS_OTLP_FILE")
+        if otlp_file:
+            interval = float(os.environ.get("COSTSIM_METRICS_INTERVAL", "60"))
+            PeriodicExporter(OtlpFileExporter(otlp_file), interval).start()
@@ -0,0 +1,161 @@
+"""
+History partitioned by business unit.
+
+    data/bu=Mafube/history.parquet
+    data/bu=<BU>/history.parquet
+
+Each partition has the workbook's columns (Date plus the numeric cost
+drivers), so every BU shares one cost structure and get_data() reads either.
+`python -m costsim.partitions` converts the workbooks in
+dictionaries.datasets. Cross-BU views load the partitions they need on a
+thread per core and aggregate them with one groupby over (BU, period).
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from dictionaries import data_root, datasets
+
+PARTITION_FILE = "history.parquet"
+DERIVED_COLUMNS = ["year_month", "year"]
+
+
+# -------------------------------------------------------------------
+# LAYOUT
+# -------------------------------------------------------------------
+def partition_path(bu: str, root=None) -> Path:
+    return Path(root or data_root) / f"bu={bu}" / PARTITION_FILE
+
+
+def partition_bus(root=None) -> list:
+    """Business units with a partition on disk."""
+    root = Path(root or data_root)
+    if not root.is_dir():
+        return []
+    return sorted(
+        d.name.split("=", 1)[1]
+        for d in root.glob("bu=*")
+        if (d / PARTITION_FILE).exists()
+    )
+
+
+def business_units(root=None) -> list:
+    """Every BU with data: configured workbooks and partitions."""
+    return sorted(set(datasets) | set(partition_bus(root)))
+
+
+def dataset_path(bu: str, root=None) -> str:
+    """The BU's partition when there is one, otherwise its workbook."""
+    path = partition_path(bu, root)
+    if path.exists():
+        return str(path)
+    if bu in datasets:
+        return datasets[bu]
+    raise ValueError(f"No data for business unit {bu!r} (expected one of {business_units(root)})")
+
+
+def write_partition(bu: str, df: pd.DataFrame, root=None) -> Path:
+    """Write a get_data() frame as the BU's partition (atomically, for the file watcher)."""
+    path = partition_path(bu, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = df.drop(columns=[c for c in DERIVED_COLUMNS if c in df.columns])
+    if "Date" not in out.columns:
+        out = out.reset_index(names="Date")
+    tmp = path.with_name(path.name + ".tmp")
+    out.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def import_workbooks(bus=None, root=None) -> dict:
+    """Convert the configured workbooks to partitions; returns BU → path."""
+    import utils
+
+    bus = bus or list(datasets)
+    unknown = [bu for bu in bus if bu not in datasets]
+    if unknown:
+        raise ValueError(f"No workbook configured for {', '.join(unknown)}")
+    return {bu: write_partition(bu, utils.get_data(datasets[bu]), root) for bu in bus}
+
+
+# -------------------------------------------------------------------
+# CROSS-BU
+# -------------------------------------------------------------------
+def _shared_dataset(bu):
+    from costsim.registry import dataset_resource
+
+    return dataset_resource(bu).get().value
+
+
+def load_bus(bus, columns=None, load=None, max_workers: int = 8) -> pd.DataFrame:
+    """
+    History of several BUs in one frame with a categorical "BU" column;
+    `load(bu)` defaults to the page-shared datasets. BUs are loaded on up to
+    one thread per core. Only pyarrow's Parquet decode runs outside the GIL:
+    openpyxl (workbooks) and get_data()'s pandas steps hold it, so threads
+    overlap file reads and decoding but not workbook parsing. Convert
+    workbooks to partitions for cross-BU views.
+    """
+    bus = list(dict.fromkeys(bus))
+    if not bus:
+        raise ValueError("Select at least one business unit")
+    load = load or _shared_dataset
+    workers = min(max_workers, len(bus), os.cpu_count() or 1)
+    if workers == 1:
+        # a thread pool only adds overhead on one core
+        frames = [load(bu) for bu in bus]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(load, bus))
+    if columns is not None:
+        frames = [df[list(columns)] for df in frames]
+    combined = pd.concat(frames, keys=bus, names=["BU", frames[0].index.name or "Date"])
+    combined = combined.reset_index(level="BU")
+    combined["BU"] = pd.Categorical(combined["BU"], categories=bus)
+    return combined
+
+
+def compare(bus, columns, period: str = "year_month", how: str = "sum", load=None) -> pd.DataFrame:
+    """
+    `columns` aggregated per BU and period in a single groupby. `period` is a
+    column of the get_data() layout (year_month or year). Long format:
+    columns BU, period, *columns.
+    """
+    columns = list(columns)
+    combined = load_bus(bus, columns + [period], load=load)
+    return (
+        combined.groupby(["BU", period], observed=True, sort=True)[columns]
+        .agg(how)
+        .reset_index()
+    )
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m costsim.partitions",
+        description="Convert the BU workbooks in dictionaries.datasets to Parquet partitions.",
+    )
+    parser.add_argument("bus", nargs="*", metavar="BU", help="default: every configured BU")
+    parser.add_argument("--root", default=data_root)
+    args = parser.parse_args(argv)
+
+    try:
+        written = import_workbooks(args.bus, args.root)
+    except ValueError as e:
+        parser.error(str(e))
+    for bu, path in written.items():
+        rows = len(pd.read_parquet(path, columns=["Date"]))
+        print(f"{bu}: {rows} rows -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+# Imported as a module: utils itself imports costsim.instrumentation.
+import utils
+from costsim.instrumentation import Recorder, recording, stage
+
+
+# -------------------------------------------------------------------
+# RESULT
+# -------------------------------------------------------------------
+@dataclass
+class PipelineResult:
+    source: str
+    monthly: pd.DataFrame
+    metrics: dict
+    timings: dict = field(default_factory=dict)
+    recorder: Recorder | None = None
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.timings.values())
+
+
+# -------------------------------------------------------------------
+# SINGLE FILE
+# -------------------------------------------------------------------
+def filter_dates(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """Same inclusive date window as the Mining System From/To inputs."""
+    if start is None and end is None:
+        return df
+    start = pd.Timestamp(start) if start is not None else df.index.min()
+    end = pd.Timestamp(end) if end is not None else df.index.max()
+    if start > end:
+        start, end = end, start
+    mask = (df.index >= start.normalize()) & (
+        df.index < end.normalize() + pd.Timedelta(days=1)
+    )
+    return df.loc[mask]
+
+
+def run_pipeline(
+    data_file,
+    scenario_file=None,
+    start=None,
+    end=None,
+    track_memory: bool = False,
+) -> PipelineResult:
+    """
+    Run the diesel cost pipeline for one input workbook.
+
+    `scenario_file` is optional; without it EPBCS/Simulation fall back to the
+    synthetic series from apply_epbcs_and_simulation, exactly as the page does.
+    """
+    recorder = Recorder(page="costsim", track_memory=track_memory)
+
+    with recording(recorder):
+        df = utils.get_data(data_file)
+
+        with stage("filter"):
+            df = filter_dates(df, start, end)
+
+        monthly = utils.prepare_diesel_data(df)
+
+        scenario_df = None
+        if scenario_file is not None:
+            scenario_df = utils.load_scenario_data(scenario_file)
+
+        monthly = utils.apply_epbcs_and_simulation(monthly, scenario_df)
+        metrics = utils.calculate_scenario_metrics(
+            scenario_df if scenario_df is not None else df
+        )
+
+    return PipelineResult(
+        source=str(data_file),
+        monthly=monthly,
+        metrics=metrics,
+        timings=recorder.timings(),
+        recorder=recorder,
+    )
+
+
+def output_names(data_files) -> list[str]:
+    """
+    Output file prefix per input: its stem, led by the parent directory where
+    stems repeat (every partition is bu=<BU>/history.parquet), and by a hash
+    of the path where that still repeats.
+    """
+    paths = [Path(f) for f in data_files]
+    names = [p.stem for p in paths]
+    for attempt in ("parent", "hash"):
+        counts = Counter(names)
+        if all(counts[n] == 1 for n in names):
+            break
+        for i, p in enumerate(paths):
+            if counts[names[i]] > 1:
+                if attempt == "parent":
+                    names[i] = f"{p.resolve().parent.name}_{p.stem}"
+                else:
+                    digest = hashlib.sha1(str(p.resolve()).encode()).hexdigest()[:8]
+                    names[i] = f"{names[i]}_{digest}"
+    return names
+
+
+def write_outputs(result: PipelineResult, out_dir, fmt: str = "parquet", name: str | None = None) -> list[Path]:
+    """
+    Write monthly table and metrics for one result as `<name>_monthly` and
+    `<name>_metrics` (`name` defaults to the input's stem); returns written paths.
+    """
+    if fmt not in ("parquet", "csv"):
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = name or Path(result.source).stem
+
+    monthly_path = out_dir / f"{stem}_monthly.{fmt}"
+    metrics_path = out_dir / f"{stem}_metrics.{fmt}"
+    metrics_df = pd.DataFrame([result.metrics])
+
+    if fmt == "parquet":
+        result.monthly.to_parquet(monthly_path, index=False)
+        metrics_df.to_parquet(metrics_path, index=False)
+    else:
+        result.monthly.to_csv(monthly_path, index=False)
+        metrics_df.to_csv(metrics_path, index=False)
+
+    return [monthly_path, metrics_path]
+
+
+# -------------------------------------------------------------------
+# BATCH
+# -------------------------------------------------------------------
+def _run_and_write(data_file, name, scenario_file, start, end, out_dir, fmt, track_memory):
+    result = run_pipeline(data_file, scenario_file, start, end, track_memory)
+    if out_dir is not None:
+        with recording(result.recorder), stage("write_outputs"):
+            write_outputs(result, out_dir, fmt, name)
+        result.timings = result.recorder.timings()
+    return result
+
+
+def run_batch(
+    data_files,
+    out_dir=None,
+    fmt: str = "parquet",
+    scenario_file=None,
+    start=None,
+    end=None,
+    workers: int | None = None,
+    track_memory: bool = False,
+) -> list[PipelineResult]:
+    """
+    Run the pipeline over many input files in parallel worker processes.
+
+    Results come back in the same order as `data_files`, and outputs are
+    named by output_names() so inputs sharing a file name don't overwrite
+    each other. With `workers=1` everything runs in-process, which is easier
+    to debug.
+    """
+    data_files = list(data_files)
+    args = [
+        (f, name, scenario_file, start, end, out_dir, fmt, track_memory)
+        for f, name in zip(data_files, output_names(data_files))
+    ]
+
+    if workers == 1 or len(data_files) <= 1:
+        return [_run_and_write(*a) for a in args]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_and_write, *zip(*args)))
@@ -0,0 +1,97 @@
+"""
+Bounded LRU cache for single predictions.
+
+Keys are the model identity (path + loaded version) plus the input vector
+quantised to a fixed number of significant digits, so repeated what-if
+clicks with the same or practically identical inputs reuse the result.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from costsim.metrics import record_cache
+
+
+def quantise(values, significant: int = 6) -> tuple:
+    """Round every input to `significant` significant digits (0 stays 0)."""
+    out = []
+    for v in np.asarray(values, dtype="float64").reshape(-1):
+        out.append(float(f"{v:.{significant}g}") if np.isfinite(v) else float(v))
+    return tuple(out)
+
+
+class PredictionCache:
+    def __init__(self, maxsize: int = 4096, significant: int = 6, name: str = "predictions"):
+        self.maxsize = maxsize
+        self.significant = significant
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._computing = {}  # key → lock held while its result is computed
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, model_key, inputs) -> tuple:
+        return (model_key, quantise(inputs, self.significant))
+
+    def _hit(self, key):
+        self._data.move_to_end(key)
+        self.hits += 1
+        record_cache(self.name, hit=True)
+        return self._data[key]
+
+    def get_or_compute(self, model_key, inputs, compute):
+        """
+        Cached result for (model_key, inputs); on a miss `compute()` is called
+        exactly once and its result stored. Concurrent misses on one key wait
+        for the first caller's result instead of computing their own.
+        """
+        key = self.key(model_key, inputs)
+        with self._lock:
+            if key in self._data:
+                return self._hit(key)
+            computing = self._computing.setdefault(key, threading.Lock())
+
+        with computing:
+            with self._lock:
+                if key in self._data:
+                    return self._hit(key)
+            try:
+                result = compute()
+                with self._lock:
+                    self.misses += 1
+                    record_cache(self.name, hit=False)
+                    self._data[key] = result
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+        return result
+
+    def invalidate(self, model_key=None) -> None:
+        with self._lock:
+            if model_key is None:
+                self._data.clear()
+            else:
+                for k in [k for k in self._data if k[0] == model_key]:
+                    del self._data[k]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else None,
+        }
+
+
+PREDICTIONS = PredictionCache()
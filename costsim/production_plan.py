@@ -0,0 +1,236 @@
+"""
+Production-plan optimiser: the monthly OB/ROM tonnage per pit that meets
+the production targets at the lowest driver cost.
+
+Per-month consumption rates for OB and ROM are estimated from history by
+least squares on the daily rows (quantity ≈ a·OB + b·ROM). Cost per tonne
+is price × rate summed over the elements in dictionaries.Drivers that have
+a rate and tonnage. Every month and pit is then one sparse LP
+(scipy.optimize.linprog / HiGHS):
+
+    minimise    Σ cost_ob · OB + cost_rom · ROM
+    subject to  Σ_pits ROM[m]             ≥ budget ROM[m]         (production)
+                OB[m,p] + ROM[m,p]        ≤ capacity[m,p]         (fleet)
+                Σ_{k≤m} OB[k,p]           ≥ Σ_{k≤m} budget OB[k,p] − backlog[p]
+                Σ_m OB[m,p]               ≥ Σ_m budget OB[m,p]    (stripping)
+
+The cumulative rows let waste stripping move between months, within
+`backlog_months` of a month's budget OB, so it can shift to months where
+OB is cheaper to move.
+
+The plan is compared with the Budget tonnage priced at the same fitted
+rates (`delta`, the saving from the mix); `rate_effect` is what those
+rates add over the budget l/t on their own.
+"""
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+from costsim.instrumentation import instrumented
+from costsim.pyramid import period_keys
+from dictionaries import Drivers, plan_backlog_months, plan_capacity_headroom
+
+log = logging.getLogger(__name__)
+
+KINDS = ("OB", "ROM")
+
+
+# -------------------------------------------------------------------
+# RATE ESTIMATES
+# -------------------------------------------------------------------
+def _fit_rates(ob, rom, quantity, groups):
+    """
+    Per group least-squares (a, b) in quantity ≈ a·ob + b·rom, from the 2×2
+    normal equations of every group at once. Groups where the fit is
+    singular or negative fall back to the pooled l/t for both. Returns
+    (a, b, fitted mask).
+    """
+    sums = pd.DataFrame(
+        {
+            "oo": ob * ob,
+            "or": ob * rom,
+            "rr": rom * rom,
+            "oq": ob * quantity,
+            "rq": rom * quantity,
+            "q": quantity,
+            "t": ob + rom,
+        }
+    ).groupby(groups).sum()
+    det = sums["oo"] * sums["rr"] - sums["or"] ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = (sums["rr"] * sums["oq"] - sums["or"] * sums["rq"]) / det
+        b = (sums["oo"] * sums["rq"] - sums["or"] * sums["oq"]) / det
+        pooled = sums["q"] / sums["t"]
+    ok = (det.abs() > 1e-9 * sums["oo"] * sums["rr"]) & (a >= 0) & (b >= 0)
+    return a.where(ok, pooled), b.where(ok, pooled), ok
+
+
+def rate_estimates(df: pd.DataFrame, pit: str = "All", drivers: dict = Drivers) -> pd.DataFrame:
+    """
+    Per (pit, year_month) from a get_data() frame: OB and ROM cost per tonne
+    ("cost/t OB", "cost/t ROM"), priced at the month's budget price, the
+    budget tonnage and cost, and "split fitted" (False where OB and ROM
+    couldn't be told apart and both got the month's pooled l/t).
+    """
+    months = pd.Index(period_keys(df.index, "Month"), name="year_month")
+    out = None
+    for element, cfg in drivers.items():
+        if "rate" not in cfg or set(cfg.get("tonnage", {})) != set(KINDS):
+            continue
+        ob = df[cfg["tonnage"]["OB"]].to_numpy("float64")
+        rom = df[cfg["tonnage"]["ROM"]].to_numpy("float64")
+        quantity = df[cfg["quantity"]].to_numpy("float64")
+        a, b, fitted = _fit_rates(ob, rom, quantity, months)
+
+        budget = pd.DataFrame(
+            {
+                "price": df[cfg["price"] + " Budget"].to_numpy("float64"),
+                "rate": df[cfg["rate"] + " Budget"].to_numpy("float64"),
+                "OB": df[cfg["tonnage"]["OB"] + " Budget"].to_numpy("float64"),
+                "ROM": df[cfg["tonnage"]["ROM"] + " Budget"].to_numpy("float64"),
+            },
+            index=months,
+        ).groupby(level=0).agg({"price": "mean", "rate": "mean", "OB": "sum", "ROM": "sum"})
+        element_rates = pd.DataFrame(
+            {
+                "cost/t OB": budget["price"] * a,
+                "cost/t ROM": budget["price"] * b,
+                "budget cost": budget["price"] * budget["rate"] * (budget["OB"] + budget["ROM"]),
+            }
+        )
+        if out is None:
+            out = element_rates
+            out["budget OB"] = budget["OB"]
+            out["budget ROM"] = budget["ROM"]
+            out["split fitted"] = fitted
+            # fleet capacity: the most the month moved, actual or budget
+            actual = pd.Series(ob + rom, index=months).groupby(level=0).sum()
+            out["capacity"] = np.maximum(actual, budget["OB"] + budget["ROM"])
+        else:
+            out[["cost/t OB", "cost/t ROM", "budget cost"]] += element_rates
+            out["split fitted"] &= fitted
+    if out is None:
+        raise ValueError("No element in dictionaries.Drivers has a rate and OB/ROM tonnage")
+    if not out["split fitted"].any():
+        # e.g. OB and ROM in a fixed ratio every day: no data on their separate rates
+        log.warning(
+            "%s: OB and ROM l/t could not be separated in any month; both use the pooled "
+            "rate, so the plan has no cost reason to prefer one mix over another",
+            pit,
+        )
+    return pd.concat({pit: out}, names=["pit"])
+
+
+# -------------------------------------------------------------------
+# OPTIMISER
+# -------------------------------------------------------------------
+@dataclass
+class ProductionPlan:
+    plan: pd.DataFrame
+    status: str
+
+    @property
+    def cost(self) -> float:
+        return float(self.plan["cost"].sum())
+
+    @property
+    def baseline_cost(self) -> float:
+        """The Budget tonnage priced at the same fitted rates as the plan."""
+        return float(self.plan["baseline cost"].sum())
+
+    @property
+    def budget_cost(self) -> float:
+        """Budget as planned: budget price × budget l/t × budget tonnage."""
+        return float(self.plan["budget cost"].sum())
+
+    @property
+    def delta(self) -> float:
+        """Plan cost minus the Budget tonnage at the same rates (negative: the mix saves)."""
+        return self.cost - self.baseline_cost
+
+    @property
+    def rate_effect(self) -> float:
+        """Fitted rates over the budget l/t on the Budget tonnage."""
+        return self.baseline_cost - self.budget_cost
+
+    def summary(self) -> pd.DataFrame:
+        """Per month: planned and budget tonnage and cost over every pit."""
+        return self.plan.groupby(level="year_month")[
+            ["OB", "ROM", "budget OB", "budget ROM", "cost", "baseline cost", "budget cost"]
+        ].sum()
+
+
+@instrumented()
+def optimise_plan(
+    rates: pd.DataFrame,
+    rom_target=None,
+    headroom: float = plan_capacity_headroom,
+    backlog_months: float = plan_backlog_months,
+) -> ProductionPlan:
+    """
+    Cheapest OB/ROM tonnage per (pit, year_month) of `rates` (from
+    rate_estimates, one frame per pit concatenated). `rom_target` is the
+    ROM to deliver per year_month over all pits (default: budget ROM).
+    Pit capacity is the history's monthly tonnage plus `headroom`.
+    """
+    rates = rates.sort_index()
+    pits = rates.index.get_level_values("pit").unique()
+    months = rates.index.get_level_values("year_month").unique().sort_values()
+    full = pd.MultiIndex.from_product([pits, months], names=["pit", "year_month"])
+    if len(full) != len(rates):
+        raise ValueError("Every pit needs a rate estimate for every month")
+    grid = rates.reindex(full)
+    n_pits, n_months = len(pits), len(months)
+    n = n_pits * n_months  # OB variables first, then ROM; cell i = pit * n_months + month
+
+    if rom_target is None:
+        rom_target = grid["budget ROM"].groupby(level="year_month").sum()
+    rom_target = pd.Series(rom_target).reindex(months).fillna(0.0).to_numpy("float64")
+
+    cost = np.concatenate([grid["cost/t OB"].to_numpy(), grid["cost/t ROM"].to_numpy()])
+    if not np.all(np.isfinite(cost)):
+        raise ValueError("Rate estimates contain missing values")
+    budget_ob = grid["budget OB"].to_numpy().reshape(n_pits, n_months)
+    cells = np.arange(n)
+    pit_of, month_of = np.divmod(cells, n_months)
+
+    # ROM target per month (≥, written as -Σ ROM ≤ -target)
+    production = sparse.csr_matrix(
+        (-np.ones(n), (month_of, n + cells)), shape=(n_months, 2 * n)
+    )
+    # OB + ROM within fleet capacity per cell
+    fleet = sparse.hstack([sparse.identity(n), sparse.identity(n)], format="csr")
+    capacity = grid["capacity"].to_numpy() * (1 + headroom)
+    # cumulative OB per pit must not fall behind budget by more than the backlog
+    lower = sparse.csr_matrix(np.tril(np.ones((n_months, n_months))))
+    stripping = sparse.hstack(
+        [-sparse.kron(sparse.identity(n_pits), lower), sparse.csr_matrix((n, n))], format="csr"
+    )
+    backlog = backlog_months * budget_ob.mean(axis=1, keepdims=True)
+    backlog = np.broadcast_to(backlog, budget_ob.shape).copy()
+    backlog[:, -1] = 0.0  # the full budget OB by the end of the horizon
+    behind = -(np.cumsum(budget_ob, axis=1) - backlog).ravel()
+
+    result = linprog(
+        cost,
+        A_ub=sparse.vstack([production, fleet, stripping], format="csr"),
+        b_ub=np.concatenate([-rom_target, capacity, behind]),
+        bounds=(0, None),
+        method="highs",
+    )
+    if result.status != 0:
+        raise ValueError(f"No feasible production plan: {result.message}")
+
+    plan = grid[["budget OB", "budget ROM", "cost/t OB", "cost/t ROM", "budget cost"]].copy()
+    plan.insert(0, "OB", result.x[:n])
+    plan.insert(1, "ROM", result.x[n:])
+    plan["cost"] = plan["OB"] * plan["cost/t OB"] + plan["ROM"] * plan["cost/t ROM"]
+    plan["baseline cost"] = (
+        plan["budget OB"] * plan["cost/t OB"] + plan["budget ROM"] * plan["cost/t ROM"]
+    )
+    return ProductionPlan(plan, result.message)
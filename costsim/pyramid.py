@@ -0,0 +1,179 @@
+"""
+Aggregate pyramid: column sums per day, ISO week, month, quarter and
+financial year.
+
+Raw rows are summed to days once; every coarser level is rolled up from the
+day level in the same pass. New rows from ingestion are added into the one
+cell per level they fall into, so the pyramid stays current without
+regrouping the history. A date-range query takes whole periods from their
+level and sums only the edge periods the range cuts through from the day
+level, so totals match filtering the raw rows.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from costsim.cow import CowDict
+from dictionaries import financial_year_start
+
+LEVELS = ("Day", "Week", "Month", "Quarter", "Financial year")
+
+
+# -------------------------------------------------------------------
+# PERIOD KEYS
+# -------------------------------------------------------------------
+def period_keys(dates, level: str, fy_start: int = financial_year_start) -> np.ndarray:
+    """
+    Integer key per date, increasing with time: days since epoch, ISO
+    year*100+week, year*100+month, year*10+quarter, or the year the
+    financial year ends in.
+    """
+    index = pd.DatetimeIndex(dates)
+    if level == "Day":
+        return index.to_numpy().astype("datetime64[D]").astype("int64")
+    if level == "Week":
+        iso = index.isocalendar()
+        return (iso["year"].to_numpy() * 100 + iso["week"].to_numpy()).astype("int64")
+    if level == "Month":
+        return np.asarray(index.year * 100 + index.month, dtype="int64")
+    if level == "Quarter":
+        return np.asarray(index.year * 10 + index.quarter, dtype="int64")
+    if level == "Financial year":
+        late = index.month >= fy_start if fy_start > 1 else np.zeros(len(index), dtype=bool)
+        return np.asarray(index.year + late, dtype="int64")
+    raise ValueError(f"Unknown level {level!r} (expected one of {', '.join(LEVELS)})")
+
+
+def period_label(level: str, key: int) -> str:
+    key = int(key)
+    if level == "Day":
+        return str(np.datetime64(key, "D"))
+    if level == "Week":
+        return f"{key // 100}-W{key % 100:02d}"
+    if level == "Month":
+        return f"{key // 100}-{key % 100:02d}"
+    if level == "Quarter":
+        return f"{key // 10}-Q{key % 10}"
+    if level == "Financial year":
+        return f"FY{key}"
+    raise ValueError(f"Unknown level {level!r} (expected one of {', '.join(LEVELS)})")
+
+
+# -------------------------------------------------------------------
+# PYRAMID
+# -------------------------------------------------------------------
+class AggregatePyramid:
+    def __init__(self, columns, fy_start: int = financial_year_start):
+        self.columns = list(columns)
+        self.fy_start = fy_start
+        # level → {period key: column sums}; sums are replaced, never changed in place
+        self._levels = {level: CowDict() for level in LEVELS}
+        self._span = None  # (first, last) day key
+        self._lock = threading.Lock()
+        self.version = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=None, fy_start: int = financial_year_start):
+        """Build every level from a get_data() frame in one pass over the rows."""
+        columns = list(columns) if columns is not None else list(df.select_dtypes("number").columns)
+        pyramid = cls(columns, fy_start)
+        if df.empty:
+            return pyramid
+        values = np.nan_to_num(df[columns].to_numpy(dtype="float64"))
+        day_keys = period_keys(df.index, "Day")
+        days, inverse = np.unique(day_keys, return_inverse=True)
+        sums = np.zeros((len(days), len(columns)))
+        np.add.at(sums, inverse, values)
+
+        # coarser levels are roll-ups of the day sums, not of the raw rows
+        dates = days.astype("datetime64[D]")
+        for level in LEVELS:
+            keys = days if level == "Day" else period_keys(dates, level, fy_start)
+            grouped = pd.DataFrame(sums).groupby(keys, sort=True).sum()
+            pyramid._levels[level] = CowDict(zip(grouped.index.tolist(), grouped.to_numpy()))
+        pyramid._span = (int(days[0]), int(days[-1]))
+        return pyramid
+
+    def copy(self) -> "AggregatePyramid":
+        """A pyramid sharing this one's cells until either is updated (copy-on-write)."""
+        with self._lock:
+            out = AggregatePyramid(self.columns, self.fy_start)
+            out._levels = {level: cells.copy() for level, cells in self._levels.items()}
+            out._span = self._span
+            out.version = self.version
+            return out
+
+    def update(self, delta: pd.DataFrame) -> None:
+        """
+        Fold a change per day (HistoryStore.append's delta, DatetimeIndex)
+        into each level: one cell per level per changed day.
+        """
+        if delta.empty:
+            return
+        values = np.nan_to_num(delta.reindex(columns=self.columns).to_numpy(dtype="float64"))
+        keys = {level: period_keys(delta.index, level, self.fy_start) for level in LEVELS}
+        with self._lock:
+            for level, level_keys in keys.items():
+                cells = self._levels[level]
+                for key, row in zip(level_keys.tolist(), values):
+                    cell = cells.get(key)
+                    cells[key] = row.copy() if cell is None else cell + row
+            days = keys["Day"]
+            first, last = int(days.min()), int(days.max())
+            if self._span is not None:
+                first, last = min(first, self._span[0]), max(last, self._span[1])
+            self._span = (first, last)
+            self.version += 1
+
+    # ----- queries -----
+    def _partial(self, level: str, key: int, first: int, last: int) -> np.ndarray:
+        """Sums of the days from `first` to `last` (day keys) that fall in period `key`."""
+        days = np.arange(first, last + 1)
+        days = days[period_keys(days.astype("datetime64[D]"), level, self.fy_start) == key]
+        cells = self._levels["Day"]
+        total = np.zeros(len(self.columns))
+        for day in days.tolist():
+            cell = cells.get(day)
+            if cell is not None:
+                total = total + cell
+        return total
+
+    def frame(self, level: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Column sums per period of `level` for the dates from `start` to `end`
+        inclusive (default: everything), indexed by period key, with a
+        "Period" label column. Periods the range only partly covers hold the
+        sums of the covered days.
+        """
+        if level not in self._levels:
+            raise ValueError(f"Unknown level {level!r} (expected one of {', '.join(LEVELS)})")
+        with self._lock:
+            span = self._span
+            cells = self._levels[level]
+        if span is None:
+            return pd.DataFrame(columns=["Period", *self.columns])
+        first = int(period_keys([start], "Day")[0]) if start is not None else span[0]
+        last = int(period_keys([end], "Day")[0]) if end is not None else span[1]
+        if first > last:
+            first, last = last, first
+
+        bounds = np.array([first - 1, first, last, last + 1], dtype="int64").astype("datetime64[D]")
+        before, k_first, k_last, after = period_keys(bounds, level, self.fy_start).tolist()
+        keys = sorted(k for k in cells if k_first <= k <= k_last)
+        rows = {k: cells[k] for k in keys}
+        # edge periods the range cuts through come from the day level; a
+        # period is at most 366 days, so only that many days past an edge count
+        if k_first in rows and before == k_first:
+            rows[k_first] = self._partial(level, k_first, first, min(last, first + 366))
+        if k_last in rows and after == k_last:
+            rows[k_last] = self._partial(level, k_last, max(first, last - 366), last)
+
+        out = pd.DataFrame(
+            np.array([rows[k] for k in keys]).reshape(len(keys), len(self.columns)),
+            index=pd.Index(keys, name="key"),
+            columns=self.columns,
+        )
+        out.insert(0, "Period", [period_label(level, k) for k in keys])
+        return out
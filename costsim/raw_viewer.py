@@ -0,0 +1,147 @@
+"""
+Server-side raw data viewer.
+
+The full history stays on the server; the browser only receives the page of
+rows (and the columns) being looked at. Sort orders and filter masks are
+kept per view so paging through a sorted/filtered result doesn't redo the
+work, and summary statistics are computed once per dataset version.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+from costsim.metrics import record_cache
+
+OPS = ("between", ">=", "<=", "==", "contains")
+
+
+class RawDataView:
+    def __init__(self, df: pd.DataFrame, max_cached: int = 32):
+        self.df = df
+        self.max_cached = max_cached
+        self._summary = None
+        self._orders = OrderedDict()
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ----- summary -----
+    @instrumented("raw_view_summary")
+    def summary(self) -> pd.DataFrame:
+        with self._lock:
+            if self._summary is None:
+                numeric = self.df.select_dtypes("number")
+                stats = numeric.describe().T
+                stats.insert(0, "nulls", self.df[numeric.columns].isna().sum())
+                self._summary = stats
+            return self._summary
+
+    # ----- cached building blocks -----
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+        return value
+
+    def _order(self, sort_by, ascending) -> np.ndarray:
+        key = (sort_by, ascending)
+        with self._lock:
+            if key in self._orders:
+                self._orders.move_to_end(key)
+                return self._orders[key]
+        if sort_by is None or sort_by == self.df.index.name:
+            order = np.arange(len(self.df))
+            if not ascending:
+                order = order[::-1]
+        else:
+            # positional order, NaNs last in both directions
+            values = self.df[sort_by].reset_index(drop=True)
+            order = values.sort_values(ascending=ascending, na_position="last", kind="stable").index.to_numpy()
+        with self._lock:
+            return self._remember(self._orders, key, order)
+
+    def _mask(self, filters: tuple, start=None, end=None) -> np.ndarray:
+        key = (filters, start, end)
+        with self._lock:
+            if key in self._masks:
+                self._masks.move_to_end(key)
+                return self._masks[key]
+
+        mask = np.ones(len(self.df), dtype=bool)
+        if start is not None or end is not None:
+            idx = self.df.index
+            if start is not None:
+                mask &= idx >= pd.Timestamp(start)
+            if end is not None:
+                mask &= idx < pd.Timestamp(end) + pd.Timedelta(days=1)
+        for column, op, value in filters:
+            col = self.df[column]
+            if op == "between":
+                lo, hi = value
+                mask &= col.between(lo, hi).to_numpy()
+            elif op == ">=":
+                mask &= (col >= value).to_numpy()
+            elif op == "<=":
+                mask &= (col <= value).to_numpy()
+            elif op == "==":
+                mask &= (col == value).to_numpy()
+            elif op == "contains":
+                mask &= col.astype(str).str.contains(str(value), case=False, regex=False).to_numpy()
+            else:
+                raise ValueError(f"Unknown filter operator {op!r} (expected one of {OPS})")
+        with self._lock:
+            return self._remember(self._masks, key, mask)
+
+    # ----- query -----
+    def query(
+        self,
+        columns=None,
+        sort_by=None,
+        ascending: bool = True,
+        filters=(),
+        start=None,
+        end=None,
+        page: int = 1,
+        page_size: int = 50,
+    ):
+        """
+        One page of rows as (frame, matching row count). `filters` is a
+        sequence of (column, op, value); `start`/`end` restrict the date index.
+        A page past the end gives the last page, so callers can pass the
+        requested page before they know the count.
+        """
+        filters = tuple((c, op, tuple(v) if isinstance(v, list) else v) for c, op, v in filters)
+        order = self._order(sort_by, ascending)
+        mask = self._mask(filters, start, end)
+        selected = order[mask[order]]
+
+        total = len(selected)
+        page = min(max(1, int(page)), max(1, -(-total // page_size)))
+        rows = selected[(page - 1) * page_size : page * page_size]
+        cols = list(columns) if columns else list(self.df.columns)
+        return self.df.iloc[rows][cols], total
+
+
+class ViewCache:
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, df) -> RawDataView:
+        with self._lock:
+            entry = self._views.get(key)
+            if entry is not None and entry[0] == version:
+                record_cache("raw_view", hit=True)
+                return entry[1]
+        record_cache("raw_view", hit=False)
+        view = RawDataView(df() if callable(df) else df)
+        with self._lock:
+            self._views[key] = (version, view)
+        return view
+
+
+VIEWS = ViewCache()
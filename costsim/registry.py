@@ -0,0 +1,281 @@
+"""
+Page and model registry built from the config in dictionaries.py.
+
+Each cost-variable model is declared once in `Models` (features, artefacts,
+price input) and each model page lists the models it shows in `Pages`.
+Loading and prediction go through the same file watcher, prediction cache
+and metrics for every model, so a new page or model needs config only.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import pandas as pd
+
+import utils
+from costsim.cube import CostCube
+from costsim.inference import compiled_path, load_fast
+from costsim.ingest import (
+    HistoryStore,
+    claim_folder,
+    processed_files,
+    replay_processed,
+    source_key,
+)
+from costsim.metrics import MODEL_LOADS, PREDICTION_SECONDS
+from costsim.partitions import dataset_path, partition_path
+from costsim.prediction_cache import PREDICTIONS
+from costsim.pyramid import AggregatePyramid
+from costsim.shared_history import shared_dir, shared_frame
+from costsim.watcher import WATCHER, watch
+from dictionaries import Data, Feature_labels, Incoming, Models, Pages, datasets, model_accuracy
+
+
+# -------------------------------------------------------------------
+# ARTEFACTS
+# -------------------------------------------------------------------
+def _load_artefact(path):
+    MODEL_LOADS.inc(artefact=os.path.basename(str(path)))
+    # compiled .npz next to the model when present (python -m costsim.inference)
+    return load_fast(path)
+
+
+def artefact_resource(path):
+    """Artefact cached per process and reloaded in the background when replaced."""
+    paths = [path, compiled_path(path)]
+    return watch(f"artefact:{path}", paths, lambda: _load_artefact(path))
+
+
+def load_artefact(path):
+    return artefact_resource(path).get().value
+
+
+def timed_predict(name, model, rows):
+    with PREDICTION_SECONDS.time(model=name):
+        return model.predict(rows)
+
+
+def cached_predict(name, path, rows):
+    """One model call per distinct (model version, rounded inputs)."""
+    snapshot = artefact_resource(path).get()
+    return PREDICTIONS.get_or_compute(
+        (path, snapshot.version), rows, lambda: timed_predict(name, snapshot.value, rows)
+    )
+
+
+# -------------------------------------------------------------------
+# DATA
+# -------------------------------------------------------------------
+def load_history(path):
+    """
+    get_data() frame for `path`; with COSTSIM_SHARED_HISTORY set it's mapped
+    read-only from the copy shared by every server process on the host.
+    """
+    if shared_dir() is None:
+        return utils.get_data(path)
+    return shared_frame(path, utils.get_data)
+
+
+def dataset_key(bu: str, path: str | None = None) -> str:
+    """Watcher name of the BU's history, or of `path` when one is configured."""
+    return f"dataset:{bu}" if path is None else f"dataset:{bu}:{os.path.abspath(path)}"
+
+
+def dataset_resource(bu: str, path: str | None = None):
+    """
+    History of business unit `bu`, shared by every page. Without `path` both
+    the BU's partition and its workbook are watched, and every rebuild reads
+    whichever dataset_path() picks then, so a partition written after start-up
+    takes over from the workbook. With `path` the resource is that file's, so
+    pages configured with different files for one BU don't share a frame.
+    """
+    if path is not None:
+        return watch(dataset_key(bu, path), [path], lambda: load_history(path))
+    paths = [str(partition_path(bu)), datasets.get(bu)]
+    return watch(dataset_key(bu), paths, lambda: load_history(dataset_path(bu)))
+
+
+class SystemData(NamedTuple):
+    """
+    History stores, the aggregate cube and a pyramid per system, and the
+    processed CSVs (`source_key`s per system) already in them. Published
+    snapshots are never changed: `append` returns a new SystemData, so a
+    session always reads the frame, cube and pyramid of one version.
+    """
+
+    stores: dict
+    cube: CostCube
+    pyramids: dict
+    applied: dict
+
+    def append(self, system: str, rows, source=None) -> "SystemData":
+        store = self.stores[system].copy()
+        cube = self.cube.copy()
+        pyramid = self.pyramids[system].copy()
+        delta = store.append(rows)
+        cube.update(system, delta)
+        pyramid.update(delta)
+        applied = self.applied.get(system, frozenset())
+        if source is not None:
+            applied = applied | {source}
+        return SystemData(
+            {**self.stores, system: store},
+            cube,
+            {**self.pyramids, system: pyramid},
+            {**self.applied, system: applied},
+        )
+
+
+def build_system_data() -> SystemData:
+    """History stores, the aggregate cube and a pyramid per system with a data file."""
+    # the frames are private to the stores (or read-only mappings): no copy
+    stores = {
+        system: HistoryStore.from_frame(load_history(path), borrow=True)
+        for system, path in Data.items()
+        if path
+    }
+    # daily CSVs already ingested live only in processed/: put them back on top
+    applied = {
+        system: frozenset(replay_processed(store, Incoming[system]))
+        for system, store in stores.items()
+        if Incoming.get(system)
+    }
+    frames = {s: store.to_frame() for s, store in stores.items()}
+    cube = CostCube.from_frames(frames)
+    pyramids = {
+        s: AggregatePyramid.from_frame(df, columns=stores[s].columns) for s, df in frames.items()
+    }
+    return SystemData(stores, cube, pyramids, applied)
+
+
+def ingest_incoming(resource=None) -> int:
+    """
+    Claim the CSV drops of every system in dictionaries.Incoming into
+    processed/, then publish one snapshot per processed file this process
+    hasn't applied yet, including files another server process claimed.
+    Returns the number of files applied.
+    """
+    resource = resource or system_data_resource()
+    done = 0
+    for system, folder in Incoming.items():
+        data = resource.get().value
+        if not folder or system not in data.stores:
+            continue
+        claim_folder(folder, data.stores[system].columns)
+        # oldest first; a file another process claimed after one of ours was
+        # applied lands later here than on a rebuild, which only matters if
+        # both files carry the same day
+        for path in processed_files(folder):
+            try:
+                key = source_key(path)
+                if key in resource.get().value.applied.get(system, ()):
+                    continue
+                rows = pd.read_csv(path)
+            except FileNotFoundError:
+                continue
+            resource.update(lambda data, rows=rows, key=key: data.append(system, rows, key))
+            done += 1
+    return done
+
+
+def system_data_resource():
+    """
+    SystemData for the system pages; rebuilt when a data workbook is
+    overwritten, with CSV drops ingested on the watcher's polling thread.
+    """
+    resource = watch("system_data", list(Data.values()), build_system_data)
+    WATCHER.add_task("ingest", lambda: ingest_incoming(resource))
+    return resource
+
+
+# -------------------------------------------------------------------
+# SPECS
+# -------------------------------------------------------------------
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    bu: str
+    features: tuple
+    unit: str
+    price: str | None
+    model: str
+    backtest: str | None
+    accuracy: float | None = None
+    absolute: bool = False
+
+    @property
+    def label(self) -> str:
+        return self.name.replace("_", " ")
+
+    def input_label(self, feature: str) -> str:
+        return f"Enter {Feature_labels.get(feature, feature)}"
+
+    def available(self) -> bool:
+        return os.path.exists(self.model)
+
+    def load(self):
+        return load_artefact(self.model)
+
+    def predict(self, row) -> float:
+        """Prediction for one row of inputs in `features` order."""
+        value = float(cached_predict(self.name, self.model, [list(row)])[0])
+        return abs(value) if self.absolute else value
+
+    def load_backtest(self):
+        """Actual vs predicted frame for the backtest period, or None."""
+        if not self.backtest or not os.path.exists(self.backtest):
+            return None
+        return load_artefact(self.backtest).set_index("Date")
+
+
+@dataclass(frozen=True)
+class PageSpec:
+    name: str
+    bu: str
+    title: str
+    data: str | None  # configured data file; None: the BU's partition or workbook
+    models: tuple
+
+    def model(self, name: str) -> ModelSpec:
+        for spec in self.models:
+            if spec.name == name:
+                return spec
+        raise ValueError(f"{self.name} has no model {name!r}")
+
+    @property
+    def model_names(self) -> list:
+        return [spec.name for spec in self.models]
+
+
+def model_spec(name: str, bu: str) -> ModelSpec:
+    if name not in Models:
+        raise ValueError(f"Unknown model {name!r} (expected one of {sorted(Models)})")
+    cfg = Models[name]
+    backtest = cfg.get("backtest")
+    return ModelSpec(
+        name=name,
+        bu=bu,
+        features=tuple(cfg["features"]),
+        unit=cfg.get("unit", "R"),
+        price=cfg.get("price"),
+        model=cfg["model"].format(bu=bu),
+        backtest=backtest.format(bu=bu) if backtest else None,
+        accuracy=model_accuracy.get(bu, {}).get(name),
+        absolute=cfg.get("absolute", False),
+    )
+
+
+def page_spec(name: str, bu: str | None = None) -> PageSpec:
+    """Spec for page `name`, for its configured BU or for `bu`."""
+    if name not in Pages:
+        raise ValueError(f"Unknown page {name!r} (expected one of {sorted(Pages)})")
+    cfg = Pages[name]
+    bu = bu or cfg["bu"]
+    return PageSpec(
+        name=name,
+        bu=bu,
+        title=cfg.get("title", name).format(bu=bu),
+        data=cfg.get("data"),
+        models=tuple(model_spec(m, bu) for m in cfg["models"]),
+    )
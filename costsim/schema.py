@@ -0,0 +1,120 @@
+"""
+Compact dtypes for loaded history.
+
+`compact` applies a schema from dictionaries.Schemas (float32 drivers, small
+int period keys, categoricals for codes) and checks that no cost total moved:
+every downcast float column's total, and price × quantity per element in
+dictionaries.Drivers, must stay within `schema_tolerance` of the float64
+figure. Columns that fail keep their original dtype. `memory_report` shows
+bytes per column before and after.
+
+    python -m costsim.schema Data.xlsx
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dictionaries import Drivers, Schemas, schema_tolerance
+
+
+def _total(series: pd.Series) -> float:
+    return float(np.nansum(series.to_numpy(dtype="float64")))
+
+
+def _close(before: float, after: float, tolerance: float) -> bool:
+    return abs(after - before) <= tolerance * max(abs(before), 1e-12)
+
+
+def _driver_pairs(columns) -> list:
+    """(price, quantity) column pairs, actual and budget, present in `columns`."""
+    pairs = []
+    for drivers in Drivers.values():
+        for suffix in ("", " Budget"):
+            price, quantity = drivers["price"] + suffix, drivers["quantity"] + suffix
+            if price in columns and quantity in columns:
+                pairs.append((price, quantity))
+    return pairs
+
+
+def compact(df: pd.DataFrame, schema="history", tolerance: float | None = None):
+    """
+    (frame with the schema's dtypes, columns kept at their dtype because the
+    downcast moved a total). `schema` is a name in dictionaries.Schemas or a
+    column → dtype mapping.
+    """
+    if isinstance(schema, str):
+        if schema not in Schemas:
+            raise ValueError(f"Unknown schema {schema!r} (expected one of {sorted(Schemas)})")
+        schema = Schemas[schema]
+    tolerance = schema_tolerance if tolerance is None else tolerance
+
+    out = df.copy(deep=False)
+    kept = []
+    for col, dtype in schema.items():
+        if col not in out.columns or out[col].dtype == dtype:
+            continue
+        converted = out[col].astype(dtype)
+        if pd.api.types.is_float_dtype(out[col]) and not _close(
+            _total(out[col]), _total(converted), tolerance
+        ):
+            kept.append(col)
+            continue
+        out[col] = converted
+
+    # cost implied by the drivers (price × quantity) must not move either
+    for price, quantity in _driver_pairs(out.columns):
+        before = np.nansum(df[price].to_numpy("float64") * df[quantity].to_numpy("float64"))
+        after = np.nansum(out[price].to_numpy("float64") * out[quantity].to_numpy("float64"))
+        if not _close(float(before), float(after), tolerance):
+            for col in (price, quantity):
+                if out[col].dtype != df[col].dtype:
+                    out[col] = df[col]
+                    kept.append(col)
+    return out, kept
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Dtype and bytes per column before and after, with a Total row."""
+    b, a = before.memory_usage(deep=True), after.memory_usage(deep=True)
+    report = pd.DataFrame(
+        {
+            "dtype before": before.dtypes.astype(str).reindex(b.index, fill_value="index"),
+            "dtype after": after.dtypes.astype(str).reindex(b.index, fill_value="index"),
+            "bytes before": b,
+            "bytes after": a.reindex(b.index),
+        }
+    )
+    report.loc["Total"] = ["", "", b.sum(), a.sum()]
+    report["saved %"] = (
+        100 * (1 - report["bytes after"] / report["bytes before"].where(report["bytes before"] > 0))
+    ).round(1)
+    return report
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def main(argv=None) -> int:
+    import utils
+
+    parser = argparse.ArgumentParser(
+        prog="python -m costsim.schema",
+        description="Show the memory saved by the compact dtype schema for a history file.",
+    )
+    parser.add_argument("path", help="workbook or Parquet partition")
+    parser.add_argument("--schema", default="history", choices=sorted(Schemas))
+    args = parser.parse_args(argv)
+
+    before = utils.get_data(args.path, schema=None)
+    after, kept = compact(before, args.schema)
+    print(memory_report(before, after).to_string())
+    if kept:
+        print(f"kept at full precision (total moved): {', '.join(kept)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
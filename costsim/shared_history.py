@@ -0,0 +1,272 @@
+"""
+History columns shared between server processes on one host.
+
+One process publishes the numeric history of a workbook into a memory-mapped
+file (on /dev/shm where available); every other worker maps it read-only and
+gets a DataFrame whose columns are zero-copy views, so N workers hold one
+copy of the data instead of N.
+
+File layout (one file per version):
+
+    magic  b"CSHIST02"           8 bytes
+    header length (uint32 LE)    4 bytes, then 4 bytes padding
+    header (JSON)                columns, dtypes, offsets, rows, version, source
+    dates  int64[rows]           datetime64[ns], 64-byte aligned
+    one run per column           in its own dtype (get_data's compact schema),
+                                 each 64-byte aligned
+
+Swap protocol: publishers serialise on `<name>.lock` (flock), write
+`<name>.v<N>` under a temporary name, rename it into place and only then
+atomically replace the `<name>.current` pointer. Readers read the pointer
+and map that version; a reader that loses the race with a cleanup retries
+with the new pointer. Versions older than the previous one are unlinked,
+which doesn't disturb workers that still have them mapped.
+
+Enabled by COSTSIM_SHARED_HISTORY (a directory, or "1" for the default).
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"CSHIST02"
+_PREFIX = struct.Struct("<8sI4x")
+_ALIGN = 64
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def shared_dir() -> Path | None:
+    """Directory for shared history files, or None when sharing is off."""
+    setting = os.environ.get("COSTSIM_SHARED_HISTORY", "")
+    if not setting or setting == "0":
+        return None
+    if setting != "1":
+        return Path(setting)
+    base = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return base / "costsim"
+
+
+def source_signature(path) -> str:
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def segment_name(path) -> str:
+    stem = re.sub(r"[^A-Za-z0-9]+", "_", Path(path).stem)[:24]
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+class SharedHistory:
+    def __init__(self, name: str, directory=None):
+        self.name = name
+        self.directory = Path(directory) if directory else shared_dir()
+        if self.directory is None:
+            raise ValueError("Shared history is off (set COSTSIM_SHARED_HISTORY)")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._attached = None
+        self._local = threading.Lock()
+
+    # ----- paths -----
+    def _file(self, version: int) -> Path:
+        return self.directory / f"{self.name}.v{version}"
+
+    @property
+    def _pointer(self) -> Path:
+        return self.directory / f"{self.name}.current"
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock across processes, for publishing."""
+        import fcntl
+
+        with self._local, open(self.directory / f"{self.name}.lock", "a+") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ----- reading -----
+    def current_version(self) -> int | None:
+        try:
+            return int(json.loads(self._pointer.read_text())["version"])
+        except FileNotFoundError:
+            return None
+
+    def header(self, version: int | None = None) -> dict | None:
+        version = self.current_version() if version is None else version
+        if version is None:
+            return None
+        with open(self._file(version), "rb") as fh:
+            return self._read_header(fh)[0]
+
+    @staticmethod
+    def _read_header(fh):
+        magic, length = _PREFIX.unpack(fh.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{fh.name} is not a shared history file")
+        return json.loads(fh.read(length)), _aligned(_PREFIX.size + length)
+
+    def attach(self, retries: int = 5) -> tuple[int, pd.DataFrame]:
+        """
+        (version, frame) for the current version. The frame's index and
+        columns are read-only views of the mapped file; mapping is reused
+        while the version doesn't change.
+        """
+        for _ in range(retries):
+            version = self.current_version()
+            if version is None:
+                raise FileNotFoundError(f"No shared history published as {self.name!r}")
+            attached = self._attached
+            if attached is not None and attached[0] == version:
+                return attached
+            try:
+                frame = self._map(version)
+            except FileNotFoundError:
+                # cleaned up between reading the pointer and opening; re-read it
+                time.sleep(0.01)
+                continue
+            self._attached = (version, frame)
+            return self._attached
+        raise FileNotFoundError(f"Shared history {self.name!r} kept changing while attaching")
+
+    def _map(self, version: int) -> pd.DataFrame:
+        path = self._file(version)
+        with open(path, "rb") as fh:
+            header, offset = self._read_header(fh)
+        if header["version"] != version:
+            raise ValueError(f"{path} holds version {header['version']}, expected {version}")
+
+        rows = header["rows"]
+        dates = np.memmap(path, dtype="int64", mode="r", offset=offset, shape=(rows,))
+        index = pd.DatetimeIndex(dates.view("datetime64[ns]"), name=header.get("index", "Date"))
+        # one read-only block per column, each a view of the mapping: no copy
+        columns = {
+            col: np.memmap(path, dtype=dtype, mode="r", offset=at, shape=(rows,))
+            for col, dtype, at in zip(header["columns"], header["dtypes"], header["offsets"])
+        }
+        df = pd.DataFrame(columns, index=index, copy=False)
+        df.attrs["shared_version"] = version
+        return df
+
+    # ----- publishing -----
+    def publish(self, df: pd.DataFrame, source: str | None = None) -> int:
+        """Write the numeric columns of `df` as a new version and swap it in."""
+        with self.lock():
+            return self._write(df, source)
+
+    def refresh(self, source: str, load) -> int:
+        """
+        Make sure the current version was published from `source`; if not,
+        publish `load()`. Workers racing on a new source parse it only once.
+        """
+        with self.lock():
+            version = self.current_version()
+            if version is not None and self.header(version).get("source") == source:
+                return version
+            return self._write(load(), source)
+
+    def _write(self, df: pd.DataFrame, source: str | None) -> int:
+        numeric = df.select_dtypes("number")
+        rows = len(numeric)
+        version = (self.current_version() or 0) + 1
+        header = {
+            "version": version,
+            "rows": rows,
+            "columns": [str(c) for c in numeric.columns],
+            "dtypes": [t.str for t in numeric.dtypes],
+            "offsets": [],
+            "index": df.index.name or "Date",
+            "source": source,
+            "created": time.time(),
+        }
+        # offsets depend on the header length, which depends on the offsets:
+        # lay out with placeholder offsets of the final width, then fill in
+        header["offsets"] = [0] * numeric.shape[1]
+        while True:
+            blob = json.dumps(header).encode()
+            offset = _aligned(_PREFIX.size + len(blob))
+            at, offsets = _aligned(offset + 8 * rows), []
+            for dtype in numeric.dtypes:
+                offsets.append(at)
+                at = _aligned(at + dtype.itemsize * rows)
+            if offsets == header["offsets"]:
+                break
+            header["offsets"] = offsets
+
+        final = self._file(version)
+        tmp = final.with_name(final.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(_PREFIX.pack(MAGIC, len(blob)))
+            fh.write(blob)
+            fh.truncate(at)
+        if rows:
+            dates = np.memmap(tmp, dtype="int64", mode="r+", offset=offset, shape=(rows,))
+            dates[:] = pd.DatetimeIndex(df.index).as_unit("ns").asi8
+            dates.flush()
+            del dates
+            for col, dtype, col_at in zip(numeric.columns, numeric.dtypes, offsets):
+                run = np.memmap(tmp, dtype=dtype, mode="r+", offset=col_at, shape=(rows,))
+                run[:] = numeric[col].to_numpy()
+                run.flush()
+                del run
+        os.replace(tmp, final)
+
+        pointer = self._pointer.with_name(self._pointer.name + ".tmp")
+        pointer.write_text(json.dumps({"version": version}))
+        os.replace(pointer, self._pointer)
+
+        # keep the previous version for readers that already read the old pointer
+        for old in self.directory.glob(f"{self.name}.v*"):
+            suffix = old.name.rsplit(".v", 1)[-1]
+            if suffix.isdigit() and int(suffix) < version - 1:
+                old.unlink(missing_ok=True)
+        return version
+
+    def cleanup(self) -> None:
+        """Remove every version, the pointer and the lock file."""
+        for path in self.directory.glob(f"{self.name}.*"):
+            path.unlink(missing_ok=True)
+
+
+# -------------------------------------------------------------------
+# WORKBOOKS
+# -------------------------------------------------------------------
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def history_for(path) -> SharedHistory:
+    name = segment_name(path)
+    with _histories_lock:
+        if name not in _histories:
+            _histories[name] = SharedHistory(name)
+        return _histories[name]
+
+
+def shared_frame(path, loader) -> pd.DataFrame:
+    """
+    get_data()-style frame for workbook `path` from shared memory. The first
+    worker to see a new version of the file parses it with `loader` and
+    publishes it; the others only map it. Numeric columns only, read-only.
+    """
+    history = history_for(path)
+    signature = source_signature(path)
+    version = history.current_version()
+    if version is None or history.header(version).get("source") != signature:
+        history.refresh(signature, lambda: loader(path))
+    return history.attach()[1]
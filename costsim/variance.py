@@ -0,0 +1,139 @@
+"""
+Budget-variance decomposition per element and month.
+
+Actual − Budget cost is split into price, consumption-rate and tonnage
+effects (one per tonnage stream, e.g. OB and ROM):
+
+    tonnage  = P_b · R_b · (T_a − T_b)        split by stream
+    rate     = P_b · (Q_a − R_b · T_a)
+    price    = (P_a − P_b) · Q_a
+
+with cost = Σ price × quantity, P = cost / Q and R = Q / T (litres per tonne
+implied by the data), so the effects add up to the variance exactly. Months
+where a budget ratio is undefined (no budget quantity or tonnage) leave the
+remainder in `residual`.
+
+Everything is one groupby over the history followed by column arithmetic;
+results are cached per dataset version in `VARIANCE`.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from costsim.instrumentation import instrumented
+from dictionaries import Drivers
+
+
+def _budget(column: str) -> str:
+    return f"{column} Budget"
+
+
+def effect_names(element: str) -> list[str]:
+    tonnage = [f"{name} tonnage" for name in Drivers[element]["tonnage"]]
+    return ["price", "rate", *tonnage, "residual"]
+
+
+def _safe_div(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(b != 0, a / np.where(b != 0, b, 1), 0.0)
+
+
+@instrumented("variance_decompose")
+def decompose(df: pd.DataFrame, drivers: dict = Drivers) -> pd.DataFrame:
+    """
+    Long frame with one row per (element, year_month): budget, actual,
+    variance and one column per effect. Elements whose driver columns are
+    missing from `df` are skipped.
+    """
+    periods = (df.index.year * 100 + df.index.month).to_numpy()
+
+    # every summed input for every element, grouped in a single pass
+    inputs = {}
+    for element, spec in drivers.items():
+        needed = [spec["price"], spec["quantity"], *spec["tonnage"].values()]
+        if any(c not in df.columns or _budget(c) not in df.columns for c in needed):
+            continue
+        for side, col in (("a", lambda c: c), ("b", _budget)):
+            price = df[col(spec["price"])].to_numpy(dtype="float64")
+            qty = df[col(spec["quantity"])].to_numpy(dtype="float64")
+            inputs[(element, f"cost_{side}")] = np.nan_to_num(price * qty)
+            inputs[(element, f"qty_{side}")] = np.nan_to_num(qty)
+            for name, column in spec["tonnage"].items():
+                inputs[(element, f"{name}_{side}")] = np.nan_to_num(
+                    df[col(column)].to_numpy(dtype="float64")
+                )
+
+    if not inputs:
+        return pd.DataFrame(columns=["element", "year_month", "budget", "actual", "variance"])
+
+    sums = pd.DataFrame(inputs).groupby(periods).sum()
+
+    frames = []
+    for element in sums.columns.get_level_values(0).unique():
+        s = sums[element]
+        cost_a, cost_b = s["cost_a"].to_numpy(), s["cost_b"].to_numpy()
+        qty_a, qty_b = s["qty_a"].to_numpy(), s["qty_b"].to_numpy()
+        streams = list(drivers[element]["tonnage"])
+        tons_a = sum(s[f"{n}_a"].to_numpy() for n in streams)
+        tons_b = sum(s[f"{n}_b"].to_numpy() for n in streams)
+
+        price_a = _safe_div(cost_a, qty_a)
+        price_b = _safe_div(cost_b, qty_b)
+        rate_b = _safe_div(qty_b, tons_b)
+
+        out = pd.DataFrame(
+            {
+                "element": element,
+                "year_month": sums.index.to_numpy(),
+                "budget": cost_b,
+                "actual": cost_a,
+                "variance": cost_a - cost_b,
+                "price": (price_a - price_b) * qty_a,
+                "rate": price_b * (qty_a - rate_b * tons_a),
+            }
+        )
+        for n in streams:
+            out[f"{n} tonnage"] = price_b * rate_b * (s[f"{n}_a"].to_numpy() - s[f"{n}_b"].to_numpy())
+        explained = out[effect_names(element)[:-1]].sum(axis=1)
+        out["residual"] = out["variance"] - explained
+        frames.append(out)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def waterfall_steps(decomposition: pd.DataFrame, element: str, periods=None) -> pd.Series:
+    """Budget, each effect and Actual summed over `periods` (all when None)."""
+    rows = decomposition[decomposition["element"] == element]
+    if periods is not None:
+        rows = rows[rows["year_month"].isin(periods)]
+    if rows.empty:
+        return pd.Series(dtype="float64")
+    steps = rows[["budget", *effect_names(element), "actual"]].sum()
+    # the residual only shows when budget ratios were undefined for some month
+    if abs(steps["residual"]) < 0.5:
+        steps = steps.drop("residual")
+    return steps
+
+
+class VarianceCache:
+    """Keeps the decomposition for the latest version of each dataset."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, df_or_loader) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        df = df_or_loader() if callable(df_or_loader) else df_or_loader
+        result = decompose(df)
+        with self._lock:
+            self._entries[key] = (version, result)
+        return result
+
+
+VARIANCE = VarianceCache()
@@ -0,0 +1,205 @@
+"""
+Startup warm-up of the shared caches.
+
+Data workbooks, model and backtest artefacts and the Lottie assets are loaded
+concurrently (asyncio driving a thread pool, since parsing, unpickling and
+HTTP are blocking) into the same process-wide caches the pages read from, so
+the first session doesn't pay for them one after another. Every artefact is
+timed; one that fails or times out is reported and skipped, and the page
+that needs it loads it (or shows its own error) as before.
+
+    python -m costsim.warmup                 # warm up and print the report
+    python -m costsim.warmup --serve Home.py # warm up, then start Streamlit in-process
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from costsim.metrics import WARMUP_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupResult:
+    name: str
+    seconds: float
+    ok: bool
+    error: str | None = None
+
+
+@dataclass
+class WarmupReport:
+    results: list = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    @property
+    def failed(self) -> list:
+        return [r for r in self.results if not r.ok]
+
+    def format(self) -> str:
+        width = max([len(r.name) for r in self.results] + [8])
+        lines = [f"{'artefact':<{width}}  {'seconds':>8}  status"]
+        for r in sorted(self.results, key=lambda r: -r.seconds):
+            status = "ok" if r.ok else f"FAILED: {r.error}"
+            lines.append(f"{r.name:<{width}}  {r.seconds:>8.3f}  {status}")
+        serial = sum(r.seconds for r in self.results)
+        lines.append(
+            f"{len(self.results)} artefacts in {self.total_seconds:.3f}s wall "
+            f"({serial:.3f}s if loaded one after another), {len(self.failed)} failed"
+        )
+        return "\n".join(lines)
+
+
+# -------------------------------------------------------------------
+# TASKS
+# -------------------------------------------------------------------
+def default_tasks() -> list:
+    """(name, loader) for everything the pages load on a cold server."""
+    import utils
+    from costsim.partitions import business_units
+    from costsim.registry import (
+        artefact_resource,
+        dataset_key,
+        dataset_resource,
+        page_spec,
+        system_data_resource,
+    )
+    from dictionaries import Lottie, Pages
+
+    tasks = [("system_data", lambda: system_data_resource().get())]
+
+    datasets = {}  # (bu, configured file or None) of every page, in order
+    for name in Pages:
+        spec = page_spec(name)
+        datasets[spec.bu, spec.data] = None
+        for model in spec.models:
+            for path in (model.model, model.backtest):
+                if path and os.path.exists(path):
+                    tasks.append((f"artefact:{path}", lambda p=path: artefact_resource(p).get()))
+    for bu in business_units():
+        datasets[bu, None] = None
+    for bu, path in datasets:
+        tasks.append((dataset_key(bu, path), lambda b=bu, p=path: dataset_resource(b, p).get()))
+    for page, url in Lottie.items():
+        tasks.append((f"lottie:{page}", lambda u=url: _require(utils.load_lottie(u), u)))
+
+    # the same artefact can appear on several pages
+    return list(dict(tasks).items())
+
+
+def _require(value, what):
+    if value is None:
+        raise RuntimeError(f"could not fetch {what}")
+    return value
+
+
+# -------------------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------------------
+def _timed(name, loader) -> WarmupResult:
+    start = time.perf_counter()
+    try:
+        loader()
+        result = WarmupResult(name, time.perf_counter() - start, True)
+    except Exception as e:
+        result = WarmupResult(name, time.perf_counter() - start, False, f"{type(e).__name__}: {e}")
+    return result
+
+
+async def _warm(tasks, max_workers: int, timeout: float) -> list:
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup")
+
+    async def one(name, loader):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(pool, _timed, name, loader), timeout
+            )
+        except asyncio.TimeoutError:
+            # the thread finishes in the background; the cache still gets it
+            return WarmupResult(name, time.perf_counter() - start, False, f"timed out after {timeout}s")
+
+    try:
+        return await asyncio.gather(*(one(name, loader) for name, loader in tasks))
+    finally:
+        pool.shutdown(wait=False)
+
+
+def warm_up(tasks=None, max_workers: int = 8, timeout: float = 120.0) -> WarmupReport:
+    """Run every (name, loader) concurrently and report per-artefact timings."""
+    tasks = default_tasks() if tasks is None else list(tasks)
+    start = time.perf_counter()
+    results = asyncio.run(_warm(tasks, max_workers, timeout)) if tasks else []
+    report = WarmupReport(list(results), time.perf_counter() - start)
+
+    for r in report.results:
+        WARMUP_SECONDS.observe(r.seconds, artefact=r.name, status="ok" if r.ok else "error")
+        if r.ok:
+            log.info("warm-up: %s in %.3fs", r.name, r.seconds)
+        else:
+            log.warning("warm-up: %s failed after %.3fs (%s)", r.name, r.seconds, r.error)
+    return report
+
+
+_started = None
+_started_lock = threading.Lock()
+
+
+def start_warmup(**kwargs) -> threading.Thread:
+    """Warm up once per process in a background thread; later calls are no-ops."""
+    global _started
+    with _started_lock:
+        if _started is None:
+            _started = threading.Thread(
+                target=warm_up, kwargs=kwargs, daemon=True, name="costsim-warmup"
+            )
+            _started.start()
+        return _started
+
+
+# -------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m costsim.warmup", description="Preload data, models and assets."
+    )
+    parser.add_argument("-j", "--workers", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per artefact, seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--serve",
+        nargs=argparse.REMAINDER,
+        metavar="SCRIPT [ARGS]",
+        help="after warming up, run `streamlit run SCRIPT` in this process",
+    )
+    args = parser.parse_args(argv)
+
+    report = warm_up(max_workers=args.workers, timeout=args.timeout)
+    if args.json:
+        print(json.dumps({"total_seconds": report.total_seconds,
+                          "results": [asdict(r) for r in report.results]}, indent=2))
+    else:
+        print(report.format())
+
+    if args.serve:
+        from streamlit.web import cli as stcli
+
+        # same process, so the pages find the caches already filled
+        sys.argv = ["streamlit", "run", *args.serve]
+        return stcli.main()
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
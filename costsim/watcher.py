@@ -0,0 +1,201 @@
+"""
+File-watcher driven cache invalidation.
+
+A `WatchedResource` owns one cached value built from one or more files
+(Data.xlsx, a joblib model, ...). A background thread polls the files; once a
+change has settled (same size and mtime on two consecutive polls, so a file
+that is still being written is not read) the value is rebuilt off the request
+path and swapped in atomically. Readers call `get()` once per rerun and keep
+the returned `Snapshot`, so a rerun never sees half of an old and half of a
+new build. If a rebuild fails the previous snapshot stays in place.
+
+Values are never changed after they are published: `update` derives the
+next value from the current one (copy-on-write) and publishes it as a new
+version, serialised with rebuilds. `Watcher.add_task` runs extra work, such
+as ingesting dropped files, on the same polling thread.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from costsim.metrics import REGISTRY, record_cache
+
+log = logging.getLogger(__name__)
+
+RELOADS = REGISTRY.counter(
+    "costsim_cache_reloads_total", "Watched cache rebuilds by resource and result", ["resource", "result"]
+)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    value: Any
+    built_at: float
+    build_seconds: float
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class WatchedResource:
+    def __init__(self, name: str, paths, builder: Callable[[], Any]):
+        self.name = name
+        self.paths = [p for p in paths if p]
+        self.builder = builder
+        self._lock = threading.Lock()
+        self._first_build = threading.Lock()
+        # builds and updates publish one at a time, so neither drops the other
+        self._write = threading.RLock()
+        self._snapshot = None
+        self._seen = None
+        self._pending = None
+        self._rebuilding = False
+
+    def _signature(self):
+        return tuple(_stat(p) for p in self.paths)
+
+    def _build(self, signature) -> Snapshot:
+        with self._write:
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            start = time.perf_counter()
+            value = self.builder()
+            snap = Snapshot(version, value, time.time(), time.perf_counter() - start)
+            with self._lock:
+                self._snapshot = snap
+                self._seen = signature
+            return snap
+
+    def get(self) -> Snapshot:
+        """Current snapshot; the first call builds synchronously."""
+        snap = self._snapshot
+        record_cache(self.name, hit=snap is not None)
+        if snap is not None:
+            return snap
+        # concurrent first callers (e.g. warm-up and the first session) wait
+        # for one build instead of each building their own
+        with self._first_build:
+            if self._snapshot is not None:
+                return self._snapshot
+            return self._build(self._signature())
+
+    def update(self, func: Callable[[Any], Any]) -> Snapshot:
+        """
+        Publish `func(current value)` as the next version. `func` must
+        return a new value rather than change the current one, which
+        sessions may still be reading.
+        """
+        self.get()  # build first: get() takes _first_build before _write
+        with self._write:
+            current = self._snapshot
+            start = time.perf_counter()
+            value = func(current.value)
+            snap = Snapshot(current.version + 1, value, time.time(), time.perf_counter() - start)
+            with self._lock:
+                self._snapshot = snap
+            return snap
+
+    def check(self) -> bool:
+        """
+        Poll the files. Starts a background rebuild when a change has been
+        stable for one poll interval; returns True if one was started.
+        """
+        if self._snapshot is None or self._rebuilding:
+            return False
+
+        signature = self._signature()
+        if signature == self._seen:
+            self._pending = None
+            return False
+        if any(s is None and seen is not None for s, seen in zip(signature, self._seen)):
+            # a file the value was built from is mid-replace (or gone); keep
+            # serving the old snapshot. Paths that didn't exist yet may appear.
+            return False
+        if signature != self._pending:
+            self._pending = signature
+            return False
+
+        self._pending = None
+        self._rebuilding = True
+        threading.Thread(
+            target=self._rebuild, args=(signature,), daemon=True, name=f"rebuild-{self.name}"
+        ).start()
+        return True
+
+    def _rebuild(self, signature) -> None:
+        try:
+            snap = self._build(signature)
+            RELOADS.inc(resource=self.name, result="ok")
+            log.info("Rebuilt %s (v%d) in %.2fs", self.name, snap.version, snap.build_seconds)
+        except Exception:
+            # remember the signature so a broken file isn't retried every poll
+            with self._lock:
+                self._seen = signature
+            RELOADS.inc(resource=self.name, result="error")
+            log.exception("Rebuilding %s failed; keeping v%d", self.name, self._snapshot.version)
+        finally:
+            self._rebuilding = False
+
+
+class Watcher:
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.resources = {}
+        self.tasks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, name: str, paths, builder) -> WatchedResource:
+        """Register (or return the already registered) resource called `name`."""
+        with self._lock:
+            resource = self.resources.get(name)
+            if resource is None:
+                resource = self.resources[name] = WatchedResource(name, paths, builder)
+        self.start()
+        return resource
+
+    def add_task(self, name: str, func: Callable[[], Any]) -> None:
+        """Run `func` on every poll (registering the same name again replaces it)."""
+        with self._lock:
+            self.tasks[name] = func
+        self.start()
+
+    def poll(self) -> None:
+        for resource in list(self.resources.values()):
+            resource.check()
+        for name, func in list(self.tasks.items()):
+            try:
+                func()
+            except Exception:
+                log.exception("Watcher task %s failed", name)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True, name="costsim-watcher")
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+WATCHER = Watcher(interval=float(os.environ.get("COSTSIM_WATCH_INTERVAL", "2")))
+
+
+def watch(name: str, paths, builder) -> WatchedResource:
+    return WATCHER.watch(name, paths, builder)
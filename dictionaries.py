@@ -4,6 +4,45 @@ Data = {
     "Ops Support": "", 
     }
 
+# Drop folders for new daily rows (CSV, same columns as the data workbook).
+Incoming = {
+    "Mining System": "incoming/Mining System",
+    "Plant System": "",
+    "Ops Support": "",
+    }
+
+# Datasets per business unit (Ops System page)
+datasets = {
+    "Mafube": "Data.xlsx",
+    }
+
+# Compact dtypes per dataset schema, applied by get_data() (costsim.schema).
+# Columns not listed keep their dtype; "category" suits code columns. Rand
+# costs stay float64. A downcast column whose total (or an element's
+# price × quantity total) moves by more than schema_tolerance, relative, is
+# kept at float64.
+Schemas = {
+    "history": {
+        "Con rate (l/t)": "float32",
+        "Con rate (l/t) Budget": "float32",
+        "OB (T)": "float32",
+        "OB (T) Budget": "float32",
+        "ROM (T)": "float32",
+        "ROM (T) Budget": "float32",
+        "Quantity (l)": "float32",
+        "Quantity (l) Budget": "float32",
+        "Price (R/l)": "float32",
+        "Price (R/l) Budget": "float32",
+        "year_month": "int32",
+        "year": "int16",
+    },
+}
+schema_tolerance = 1e-6
+
+# Per-BU Parquet partitions, data/bu=<BU>/history.parquet (python -m costsim.partitions);
+# a BU's partition is used instead of its workbook above when it exists
+data_root = "data"
+
 Systems = ["Mining System", "Plant System", "Ops Support","Scenarios"]
 
 Variable = {
@@ -53,3 +92,119 @@ Elements = {
     "Labour": {},
     "Outside Services": {},
 }
+
+# Data columns holding each element's cost, per measure. Used to build the
+# aggregate cube; elements without an entry have no data yet.
+Columns = {
+    "Diesel": {"actual": "Diesel (R)", "budget": "Diesel (R) Budget"},
+}
+
+# Input labels for model features (shown as "Enter <label>").
+Feature_labels = {
+    "TTH": "TTH volume (kg)",
+    "TTH_Lag": "Previous TTH volume (kg)",
+    "ROM": "ROM volume (kg)",
+    "Product": "Product volume (kg)",
+    "Feed_To_Plant": "Feed to Plant volume (kg)",
+    "Diesel_Lag": "Previous Diesel (L)",
+    "Maintenance_Lag": "Previous Maintenance (R)",
+    "Year": "year",
+    "Year_Month": "year month",
+}
+
+# Cost-variable models. "features" is the order the model was trained on;
+# "price" names the price input used to cost a predicted quantity (None when
+# the model already predicts Rand). "{bu}" is filled in per business unit.
+Models = {
+    "Diesel": {
+        "features": ["TTH", "Year", "Diesel_Lag", "TTH_Lag"],
+        "unit": "L",
+        "price": "Diesel",
+        "model": "models/{bu}/Diesel.joblib",
+        "backtest": "models/{bu}/Diesel_backtest.joblib",
+    },
+    "Explosives": {
+        "features": ["TTH", "Year_Month", "Year", "TTH_Lag"],
+        "unit": "Kg",
+        "price": "Explosives",
+        "model": "models/{bu}/Explosives.joblib",
+        "backtest": "models/{bu}/Explosives_backtest.joblib",
+    },
+    "Magnetite": {
+        "features": ["Feed_To_Plant", "Product", "Year"],
+        "unit": "Kg",
+        "price": "Magnetite",
+        "absolute": True,
+        "model": "models/{bu}/Magnetite.joblib",
+        "backtest": "models/{bu}/Magnetite_backtest.joblib",
+    },
+    "Maintenance": {
+        "features": ["ROM", "Feed_To_Plant", "Year_Month", "Year", "Maintenance_Lag"],
+        "unit": "R",
+        "price": None,
+        "model": "models/{bu}/Maintenance.joblib",
+        "backtest": "models/{bu}/Maintenance_backtest.joblib",
+    },
+    "Energy_Consumption": {
+        "features": ["TTH", "ROM", "Product", "Year_Month", "Year"],
+        "unit": "R",
+        "price": None,
+        "absolute": True,
+        "model": "models/{bu}/Energy_Consumption.joblib",
+        "backtest": "models/{bu}/Energy_Consumption_backtest.joblib",
+    },
+    "Energy_Price": {
+        "features": ["ROM", "Product", "Year"],
+        "unit": "R",
+        "price": None,
+        "model": "models/{bu}/Energy_Price.joblib",
+        "backtest": "models/{bu}/Energy_Price_backtest.joblib",
+    },
+}
+
+# Backtest accuracy (%) per business unit, filled in when a model is retrained.
+model_accuracy = {
+    "Mafube": {},
+}
+
+# Model pages, all rendered by System.render_model_page.
+Pages = {
+    "Ops System": {
+        "bu": "Mafube",
+        "title": "{bu} Variable Cost Models",
+        "models": ["Diesel", "Explosives", "Magnetite", "Maintenance", "Energy_Price", "Energy_Consumption"],
+    },
+    "Plant System": {
+        "bu": "Mafube",
+        "title": "{bu} Plant System Models",
+        "models": ["Magnetite", "Energy_Consumption", "Energy_Price"],
+    },
+}
+
+# Month the financial year starts in (1 = calendar year). Financial years are
+# labelled by the year they end in; used by the aggregate pyramid.
+financial_year_start = 1
+
+# Cost drivers per element for the budget-variance decomposition and goal
+# seek: cost is price × quantity and quantity is con rate × tonnage. Budget
+# columns are the same names with " Budget" appended.
+Drivers = {
+    "Diesel": {
+        "price": "Price (R/l)",
+        "rate": "Con rate (l/t)",
+        "quantity": "Quantity (l)",
+        "tonnage": {"OB": "OB (T)", "ROM": "ROM (T)"},
+    },
+}
+
+# Production-plan optimiser (costsim.production_plan): extra fleet capacity
+# over the most a pit moved in a month, and how many months of budget OB the
+# cumulative stripping may fall behind before it has to catch up.
+plan_capacity_headroom = 0.1
+plan_backlog_months = 1
+
+# Lottie animations per page (fetched once per process, see utils.load_lottie).
+Lottie = {
+    "Home": "https://assets10.lottiefiles.com/packages/lf20_059pfp0Z5i.json",
+    "Ops System": "https://assets5.lottiefiles.com/packages/lf20_ft6xCqcC4s.json",
+}
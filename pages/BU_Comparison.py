@@ -0,0 +1,50 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from costsim.ingest import NUMERIC_COLUMNS
+from costsim.metrics import record_rerun, start_exporters
+from costsim.partitions import business_units, compare
+from costsim.warmup import start_warmup
+
+st.set_page_config(layout="wide", page_icon="chart_with_upwards_trend", page_title="BU Comparison")
+
+start_exporters()
+start_warmup()
+ctx = get_script_run_ctx()
+record_rerun("BU Comparison", ctx.session_id if ctx else None)
+
+st.markdown(
+    "<h1 style='text-align: center; color: black;'>Business Unit Comparison</h1>",
+    unsafe_allow_html=True,
+)
+
+# Every BU has the same cost structure (data/bu=<BU>/, see costsim.partitions)
+bus = business_units()
+with st.sidebar:
+    selected = st.multiselect("Business units", bus, default=bus, key="compare_bus")
+    metrics = st.multiselect(
+        "Cost drivers", NUMERIC_COLUMNS, default=["Diesel (R)", "Diesel (R) Budget"], key="compare_metrics"
+    )
+    period = st.radio("Period", ["Month", "Year"], horizontal=True, key="compare_period")
+
+if not selected or not metrics:
+    st.info("Select at least one business unit and one cost driver.")
+    st.stop()
+
+period_col = "year_month" if period == "Month" else "year"
+# partitions load in parallel, then one groupby over (BU, period)
+table = compare(selected, metrics, period=period_col)
+if period == "Month":
+    table[period_col] = pd.to_datetime(table[period_col].astype(str), format="%Y%m")
+
+for metric in metrics:
+    fig = px.bar(
+        table, x=period_col, y=metric, color="BU", barmode="group",
+        title=f"{metric} by {period.lower()}",
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+st.markdown("### Totals")
+st.dataframe(table.groupby("BU", observed=True)[metrics].sum())
@@ -1,12 +1,29 @@
+import functools
+import os
+
 import streamlit as st
 from streamlit_option_menu import option_menu
 import pandas as pd
 import numpy as np
 from streamlit_mermaid import st_mermaid
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from costsim.instrumentation import (
+    Recorder,
+    current_recorder,
+    instrumented,
+    recording,
+    stage,
+)
+from costsim.metrics import (
+    SCENARIO_UPLOAD_BYTES,
+    record_recorder,
+    record_rerun,
+    start_exporters,
+)
 
 from utils import (
-    get_data,
-    prepare_diesel_data,
+    prepare_diesel_levels,
     create_monthly_chart,
     create_cumulative_chart,
     create_cost_drivers_table,
@@ -14,12 +31,23 @@ from utils import (
     load_scenario_data,
     calculate_scenario_metrics,
     create_scenario_mermaid,
+    create_forecast_fan_chart,
+    create_variance_waterfall,
     fmt0,
     fmt2,
     apply_epbcs_and_simulation,   # must exist in utils.py
 )
 
-from dictionaries import Data, Variable, Elements
+from dictionaries import Variable, Elements
+from costsim.cube import CostCube, periods_between, range_total
+from costsim.pyramid import LEVELS, AggregatePyramid
+from costsim.registry import system_data_resource
+from costsim.features import FeatureCache, complete_months
+from costsim.forecasting import LinearModel, recursive_forecast
+from costsim.variance import VARIANCE, waterfall_steps
+from costsim.goalseek import MONTHLY_DRIVERS, goal_seek
+from costsim.diagrams import DIAGRAMS
+from costsim.warmup import start_warmup
 
 
 SIDEBAR_MENU_STYLE = {
@@ -46,6 +74,30 @@ SIDEBAR_MENU_STYLE = {
 }
 
 
+def fragment(func):
+    """
+    `st.fragment` for a section of this page. Widgets inside re-run only the
+    section; those reruns get their own Recorder since main() isn't running.
+    """
+
+    @st.fragment
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if current_recorder() is not None:
+            # part of a full page run
+            return func(*args, **kwargs)
+        ctx = get_script_run_ctx()
+        record_rerun(f"Mining System:{func.__name__}", ctx.session_id if ctx else None)
+        recorder = Recorder(page="Mining System")
+        with recording(recorder):
+            result = func(*args, **kwargs)
+        record_recorder(recorder)
+        return result
+
+    return run
+
+
+@instrumented()
 def setup_page():
     st.set_page_config(
         layout="wide",
@@ -318,40 +370,55 @@ def setup_page():
     )
 
 
+@fragment
+def sidebar_fragment():
+    """
+    Element menus. A change only re-runs this fragment, which then asks for a
+    full rerun because the rest of the page depends on the selection.
+    """
+    selection = create_sidebar()
+    previous = st.session_state.get("sidebar_selection")
+    st.session_state["sidebar_selection"] = selection
+    if previous is not None and previous != selection:
+        st.rerun()
+    return selection
+
+
+@instrumented()
 def create_sidebar():
-    with st.sidebar:
-        st.markdown(
-            "<h3 style='color:#f9fafb; margin-bottom:10px;'>Cost Elements</h3>",
-            unsafe_allow_html=True,
-        )
+    """Call inside `with st.sidebar` (fragments can't open the sidebar themselves)."""
+    st.markdown(
+        "<h3 style='color:#f9fafb; margin-bottom:10px;'>Cost Elements</h3>",
+        unsafe_allow_html=True,
+    )
+
+    selected_element = option_menu(
+        "",
+        Variable["Mining System"],
+        default_index=0,
+        orientation="vertical",
+        key="cost_element_menu",
+        styles=SIDEBAR_MENU_STYLE,
+    )
 
-        selected_element = option_menu(
-            "",
-            Variable["Mining System"],
+    selected_item_name = None
+    selected_item_code = None
+
+    element_items = Elements.get(selected_element, {})
+    if element_items:
+        display_items = [f"{name} : {code}" for name, code in element_items.items()]
+        selected_display = option_menu(
+            "Cost Elements",
+            display_items,
             default_index=0,
             orientation="vertical",
-            key="cost_element_menu",
+            key=f"item_menu_{selected_element}",
             styles=SIDEBAR_MENU_STYLE,
         )
-
-        selected_item_name = None
-        selected_item_code = None
-
-        element_items = Elements.get(selected_element, {})
-        if element_items:
-            display_items = [f"{name} : {code}" for name, code in element_items.items()]
-            selected_display = option_menu(
-                "Cost Elements",
-                display_items,
-                default_index=0,
-                orientation="vertical",
-                key=f"item_menu_{selected_element}",
-                styles=SIDEBAR_MENU_STYLE,
-            )
-            if selected_display:
-                name, code = selected_display.split(" : ")
-                selected_item_name = name.strip()
-                selected_item_code = code.strip()
+        if selected_display:
+            name, code = selected_display.split(" : ")
+            selected_item_name = name.strip()
+            selected_item_code = code.strip()
 
     return selected_element, selected_item_name, selected_item_code
 
@@ -386,7 +453,60 @@ def create_upload_trigger(show_button: bool):
             st.session_state["show_scenario"] = True
 
 
-def display_diesel_analysis(df, display_code):
+# Rebuilt in the background whenever a data workbook is overwritten; daily CSV
+# drops are ingested on the watcher thread and published as new snapshots.
+SYSTEM_DATA = system_data_resource()
+
+
+def current_system_data():
+    """(history frame, cube, pyramid, version) for Mining System from the shared snapshot."""
+    # one snapshot per call; snapshots are never changed, so all three match
+    snapshot = SYSTEM_DATA.get()
+    data = snapshot.value
+    df = data.stores["Mining System"].to_frame()
+    return df, data.cube, data.pyramids["Mining System"], snapshot.version
+
+
+def simulated_impact(cube: CostCube, pyramid: AggregatePyramid, monthly, display_code, start_date, end_date):
+    """System / category / element totals with Diesel replaced by the Simulation."""
+    if "Simulation" not in monthly.columns:
+        return None
+    # both terms over exactly start..end, edge months included only in part
+    delta = monthly["Simulation"].sum() - monthly["Diesel (R)"].sum()
+    levels = {
+        "system": (),
+        "category": ("Consumables",),
+        "element": ("Consumables", display_code),
+    }
+    return {
+        name: range_total(cube, pyramid, start_date, end_date, "Mining System", *keys) + delta
+        for name, keys in levels.items()
+    }
+
+
+@fragment
+def diesel_charts_fragment(display_code):
+    """
+    Date selector and everything driven by it. Returns the selected
+    (start, end) for the sections below; a granularity change re-runs only
+    this, a date change the whole page so they follow the new range.
+    """
+    date_range = None
+    try:
+        df, cube, pyramid, version = current_system_data()
+        variance = VARIANCE.get("Mining System", version, df)
+        date_range = display_diesel_analysis(df, display_code, cube, variance, pyramid)
+    except Exception as e:
+        st.error(str(e))
+    previous = st.session_state.get("diesel_date_range")
+    st.session_state["diesel_date_range"] = date_range
+    if previous is not None and previous != date_range:
+        st.rerun()
+    return date_range
+
+
+@instrumented()
+def display_diesel_analysis(df, display_code, cube: CostCube, variance, pyramid: AggregatePyramid):
     if df.empty:
         st.warning("No data available for Diesel.")
         return
@@ -395,6 +515,14 @@ def display_diesel_analysis(df, display_code):
     max_date = df.index.max().date()
 
     left_space, date_area = st.columns([2.3, 1.2])
+    with left_space:
+        granularity = st.radio(
+            "Granularity",
+            LEVELS,
+            index=LEVELS.index("Month"),
+            horizontal=True,
+            key="granularity",
+        )
     with date_area:
         from_col, to_col = st.columns(2)
 
@@ -425,21 +553,16 @@ def display_diesel_analysis(df, display_code):
     if start_date > end_date:
         start_date, end_date = end_date, start_date
 
-    st.session_state["sim_start_date"] = start_date
-    st.session_state["sim_end_date"] = end_date
-
-    mask = (df.index.date >= start_date) & (df.index.date <= end_date)
-    df_filtered = df.loc[mask]
+    # from the aggregate pyramid; switching granularity doesn't regroup raw rows
+    monthly = prepare_diesel_levels(pyramid, granularity, start_date, end_date)
 
-    if df_filtered.empty:
+    if monthly.empty:
         st.warning("No data in the selected date range.")
-        return
-
-    monthly = prepare_diesel_data(df_filtered)
+        return start_date, end_date
 
     # Add EPBCS + Simulation series if a scenario has been loaded
     scenario_df = st.session_state.get("scenario_df")
-    monthly = apply_epbcs_and_simulation(monthly, scenario_df)
+    monthly = apply_epbcs_and_simulation(monthly, scenario_df, level=granularity)
 
     fig_month = create_monthly_chart(monthly, display_code)
     fig_cum = create_cumulative_chart(monthly, display_code)
@@ -460,9 +583,147 @@ def display_diesel_analysis(df, display_code):
 
     bottom_left, bottom_right = st.columns([2, 1.2])
     with bottom_left:
-        st.markdown(create_cost_drivers_table(monthly), unsafe_allow_html=True)
+        # one column per period: below Month that's hundreds, so show months
+        table = monthly
+        if LEVELS.index(granularity) < LEVELS.index("Month"):
+            table = apply_epbcs_and_simulation(
+                prepare_diesel_levels(pyramid, "Month", start_date, end_date), scenario_df, level="Month"
+            )
+        st.markdown(create_cost_drivers_table(table), unsafe_allow_html=True)
     with bottom_right:
-        st.markdown(create_impact_card(display_code), unsafe_allow_html=True)
+        impact = simulated_impact(cube, pyramid, monthly, display_code, start_date, end_date)
+        st.markdown(create_impact_card(display_code, impact), unsafe_allow_html=True)
+
+    # months overlapping the selected range, from the cached decomposition
+    steps = waterfall_steps(variance, "Diesel", periods_between(start_date, end_date))
+    if not steps.empty:
+        st.plotly_chart(
+            create_variance_waterfall(steps, display_code), use_container_width=True
+        )
+    return start_date, end_date
+
+
+# ---------- FORECAST ----------
+
+FORECAST_INPUTS = ["TTH", "Diesel_Cost_Lag"]
+MINING_FEATURES = FeatureCache()
+
+
+@fragment
+@instrumented()
+def display_forecast_section(display_code):
+    """
+    Fan chart of monthly diesel cost rolled forward 12–36 months. Uses a
+    lag model fitted on complete months of history; TTH paths are
+    bootstrapped from history, which gives the band its width.
+    """
+    df, _, _, version = current_system_data()
+    features = MINING_FEATURES.get("Mining System", version, lambda: complete_months(df))
+
+    with st.expander("Forecast", expanded=False):
+        col_h, col_p = st.columns(2)
+        horizon = col_h.slider("Horizon (months)", 12, 36, 12, step=6, key="fc_horizon")
+        n_paths = col_p.select_slider(
+            "Scenario paths", [100, 250, 500, 1000], value=250, key="fc_paths"
+        )
+
+        try:
+            model = LinearModel.fit(features, "Diesel_Cost", FORECAST_INPUTS)
+            forecast = recursive_forecast(
+                model, FORECAST_INPUTS, "Diesel_Cost", features, horizon, n_paths
+            )
+        except ValueError as e:
+            st.info(f"Not enough history for a forecast yet ({e}).")
+            return
+
+        actual = features["Diesel_Cost"].dropna()
+        st.plotly_chart(
+            create_forecast_fan_chart(actual, forecast.fan(), display_code),
+            use_container_width=True,
+        )
+
+
+# ---------- GOAL SEEK ----------
+
+GOAL_SEEK_DRIVERS = {
+    "Price": ["price"],
+    "Con rate": ["rate"],
+    "Tonnage (OB + ROM)": ["tonnage"],
+    "Price + con rate": ["price", "rate"],
+}
+
+
+@fragment
+@instrumented()
+def display_goal_seek_section(date_range=None):
+    """
+    What price, consumption rate or tonnage brings Diesel back to Budget over
+    `date_range`, the charts' selection (the whole history without one);
+    every month is solved at once from the cached monthly driver table.
+    """
+    df, _, _, version = current_system_data()
+    table = MONTHLY_DRIVERS.get("Mining System", version, df)
+    start, end = date_range or (df.index.min(), df.index.max())
+    months = periods_between(start, end)
+    in_range = [m for m in table.index.get_level_values("year_month").unique() if m in months]
+
+    with st.expander("Goal seek: back to Budget", expanded=False):
+        if not in_range:
+            st.info("No months in the selected date range.")
+            return
+        c1, c2, c3, c4 = st.columns(4)
+        solve_label = c1.selectbox("Solve for", list(GOAL_SEEK_DRIVERS), key="gs_driver")
+        target = c2.radio(
+            "Target", ["Budget for the period", "Budget each month"], key="gs_target"
+        )
+        replan = c3.selectbox(
+            "Re-plan from",
+            in_range,
+            format_func=lambda m: f"{m // 100}-{m % 100:02d}",
+            key="gs_from",
+        )
+        limit = c4.slider("Max change (%)", 0, 100, 0, step=5, key="gs_limit",
+                          help="0 = no limit")
+
+        solve_for = GOAL_SEEK_DRIVERS[solve_label]
+        result = goal_seek(
+            table,
+            solve_for,
+            target="year" if target == "Budget for the period" else "month",
+            months=in_range,
+            replan_from=pd.Timestamp(replan // 100, replan % 100, 1),
+            limits={name: limit / 100 for name in solve_for} if limit else None,
+        )
+
+        totals = result.summary().sum()
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Current cost", f"R {fmt0(totals['cost'])}")
+        m2.metric("Budget cost", f"R {fmt0(totals['budget cost'])}")
+        m3.metric(
+            "Cost with solved drivers",
+            f"R {fmt0(totals['solved cost'])}",
+            f"{fmt0(totals['solved cost'] - totals['budget cost'])} vs Budget",
+            delta_color="inverse",
+        )
+        if not result.feasible:
+            st.warning(
+                "Budget can't be reached for every re-planned month within these "
+                "limits (or cost already incurred exceeds it); the table shows the "
+                "closest plan."
+            )
+
+        plan = result.plan.loc["Diesel"]
+        plan = plan.loc[~plan["locked"]]
+        shown = {}
+        for name in solve_for:
+            shown[name.capitalize()] = plan[name]
+            shown[f"Solved {name}"] = plan[f"solved {name}"]
+            shown[f"{name.capitalize()} change %"] = 100 * (plan[f"{name} factor"] - 1)
+        shown["Budget cost"] = plan["budget cost"]
+        shown["Solved cost"] = plan["solved cost"]
+        view = pd.DataFrame(shown)
+        view.index = [f"{m // 100}-{m % 100:02d}" for m in view.index]
+        st.dataframe(view.round(3), use_container_width=True)
 
 
 # ---------- SCENARIO SECTION (bottom of page) ----------
@@ -548,7 +809,31 @@ def create_scenario_metric_cards(metrics):
         )
 
 
-def display_scenario_section():
+# create_scenario_mermaid argument order
+DIAGRAM_METRICS = [
+    "diesel_actual",
+    "diesel_budget",
+    "qty_actual",
+    "qty_budget",
+    "price_actual",
+    "price_budget",
+    "con_actual",
+    "con_budget",
+    "ob_actual",
+    "ob_budget",
+    "rom_actual",
+    "rom_budget",
+]
+
+
+@fragment
+@instrumented()
+def display_scenario_section(date_range=None):
+    """
+    Scenario upload, metrics and diagram. An uploaded scenario is cut to
+    `date_range`, the charts' selection, and drawn by every section, so
+    running one re-runs the whole page.
+    """
     if not st.session_state.get("show_scenario", False):
         return
 
@@ -579,12 +864,11 @@ def display_scenario_section():
                 "Please upload a diesel scenario Excel file before running the simulation."
             )
         else:
+            SCENARIO_UPLOAD_BYTES.observe(uploaded.size)
             df_scenario = load_scenario_data(uploaded)
 
-            start = st.session_state.get("sim_start_date")
-            end = st.session_state.get("sim_end_date")
-
-            if start and end and "Date" in df_scenario.columns:
+            if date_range and "Date" in df_scenario.columns:
+                start, end = date_range
                 df_scenario["Date"] = pd.to_datetime(
                     df_scenario["Date"], errors="coerce"
                 )
@@ -600,8 +884,10 @@ def display_scenario_section():
                     "Please adjust the date filter or upload another file."
                 )
             else:
-                # store scenario dataframe for charts and diagram
+                # store scenario dataframe for charts and diagram; the charts
+                # live in another fragment, so redraw the whole page
                 st.session_state["scenario_df"] = df_scenario.copy()
+                st.rerun()
 
     # Always draw metrics + diagram whenever we have a scenario in session
     scenario_df = st.session_state.get("scenario_df")
@@ -609,37 +895,83 @@ def display_scenario_section():
         metrics = calculate_scenario_metrics(scenario_df)
         create_scenario_metric_cards(metrics)
 
-        mermaid_code = create_scenario_mermaid(
-            metrics["diesel_actual"],
-            metrics["diesel_budget"],
-            metrics["qty_actual"],
-            metrics["qty_budget"],
-            metrics["price_actual"],
-            metrics["price_budget"],
-            metrics["con_actual"],
-            metrics["con_budget"],
-            metrics["ob_actual"],
-            metrics["ob_budget"],
-            metrics["rom_actual"],
-            metrics["rom_budget"],
+        # shared by every session viewing the same scenario
+        diagram = DIAGRAMS.get(
+            [metrics[name] for name in DIAGRAM_METRICS], create_scenario_mermaid
         )
 
         st.markdown('<div class="diagram-container">', unsafe_allow_html=True)
         left, centre, right = st.columns([1, 8, 1])
-        with centre:
-            st_mermaid(mermaid_code, height=500)
+        with centre, stage("st_mermaid"):
+            if diagram.svg is not None:
+                # st.html sanitises <svg> away; st.image serves it as an image
+                st.image(diagram.svg, width="stretch")
+            else:
+                st_mermaid(diagram.source, height=500, key=f"mermaid_{diagram.key}")
         st.markdown("</div>", unsafe_allow_html=True)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
+# ---------- PROFILING (optional debug panel) ----------
+
+
+def display_profiling_panel(recorder: Recorder):
+    """Per-stage timings for this rerun, shown in the sidebar."""
+    frame = recorder.to_frame()
+    if frame.empty:
+        return
+
+    frame["stage"] = ["  " * d + n for d, n in zip(frame["depth"], frame["name"])]
+    frame["ms"] = (frame["seconds"] * 1000).round(1)
+    frame["peak MB"] = (frame["peak_bytes"] / 1e6).round(2)
+
+    with st.sidebar.expander("Profiling – this rerun", expanded=True):
+        st.caption(f"Run {recorder.run_id} · {frame.loc[frame['depth'] == 0, 'ms'].sum():,.1f} ms")
+        st.dataframe(
+            frame[["stage", "ms", "peak MB", "rows"]],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.download_button(
+            "Download JSON lines",
+            recorder.to_jsonl(),
+            file_name=f"profile_{recorder.run_id}.jsonl",
+            mime="application/json",
+            key="profile_download",
+        )
+
+    log_path = os.environ.get("COSTSIM_PROFILE_LOG")
+    if log_path:
+        recorder.append_jsonl(log_path)
+
+
 def main():
+    start_exporters()
+    start_warmup()
+    ctx = get_script_run_ctx()
+    record_rerun("Mining System", ctx.session_id if ctx else None)
+
+    profiling = st.session_state.get("debug_profiling", False)
+    recorder = Recorder(page="Mining System", track_memory=profiling)
+
+    with recording(recorder):
+        render_page()
+    record_recorder(recorder)
+
+    st.sidebar.toggle("Profiling panel", key="debug_profiling")
+    if profiling:
+        display_profiling_panel(recorder)
+
+
+def render_page():
     setup_page()
 
     if "show_scenario" not in st.session_state:
         st.session_state["show_scenario"] = False
 
-    selected_element, selected_item_name, selected_item_code = create_sidebar()
+    with st.sidebar:
+        selected_element, selected_item_name, selected_item_code = sidebar_fragment()
     display_code = create_title_card(selected_item_name, selected_item_code)
 
     # Only show upload button (and therefore scenario section) for Diesel
@@ -647,11 +979,12 @@ def main():
     create_upload_trigger(show_button=is_diesel)
 
     try:
-        df = get_data(Data["Mining System"])
-
         if is_diesel:
-            display_diesel_analysis(df, display_code)
-            display_scenario_section()
+            # each section is a fragment: its own widgets re-run only that section
+            date_range = diesel_charts_fragment(display_code)
+            display_forecast_section(display_code)
+            display_goal_seek_section(date_range)
+            display_scenario_section(date_range)
         else:
             # For Blasting / Drilling / others: no charts or scenario – just the title.
             if not selected_item_name:
@@ -0,0 +1,8 @@
+import streamlit as st
+
+from System import render_model_page
+
+st.set_page_config(layout="wide", page_icon="chart_with_upwards_trend", page_title="Plant System")
+
+# Models, artefacts and inputs for this page are declared in dictionaries.Pages / Models.
+render_model_page("Plant System")
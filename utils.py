@@ -1,25 +1,85 @@
+import logging
+import os
+import threading
+
 import numpy as np
 import pandas as pd
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from costsim.instrumentation import instrumented
+from costsim.metrics import DATA_LOAD_SECONDS
+from costsim.pyramid import period_keys
+
+log = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------------------
 # DATA PREP
 # -------------------------------------------------------------------
-def get_data(file_name):
-    df = pd.read_excel(file_name)
-    df["Date"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce")
-    df = df.dropna(subset=["Date"])
-    df = df.set_index("Date").sort_index()
-    df["year_month"] = df.index.year * 100 + df.index.month
-    df["year"] = df.index.year
+@instrumented()
+def get_data(file_name, schema: str | None = "history"):
+    """
+    History workbook (or Parquet partition) indexed by Date, with year_month
+    and year; dtypes compacted to dictionaries.Schemas[schema] unless None.
+    """
+    # uploaded files carry their name; Path objects would give only the basename
+    path = str(file_name if isinstance(file_name, (str, os.PathLike)) else getattr(file_name, "name", file_name))
+    source = os.path.basename(path)
+    parent = os.path.basename(os.path.dirname(path))
+    if parent.startswith("bu="):
+        # every partition is history.parquet: label it by its BU directory
+        source = f"{parent}/{source}"
+    with DATA_LOAD_SECONDS.time(source=source):
+        # per-BU Parquet partitions (costsim.partitions) have the workbook's columns
+        if source.endswith(".parquet"):
+            df = pd.read_parquet(file_name)
+        else:
+            df = pd.read_excel(file_name)
+        df.columns = [str(c).strip() for c in df.columns]
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            df["Date"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce")
+        df = df.dropna(subset=["Date"])
+        df = df.set_index("Date").sort_index()
+        df["year_month"] = df.index.year * 100 + df.index.month
+        df["year"] = df.index.year
+        if schema is not None:
+            # imported here so `python -m costsim.schema` runs cleanly
+            from costsim.schema import compact
+
+            df, kept = compact(df, schema)
+            if kept:
+                log.warning("%s: kept %s at full precision", source, ", ".join(kept))
     return df
 
 
+_lottie = {}
+_lottie_lock = threading.Lock()
+
+
+def load_lottie(url, timeout: float = 10.0):
+    """
+    Lottie animation JSON, fetched once per process. Returns None (and tries
+    again next time) when the asset can't be fetched, so pages still render.
+    """
+    with _lottie_lock:
+        if url in _lottie:
+            return _lottie[url]
+    import requests
+
+    try:
+        r = requests.get(url, timeout=timeout)
+        data = r.json() if r.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        data = None
+    if data is not None:
+        with _lottie_lock:
+            _lottie[url] = data
+    return data
+
+
+@instrumented()
 def prepare_diesel_data(df: pd.DataFrame) -> pd.DataFrame:
     df.index = pd.to_datetime(df.index, errors="coerce")
 
@@ -44,8 +104,26 @@ def prepare_diesel_data(df: pd.DataFrame) -> pd.DataFrame:
     return monthly
 
 
+@instrumented()
+def prepare_diesel_levels(pyramid, level: str, start=None, end=None) -> pd.DataFrame:
+    """
+    prepare_diesel_data() from the aggregate pyramid instead of raw rows: one
+    row per `level` period between `start` and `end`, labelled in "Period"
+    and keyed in "key".
+    """
+    base_cols = ["Diesel (R)", "Diesel (R) Budget"]
+    periods = pyramid.frame(level, start, end)[["Period", *base_cols]].reset_index()
+    periods = periods[periods["Diesel (R)"] > 0].reset_index(drop=True)
+
+    periods["Cum_Actual"] = periods["Diesel (R)"].cumsum()
+    periods["Cum_Budget"] = periods["Diesel (R) Budget"].cumsum()
+    periods.attrs["level"] = level
+    return periods
+
+
+@instrumented()
 def apply_epbcs_and_simulation(
-    monthly: pd.DataFrame, scenario_df: pd.DataFrame | None
+    monthly: pd.DataFrame, scenario_df: pd.DataFrame | None, level: str | None = None
 ) -> pd.DataFrame:
     """
     Enrich `monthly` with EPBCS and Simulation.
@@ -56,6 +134,9 @@ def apply_epbcs_and_simulation(
     Otherwise:
         Generate near-realistic synthetic EPBCS/Simulation based on
         Budget/Actual with small random noise.
+
+    With `level`, `monthly` comes from prepare_diesel_levels() and the
+    scenario is summed per period of that level instead of per month.
     """
     out = monthly.copy()
 
@@ -81,22 +162,28 @@ def apply_epbcs_and_simulation(
     df = scenario_df.copy()
     df["Date"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce")
     df = df.dropna(subset=["Date"])
-    df["Month"] = df["Date"].dt.month
+    if level is None:
+        on = "Month"
+        df[on] = df["Date"].dt.month
+    else:
+        on = "key"
+        df[on] = period_keys(df["Date"], level)
 
     epbcs_month = (
-        df.groupby("Month")["Diesel (R) Budget"]
+        df.groupby(on)["Diesel (R) Budget"]
         .sum()
         .reset_index(name="EPBCS")
     )
     sim_month = (
-        df.groupby("Month")["Diesel (R)"]
+        df.groupby(on)["Diesel (R)"]
         .sum()
         .reset_index(name="Simulation")
     )
 
-    out = out.merge(epbcs_month, on="Month", how="left")
-    out = out.merge(sim_month, on="Month", how="left")
+    out = out.merge(epbcs_month, on=on, how="left")
+    out = out.merge(sim_month, on=on, how="left")
     out[["EPBCS", "Simulation"]] = out[["EPBCS", "Simulation"]].fillna(0)
+    out.attrs.update(monthly.attrs)
 
     return out
 
@@ -104,17 +191,22 @@ def apply_epbcs_and_simulation(
 # -------------------------------------------------------------------
 # COMMON LAYOUT
 # -------------------------------------------------------------------
-def _base_layout(title, y_title):
-    return dict(
-        title=dict(text=title, x=0.01, xanchor="left", font=dict(size=16)),
-        xaxis=dict(
-            title="Month",
+def _base_layout(title, y_title, x_title="Month", categorical=False):
+    if categorical:
+        # period labels from the aggregate pyramid; plotly thins the ticks
+        xaxis = dict(title=x_title, type="category", linecolor="#94a3b8", mirror=True)
+    else:
+        xaxis = dict(
+            title=x_title,
             tickmode="linear",
             tick0=1,
             dtick=1,
             linecolor="#94a3b8",
             mirror=True,
-        ),
+        )
+    return dict(
+        title=dict(text=title, x=0.01, xanchor="left", font=dict(size=16)),
+        xaxis=xaxis,
         yaxis=dict(
             title=y_title,
             linecolor="#94a3b8",
@@ -138,13 +230,30 @@ def _base_layout(title, y_title):
 # -------------------------------------------------------------------
 # CHARTS – with EPBCS + SIMULATION LINES
 # -------------------------------------------------------------------
+_PERIOD_TITLES = {
+    "Day": "Daily",
+    "Week": "Weekly",
+    "Month": "Monthly",
+    "Quarter": "Quarterly",
+    "Financial year": "Financial year",
+}
+
+
+def _period_axis(monthly: pd.DataFrame):
+    """x values and axis name: pyramid periods (prepare_diesel_levels) or calendar months."""
+    if "Period" in monthly.columns:
+        return monthly["Period"], monthly.attrs.get("level", "Period")
+    return monthly["Month"], "Month"
+
+
+@instrumented()
 def create_monthly_chart(monthly: pd.DataFrame, display_code: str):
     ACTUAL_COLOR = "#0b4f91"
     BUDGET_COLOR = "#5fa8ff"
     EPBCS_COLOR = "#16a34a"
     SIM_COLOR = "#f97316"
 
-    x_vals = monthly["Month"]
+    x_vals, x_name = _period_axis(monthly)
 
     fig = go.Figure()
 
@@ -153,14 +262,14 @@ def create_monthly_chart(monthly: pd.DataFrame, display_code: str):
         y=monthly["Diesel (R)"],
         name="Actual",
         marker_color=ACTUAL_COLOR,
-        hovertemplate="Month: %{x}<br>Actual: R %{y:,.0f}<extra></extra>",
+        hovertemplate=x_name + ": %{x}<br>Actual: R %{y:,.0f}<extra></extra>",
     )
     fig.add_bar(
         x=x_vals,
         y=monthly["Diesel (R) Budget"],
         name="Budget",
         marker_color=BUDGET_COLOR,
-        hovertemplate="Month: %{x}<br>Budget: R %{y:,.0f}<extra></extra>",
+        hovertemplate=x_name + ": %{x}<br>Budget: R %{y:,.0f}<extra></extra>",
     )
 
     if "EPBCS" in monthly.columns:
@@ -171,7 +280,7 @@ def create_monthly_chart(monthly: pd.DataFrame, display_code: str):
             mode="lines+markers",
             line=dict(color=EPBCS_COLOR, width=2, shape="spline"),
             marker=dict(size=5),
-            hovertemplate="Month: %{x}<br>EPBCS: R %{y:,.0f}<extra></extra>",
+            hovertemplate=x_name + ": %{x}<br>EPBCS: R %{y:,.0f}<extra></extra>",
         )
 
     if "Simulation" in monthly.columns:
@@ -182,24 +291,30 @@ def create_monthly_chart(monthly: pd.DataFrame, display_code: str):
             mode="lines+markers",
             line=dict(color=SIM_COLOR, width=2, dash="dot", shape="spline"),
             marker=dict(size=5),
-            hovertemplate="Month: %{x}<br>Simulation: R %{y:,.0f}<extra></extra>",
+            hovertemplate=x_name + ": %{x}<br>Simulation: R %{y:,.0f}<extra></extra>",
         )
 
     fig.update_layout(
-        **_base_layout(f"Monthly cost – Diesel {display_code}", "Diesel cost (R)"),
+        **_base_layout(
+            f"{_PERIOD_TITLES.get(x_name, 'Monthly')} cost – Diesel {display_code}",
+            "Diesel cost (R)",
+            x_name,
+            categorical="Period" in monthly.columns,
+        ),
         barmode="group",
     )
 
     return fig
 
 
+@instrumented()
 def create_cumulative_chart(monthly: pd.DataFrame, display_code: str):
     ACTUAL_COLOR = "#0b4f91"
     BUDGET_COLOR = "#5fa8ff"
     EPBCS_COLOR = "#16a34a"
     SIM_COLOR = "#f97316"
 
-    x_vals = monthly["Month"]
+    x_vals, x_name = _period_axis(monthly)
 
     cum_actual = monthly["Diesel (R)"].cumsum()
     cum_budget = monthly["Diesel (R) Budget"].cumsum()
@@ -211,14 +326,14 @@ def create_cumulative_chart(monthly: pd.DataFrame, display_code: str):
         y=cum_actual,
         name="Actual (cum)",
         marker_color=ACTUAL_COLOR,
-        hovertemplate="Month: %{x}<br>Cum Actual: R %{y:,.0f}<extra></extra>",
+        hovertemplate=x_name + ": %{x}<br>Cum Actual: R %{y:,.0f}<extra></extra>",
     )
     fig.add_bar(
         x=x_vals,
         y=cum_budget,
         name="Budget (cum)",
         marker_color=BUDGET_COLOR,
-        hovertemplate="Month: %{x}<br>Cum Budget: R %{y:,.0f}<extra></extra>",
+        hovertemplate=x_name + ": %{x}<br>Cum Budget: R %{y:,.0f}<extra></extra>",
     )
 
     if "EPBCS" in monthly.columns:
@@ -230,7 +345,7 @@ def create_cumulative_chart(monthly: pd.DataFrame, display_code: str):
             mode="lines+markers",
             line=dict(color=EPBCS_COLOR, width=2, shape="spline"),
             marker=dict(size=5),
-            hovertemplate="Month: %{x}<br>EPBCS (cum): R %{y:,.0f}<extra></extra>",
+            hovertemplate=x_name + ": %{x}<br>EPBCS (cum): R %{y:,.0f}<extra></extra>",
         )
 
     if "Simulation" in monthly.columns:
@@ -242,13 +357,15 @@ def create_cumulative_chart(monthly: pd.DataFrame, display_code: str):
             mode="lines+markers",
             line=dict(color=SIM_COLOR, width=2, dash="dot", shape="spline"),
             marker=dict(size=5),
-            hovertemplate="Month: %{x}<br>Simulation (cum): R %{y:,.0f}<extra></extra>",
+            hovertemplate=x_name + ": %{x}<br>Simulation (cum): R %{y:,.0f}<extra></extra>",
         )
 
     fig.update_layout(
         **_base_layout(
             f"Cumulative cost – Diesel {display_code}",
             "Cumulative diesel cost (R)",
+            x_name,
+            categorical="Period" in monthly.columns,
         ),
         barmode="group",
     )
@@ -256,9 +373,125 @@ def create_cumulative_chart(monthly: pd.DataFrame, display_code: str):
     return fig
 
 
+def create_forecast_fan_chart(actual: pd.Series, fan: pd.DataFrame, display_code: str):
+    """
+    Monthly actuals followed by the forecast median and its p10–p90 band.
+    Both inputs are indexed by year_month (YYYYMM).
+    """
+    ACTUAL_COLOR = "#0b4f91"
+    FORECAST_COLOR = "#f97316"
+
+    def to_dates(index):
+        return pd.to_datetime(index.astype(str), format="%Y%m")
+
+    x_fan = to_dates(fan.index)
+
+    fig = go.Figure()
+    fig.add_bar(
+        x=to_dates(actual.index),
+        y=actual.values,
+        name="Actual",
+        marker_color=ACTUAL_COLOR,
+        hovertemplate="%{x|%b %Y}<br>Actual: R %{y:,.0f}<extra></extra>",
+    )
+    fig.add_scatter(
+        x=x_fan,
+        y=fan["p90"],
+        mode="lines",
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo="skip",
+    )
+    fig.add_scatter(
+        x=x_fan,
+        y=fan["p10"],
+        name="p10 – p90",
+        mode="lines",
+        line=dict(width=0),
+        fill="tonexty",
+        fillcolor="rgba(249, 115, 22, 0.2)",
+        hovertemplate="%{x|%b %Y}<br>p10: R %{y:,.0f}<extra></extra>",
+    )
+    fig.add_scatter(
+        x=x_fan,
+        y=fan["p50"],
+        name="Forecast (median)",
+        mode="lines+markers",
+        line=dict(color=FORECAST_COLOR, width=2, dash="dot"),
+        marker=dict(size=4),
+        hovertemplate="%{x|%b %Y}<br>Median: R %{y:,.0f}<extra></extra>",
+    )
+
+    layout = _base_layout(f"Forecast – Diesel {display_code}", "Diesel cost (R)")
+    layout["xaxis"] = dict(title="Month", linecolor="#94a3b8", mirror=True)
+    fig.update_layout(**layout)
+
+    return fig
+
+
+def create_variance_waterfall(steps: pd.Series, display_code: str):
+    """
+    Budget → price / rate / tonnage effects → Actual. `steps` is the output of
+    costsim.variance.waterfall_steps (first and last entries are totals).
+    """
+    names = {"budget": "Budget", "price": "Price", "rate": "Con rate",
+             "residual": "Residual", "actual": "Actual"}
+    labels = [names.get(k, k) for k in steps.index]
+    measure = ["absolute"] + ["relative"] * (len(steps) - 2) + ["total"]
+
+    fig = go.Figure(
+        go.Waterfall(
+            x=labels,
+            y=[steps.iloc[0], *steps.iloc[1:-1], 0],
+            measure=measure,
+            increasing=dict(marker=dict(color="#dc2626")),
+            decreasing=dict(marker=dict(color="#16a34a")),
+            totals=dict(marker=dict(color="#0b4f91")),
+            connector=dict(line=dict(color="#94a3b8", width=1)),
+            hovertemplate="%{x}: R %{y:,.0f}<extra></extra>",
+        )
+    )
+
+    layout = _base_layout(f"Budget variance drivers – Diesel {display_code}", "Diesel cost (R)")
+    layout["xaxis"] = dict(title="", linecolor="#94a3b8", mirror=True)
+    fig.update_layout(**layout, showlegend=False)
+
+    return fig
+
+
+def create_correlation_heatmap(corr: pd.DataFrame, annotate_max: int = 15):
+    """Interactive correlation heatmap; cell values are printed for small matrices."""
+    labels = [str(c) for c in corr.columns]
+    values = corr.to_numpy()
+    annotate = len(labels) <= annotate_max
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=values,
+            x=labels,
+            y=labels,
+            zmin=-1,
+            zmax=1,
+            colorscale="YlGnBu",
+            text=np.round(values, 2) if annotate else None,
+            texttemplate="%{text}" if annotate else None,
+            hovertemplate="%{y} ~ %{x}<br>r = %{z:.2f}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        yaxis=dict(autorange="reversed"),
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="rgba(0,0,0,0)",
+        margin=dict(l=40, r=20, t=40, b=40),
+        height=max(400, 22 * len(labels)),
+    )
+    return fig
+
+
 # -------------------------------------------------------------------
 # TABLE + IMPACT CARD
 # -------------------------------------------------------------------
+@instrumented()
 def create_cost_drivers_table(monthly: pd.DataFrame):
     month_labels = [
         "Jan",
@@ -288,6 +521,8 @@ def create_cost_drivers_table(monthly: pd.DataFrame):
     else:
         sim_vals = [""] * len(actual_vals)
 
+    if "Period" in monthly.columns:
+        month_labels = list(monthly["Period"])
     header_cells = "".join(
         f'<td style="padding:6px; font-weight:600; color:#0b4f91;">{m}</td>'
         for m in month_labels[: len(actual_vals)]
@@ -316,7 +551,16 @@ def create_cost_drivers_table(monthly: pd.DataFrame):
     """
 
 
-def create_impact_card(display_code):
+def create_impact_card(display_code, impact: dict | None = None):
+    """
+    `impact` holds the simulated totals for "system", "category" and
+    "element" (e.g. from the aggregate cube); values are left blank without it.
+    """
+    impact = impact or {}
+    system_val = fmt0(impact["system"]) if "system" in impact else ""
+    category_val = fmt0(impact["category"]) if "category" in impact else ""
+    element_val = fmt0(impact["element"]) if "element" in impact else ""
+
     return f"""
     <div class="equal-height-card bottom-card">
         <div style="font-size:18px; font-weight:600; margin-bottom:5px; color:#0b4f91;">
@@ -326,9 +570,9 @@ def create_impact_card(display_code):
             (everything else remains constant)
         </div>
         <div>
-            &gt; Mining System : R<br>
-            &gt; Consumables : R<br>
-            &gt; Diesel : {display_code} : R
+            &gt; Mining System : R {system_val}<br>
+            &gt; Consumables : R {category_val}<br>
+            &gt; Diesel : {display_code} : R {element_val}
         </div>
     </div>
     """
@@ -337,6 +581,7 @@ def create_impact_card(display_code):
 # -------------------------------------------------------------------
 # SCENARIO HELPERS
 # -------------------------------------------------------------------
+@instrumented()
 def load_scenario_data(file):
     df = pd.read_excel(file)
     df.columns = [str(c).strip() for c in df.columns]
@@ -351,6 +596,7 @@ def fmt2(x):
     return f"{x:,.2f}" if pd.notnull(x) else "N/A"
 
 
+@instrumented()
 def calculate_scenario_metrics(df):
     ob_actual = df["OB (T)"].sum()
     ob_budget = df["OB (T) Budget"].sum()
@@ -406,6 +652,7 @@ def calculate_scenario_metrics(df):
     return metrics
 
 
+@instrumented()
 def create_scenario_mermaid(
     diesel_actual,
     diesel_budget,